@@ -0,0 +1,221 @@
+"""
+Benchmark harness: times each pipeline stage on seeded synthetic inputs and writes JSON.
+
+    python -m benchmarks.run --sizes 10000 100000 --zones 5 50 --out results.json
+    python -m benchmarks.run --quick --baseline results.json
+
+Every (lines, zones) point runs in a fresh interpreter, so peak RSS figures are per point.
+Stages are timed separately: load_and_clean, generate_picklists (single process),
+run_parallel_build, assign_picklists and save_results. With --baseline, stages that got
+slower than the tolerance are reported and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import write_csv
+from optimization_problem.config import Config
+from optimization_problem.instrumentation import peak_rss_mb
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+DEFAULT_ZONES = [5, 50, 500]
+QUICK_SIZES = [10_000, 50_000]
+QUICK_ZONES = [5, 50]
+STAGES = ["load_and_clean", "generate_picklists", "run_parallel_build", "assign_picklists", "save_results"]
+# Config knobs recorded with every result, so runs under different modes are not compared by accident
+CONFIG_KEYS = ["BUILDER_MODE", "DISPATCH_MODE", "ZONE_SPLIT_LINES", "SCHEDULER_MODE", "SCHEDULE_ORDER", "OUTPUT_LAYOUT"]
+
+
+def run_point(csv_path, stages, n_workers=None):
+    """
+    Run the pipeline stages on csv_path in this process and return their timings.
+    """
+    from optimization_problem.data_loader import DataLoader
+    from optimization_problem.parallel_engine import ScalableOptimizationEngine
+    from optimization_problem.picklist_builder import PicklistBuilder
+    from optimization_problem.scheduler import Scheduler
+    from optimization_problem.utils import save_results
+
+    results = {}
+
+    def timed(name, func):
+        start = time.perf_counter()
+        value = func()
+        results[name] = {
+            "seconds": time.perf_counter() - start,
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(children=True),
+        }
+        return value
+
+    df, base_date = timed("load_and_clean", lambda: DataLoader.load_and_clean(csv_path))
+    start_time = datetime.combine(base_date, datetime.strptime(Config.GLOBAL_START_TIME_STR, "%H:%M").time())
+
+    picklists = None
+    if "generate_picklists" in stages:
+        picklists = timed("generate_picklists", lambda: PicklistBuilder(df, start_time).generate_picklists())
+    if "run_parallel_build" in stages:
+        engine = ScalableOptimizationEngine(n_workers)
+        picklists = timed("run_parallel_build", lambda: engine.run_parallel_build(df, start_time))
+    if picklists is None:
+        return results, {"lines": len(df)}
+
+    assignments = None
+    if "assign_picklists" in stages or "save_results" in stages:
+        pickers = Scheduler.create_pickers(base_date)
+        assignments, _ = timed("assign_picklists", lambda: Scheduler.assign_picklists(picklists, pickers, start_time))
+    if "save_results" in stages:
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory(prefix="bench_output_") as out_dir:
+            os.chdir(out_dir)
+            try:
+                timed("save_results", lambda: save_results(assignments, base_date))
+            finally:
+                os.chdir(cwd)
+
+    counts = {"lines": len(df), "picklists": len(picklists)}
+    if assignments is not None:
+        counts["assignments"] = len(assignments)
+    return results, counts
+
+
+def _run_isolated(csv_path, stages, n_workers):
+    """
+    run_point in a child interpreter; its stdout is discarded and the result read from a file.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as fh:
+        result_path = fh.name
+    try:
+        cmd = [sys.executable, "-m", "benchmarks.run", "--point", csv_path, "--point-out", result_path,
+               "--stages", *stages]
+        if n_workers:
+            cmd += ["--workers", str(n_workers)]
+        subprocess.run(cmd, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        with open(result_path) as fh:
+            return json.load(fh)
+    finally:
+        os.remove(result_path)
+
+
+def input_path(data_dir, n_lines, n_zones, seed):
+    """
+    Cached synthetic input for (n_lines, n_zones, seed); generated on first use.
+    """
+    path = os.path.join(data_dir, f"synthetic_{n_lines}_{n_zones}_{seed}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {n_lines:,} lines / {n_zones} zones -> {path}", file=sys.stderr)
+        write_csv(path + ".tmp", n_lines, n_zones, seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def environment():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: getattr(Config, key, None) for key in CONFIG_KEYS},
+    }
+
+
+def compare(results, baseline, tolerance, min_seconds=0.05):
+    """
+    (point, stage, baseline seconds, new seconds) for every stage slower than baseline * (1 + tolerance)
+    by more than min_seconds, so sub-second timer noise on tiny stages is not reported.
+    """
+    def key(point):
+        return point["lines"], point["zones"], point["seed"]
+
+    previous = {key(point): point for point in baseline["points"]}
+    regressions = []
+    for point in results["points"]:
+        old = previous.get(key(point))
+        if old is None:
+            continue
+        for stage, timing in point["stages"].items():
+            old_timing = old["stages"].get(stage)
+            slower = timing["seconds"] - old_timing["seconds"] if old_timing else 0
+            if slower > min_seconds and timing["seconds"] > old_timing["seconds"] * (1 + tolerance):
+                regressions.append((key(point), stage, old_timing["seconds"], timing["seconds"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", help=f"line counts (default {DEFAULT_SIZES})")
+    parser.add_argument("--zones", type=int, nargs="+", help=f"zone counts (default {DEFAULT_ZONES})")
+    parser.add_argument("--quick", action="store_true", help=f"small sweep: {QUICK_SIZES} x {QUICK_ZONES}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per point; the fastest time per stage is kept")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--workers", type=int, help="pool size for run_parallel_build (default: all cores)")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "warehouse_benchmarks"),
+                        help="where generated inputs are cached")
+    parser.add_argument("--out", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = 20%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="ignore slowdowns smaller than this many seconds")
+    parser.add_argument("--point", help=argparse.SUPPRESS)
+    parser.add_argument("--point-out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.point:
+        stages, counts = run_point(args.point, args.stages, args.workers)
+        with open(args.point_out, "w") as fh:
+            json.dump({"stages": stages, "counts": counts}, fh)
+        return 0
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    zone_counts = args.zones or (QUICK_ZONES if args.quick else DEFAULT_ZONES)
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    results = {"environment": environment(), "points": []}
+    for n_lines in sizes:
+        for n_zones in zone_counts:
+            csv_path = input_path(args.data_dir, n_lines, n_zones, args.seed)
+            runs = [_run_isolated(csv_path, args.stages, args.workers) for _ in range(args.repeat)]
+            best = {stage: min((run["stages"][stage] for run in runs), key=lambda t: t["seconds"])
+                    for stage in runs[0]["stages"]}
+            point = {"lines": n_lines, "zones": n_zones, "seed": args.seed, "repeat": args.repeat,
+                     "counts": runs[0]["counts"], "stages": best}
+            results["points"].append(point)
+            summary = ", ".join(f"{stage} {timing['seconds']:.2f}s" for stage, timing in best.items())
+            print(f"{n_lines:>9,} lines {n_zones:>4} zones: {summary}", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.tolerance, args.min_seconds)
+        for (n_lines, n_zones, seed), stage, old, new in regressions:
+            print(f"REGRESSION {n_lines:,} lines / {n_zones} zones / seed {seed}: {stage} {old:.3f}s -> {new:.3f}s",
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+PRIORITIES = np.array(["P1", "P2", "P3", "P4", "P5", "P6", "P9"])
+PRIORITY_MIX = np.array([0.08, 0.12, 0.15, 0.2, 0.15, 0.15, 0.15])
+
+FLOORS = 3
+AISLES_PER_FLOOR = 20
+RACKS_PER_AISLE = 12
+
+
+def _zipf_weights(n: int, a: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** a
+    return weights / weights.sum()
+
+
+def generate(n_lines: int, n_zones: int, seed: int = 0, start: str = "2025-08-12 17:00",
+             window_hours: float = 4.0, fragile_share: float = 0.1) -> pd.DataFrame:
+    """
+    Seeded order lines in the input.csv schema.
+
+    Zone sizes, SKU popularity, store demand and order sizes are Zipf-skewed. Each SKU has a
+    fixed zone, bin, location and unit weight, so lines of the same SKU share a bin. Orders
+    belong to one store and carry one pod_priority drawn from PRIORITY_MIX. One zone is
+    FRAGILE_FD with about fragile_share of the lines.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Orders: geometric line counts, one store and priority per order
+    n_orders = max(n_lines // 6, 1)
+    order_sizes = rng.geometric(0.2, n_orders)
+    order_of_line = np.repeat(np.arange(n_orders), order_sizes)
+    if len(order_of_line) < n_lines:
+        order_of_line = np.concatenate([order_of_line, rng.integers(0, n_orders, n_lines - len(order_of_line))])
+    order_of_line = np.sort(order_of_line[:n_lines])
+    n_orders = int(order_of_line[-1]) + 1 if n_lines else 0
+
+    n_stores = max(min(n_orders // 4, 5_000), 1)
+    order_store = rng.choice(n_stores, n_orders, p=_zipf_weights(n_stores, 0.8))
+    order_priority = rng.choice(len(PRIORITIES), n_orders, p=PRIORITY_MIX)
+    window = int(window_hours * 3600)
+    order_dt = pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, window, n_orders)), unit="s")
+
+    # Zones: FRAGILE_FD takes fragile_share of the volume, the rest is Zipf-distributed
+    n_fragile = 1 if n_zones > 1 and fragile_share > 0 else 0
+    zone_names = [f"Z{i:03d}" for i in range(n_zones - n_fragile)] + ["FRAGILE_FD"] * n_fragile
+    zone_weights = _zipf_weights(n_zones - n_fragile, 0.6) * (1 - fragile_share if n_fragile else 1.0)
+    zone_weights = np.append(zone_weights, [fragile_share] * n_fragile)
+    zone_pods = rng.integers(2, 9, n_zones)
+
+    # SKU catalogue: zone, bin, location and unit weight are attributes of the SKU
+    n_skus = max(min(n_lines // 20, 200_000), n_zones)
+    sku_zone = np.concatenate([np.arange(n_zones), rng.choice(n_zones, n_skus - n_zones, p=zone_weights)])
+    sku_bin = rng.integers(1, 2_000, n_skus)
+    sku_weight = np.round(rng.lognormal(5.5, 1.0, n_skus), 1)
+    sku_popularity = _zipf_weights(n_skus, 1.05)
+    # Keep each zone's share of lines close to zone_weights while SKUs stay skewed inside zones
+    zone_mass = np.bincount(sku_zone, weights=sku_popularity, minlength=n_zones)
+    sku_popularity = sku_popularity * zone_weights[sku_zone] / zone_mass[sku_zone]
+    sku_popularity /= sku_popularity.sum()
+
+    sku = rng.choice(n_skus, n_lines, p=sku_popularity)
+    zone = sku_zone[sku]
+    bin_rank = sku_bin[sku]
+    weight = sku_weight[sku]
+    # About 2% of lines have no weight; the loader fills them with 0
+    weight = np.where(rng.random(n_lines) < 0.02, np.nan, weight)
+    qty = np.minimum(rng.geometric(0.25, n_lines), 50)
+
+    return pd.DataFrame({
+        "dt": order_dt[order_of_line].strftime("%Y-%m-%d %H:%M:%S"),
+        "order_id": pd.Categorical.from_codes(order_of_line, [f"O{i:08d}" for i in range(n_orders)]),
+        "sku": pd.Categorical.from_codes(sku, [f"SKU{i:06d}" for i in range(n_skus)]),
+        "order_qty": qty,
+        "weight_in_grams": weight,
+        "zone": pd.Categorical.from_codes(zone, zone_names),
+        "pod_priority": PRIORITIES[order_priority[order_of_line]],
+        "store_id": pd.Categorical.from_codes(order_store[order_of_line], [f"ST{i:05d}" for i in range(n_stores)]),
+        "bin": bin_rank,
+        "bin_rank": bin_rank,
+        "floor": bin_rank % FLOORS,
+        "aisle": (bin_rank // FLOORS) % AISLES_PER_FLOOR + 1,
+        "rack": (bin_rank // (FLOORS * AISLES_PER_FLOOR)) % RACKS_PER_AISLE + 1,
+        "pods_per_picklist_in_that_zone": zone_pods[zone],
+    })
+
+
+def write_csv(path: str, n_lines: int, n_zones: int, seed: int = 0, chunk_rows: Optional[int] = 500_000) -> str:
+    generate(n_lines, n_zones, seed).to_csv(path, index=False, chunksize=chunk_rows)
+    return path
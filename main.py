@@ -1,35 +1,121 @@
 import time
 from datetime import datetime
 from optimization_problem.config import Config
+from optimization_problem.admission import AdmissionFilter
 from optimization_problem.data_loader import DataLoader
+from optimization_problem.compiled_dataset import CompiledDataset
+from optimization_problem.instrumentation import Trace
+from optimization_problem.local_search import PicklistLocalSearch
 from optimization_problem.parallel_engine import ScalableOptimizationEngine
+from optimization_problem.pipeline import PipelinedPlan
 from optimization_problem.scheduler import Scheduler
+from optimization_problem.service import PlanningClient, PlanningServiceError
 from optimization_problem.utils import save_results, print_metrics
 
 
 def run_distributed_optimization_engine(input_file: str):
+    if Config.PLANNING_SERVICE:
+        _run_as_client(input_file)
+        return
+
     perf_start = time.time()
+    trace = Trace(Config.PROFILE_DIR) if Config.TRACE_PATH else None
+    previous_trace = Trace.activate(trace)
+    try:
+        _run(input_file, perf_start)
+    finally:
+        Trace.activate(previous_trace)
+        if trace is not None:
+            trace.write(Config.TRACE_PATH)
+            print(f"Trace written to {Config.TRACE_PATH}")
 
+
+def _run_as_client(input_file: str):
+    print(f"Requesting a plan from the planning service at {Config.PLANNING_SERVICE}...")
     try:
-        df, base_date = DataLoader.load_and_clean(input_file)
+        base_date, assignments, unassigned, metrics = PlanningClient(Config.PLANNING_SERVICE).plan(input_file)
+    except PlanningServiceError as exc:
+        print(f"Planning service failed: {exc}")
+        return
+
+    print(f"Successfully assigned: {len(assignments)}")
+    print(metrics['report'])
+    save_results(assignments, base_date)
+
+
+def _run(input_file: str, perf_start: float):
+    trace = Trace.current()
+    if Config.ADMISSION_FILTER and (Config.COMPILED_DATA_DIR or Config.STREAM_CHUNK_ROWS):
+        raise ValueError("ADMISSION_FILTER needs an in-memory run; unset COMPILED_DATA_DIR and STREAM_CHUNK_ROWS")
+    if Config.PIPELINE:
+        PipelinedPlan.check_config()
+    if Config.LOCAL_SEARCH_SECONDS is not None:
+        PicklistLocalSearch.check_config()
+
+    try:
+        with trace.stage("load"):
+            if Config.COMPILED_DATA_DIR:
+                dataset = CompiledDataset.open_or_compile(input_file, Config.COMPILED_DATA_DIR)
+                base_date = DataLoader.BASE_DATE
+            elif Config.STREAM_CHUNK_ROWS:
+                partitions, base_date = DataLoader.stream_to_zones(input_file)
+            else:
+                df, base_date = DataLoader.load_and_clean(input_file)
     except FileNotFoundError:
         print(f"Input file not found: {input_file}")
         return
 
     start_time = datetime.combine(base_date, datetime.strptime(Config.GLOBAL_START_TIME_STR, "%H:%M").time())
 
+    deferred = None
+    if Config.ADMISSION_FILTER:
+        with trace.stage("admission") as stage:
+            df, deferred = AdmissionFilter.split(df, start_time, base_date)
+            stage["deferred_lines"] = len(deferred)
+        print(AdmissionFilter.report(df, deferred, start_time, base_date))
+
     print("Initiating scalable optimization engine...")
     engine = ScalableOptimizationEngine()
-    picklists = engine.run_parallel_build(df, start_time)
+    if Config.PIPELINE:
+        pipeline = PipelinedPlan(engine, base_date, start_time)
+        _, assignments, wasted = pipeline.run(df)
+        print(f"Successfully assigned: {len(assignments)}")
+        with trace.stage("metrics"):
+            print_metrics(assignments, wasted, base_date, perf_start, deferred)
+        with trace.stage("write"):
+            pipeline.close_writer()
+            if deferred is not None and len(deferred):
+                AdmissionFilter.save(deferred, base_date)
+        return
+
+    with trace.stage("build") as stage:
+        if Config.COMPILED_DATA_DIR:
+            picklists = engine.run_compiled_build(dataset, start_time)
+        elif Config.STREAM_CHUNK_ROWS:
+            with partitions:
+                picklists = engine.run_partitioned_build(partitions, start_time)
+        else:
+            picklists = engine.run_parallel_build(df, start_time)
+        stage["picklists"] = len(picklists)
     print(f"Generated {len(picklists)} candidate picklists.")
 
+    if Config.LOCAL_SEARCH_SECONDS is not None:
+        with trace.stage("improve") as stage:
+            picklists = engine.improve_picklists(picklists, start_time)
+            stage["picklists"] = len(picklists)
+
     print("Assigning to pickers...")
-    pickers = Scheduler.create_pickers(base_date)
-    assignments, wasted = Scheduler.assign_picklists(picklists, pickers, start_time)
+    with trace.stage("schedule"):
+        pickers = Scheduler.create_pickers(base_date)
+        assignments, wasted = Scheduler.assign_picklists(picklists, pickers, start_time)
 
     print(f"Successfully assigned: {len(assignments)}")
-    print_metrics(assignments, wasted, base_date, perf_start)
-    save_results(assignments, base_date)
+    with trace.stage("metrics"):
+        print_metrics(assignments, wasted, base_date, perf_start, deferred)
+    with trace.stage("write"):
+        save_results(assignments, base_date)
+        if deferred is not None and len(deferred):
+            AdmissionFilter.save(deferred, base_date)
 
 
 if __name__ == "__main__":
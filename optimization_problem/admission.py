@@ -0,0 +1,112 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, timedelta
+from typing import Tuple
+from .config import Config
+from .core_logic import LogicCore
+
+DEFERRED_COLUMNS = ['order_id', 'sku', 'order_qty', 'zone', 'pod_priority', 'store_id', 'abs_cutoff', 'deferral_reason']
+
+
+class AdmissionFilter:
+    """
+    Batched feasibility check between loading and building (Config.ADMISSION_FILTER).
+
+    A line's earliest possible finish is one unit of it picked alone, as a one-bin,
+    one-order picklist, by a picker whose shift has started and is at or after
+    start_time. A picklist holding the line only adds bins, units and orders to that, so
+    a line whose earliest finish is after its cutoff, or after the end of every shift
+    it could start in, can never be picked on time. The builder would still score it
+    (at 0), rescan it every seed iteration and seed a Late picklist from it.
+
+    Such lines go to a deferred bucket instead of the builder, with a reason:
+    "cutoff" (too late even at start_time) or "no_shift" (no shift window fits before
+    the cutoff). The bucket has its own report and output file, and its units still
+    count as demand in the metrics.
+    """
+    @staticmethod
+    def shift_windows(base_date: date):
+        """
+        Start and end (datetime64[ns]) and picker count of every Config.SHIFTS entry.
+        """
+        starts, ends, counts = [], [], []
+        for _, start_s, end_s, count, day_offset in Config.SHIFTS:
+            day = base_date + timedelta(days=day_offset)
+            start = datetime.combine(day, datetime.strptime(start_s, "%H:%M").time())
+            end = datetime.combine(day, datetime.strptime(end_s, "%H:%M").time())
+            if end <= start:
+                end += timedelta(days=1)
+            starts.append(start)
+            ends.append(end)
+            counts.append(count)
+        return (np.array(starts, dtype='datetime64[ns]'), np.array(ends, dtype='datetime64[ns]'),
+                np.array(counts, dtype=np.int64))
+
+    @staticmethod
+    def split(df: pd.DataFrame, start_time: datetime, base_date: date) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        (admitted lines, deferred lines with a deferral_reason column).
+        """
+        earliest = np.timedelta64(int(LogicCore.min_duration() * 1e9), 'ns')
+        cutoff = df['abs_cutoff'].to_numpy(dtype='datetime64[ns]')
+        start = np.datetime64(start_time, 'ns')
+
+        starts, ends, _ = AdmissionFilter.shift_windows(base_date)
+        finish = np.maximum(starts, start) + earliest
+        # [line, shift]: one unit started in that shift ends within the shift and by the cutoff
+        fits = (finish <= ends)[None, :] & (finish[None, :] <= cutoff[:, None])
+        feasible = fits.any(axis=1)
+
+        deferred = df[~feasible]
+        reason = np.where(start + earliest > cutoff[~feasible], "cutoff", "no_shift")
+        return df[feasible], deferred.assign(deferral_reason=reason)
+
+    @staticmethod
+    def capacity_by_cutoff(df: pd.DataFrame, start_time: datetime, base_date: date) -> pd.DataFrame:
+        """
+        Per cutoff: pick seconds the lines due by then need at least (TIME_PICK_PER_UNIT per
+        unit; bins, orders and travel can be shared) against the picker seconds all shifts
+        offer between start_time and that cutoff. A shortfall means some of those lines will
+        be late however they are batched; which ones is the scheduler's call.
+        """
+        cutoffs = np.sort(df['abs_cutoff'].unique()).astype('datetime64[ns]')
+        need = df.groupby('abs_cutoff', observed=True)['order_qty'].sum().sort_index().cumsum() \
+            * Config.TIME_PICK_PER_UNIT
+
+        starts, ends, counts = AdmissionFilter.shift_windows(base_date)
+        starts = np.maximum(starts, np.datetime64(start_time, 'ns'))
+        overlap = np.minimum(ends[None, :], cutoffs[:, None]) - starts[None, :]
+        capacity = (np.clip(overlap / np.timedelta64(1, 's'), 0, None) * counts).sum(axis=1)
+
+        table = pd.DataFrame({'need_sec': need.to_numpy(dtype=float), 'capacity_sec': capacity},
+                             index=pd.Index(cutoffs, name='abs_cutoff'))
+        table['shortfall_sec'] = (table['need_sec'] - table['capacity_sec']).clip(lower=0)
+        return table
+
+    @staticmethod
+    def report(admitted: pd.DataFrame, deferred: pd.DataFrame, start_time: datetime, base_date: date) -> str:
+        total = len(admitted) + len(deferred)
+        rows = [
+            f"Admission: {len(admitted):,} of {total:,} lines admitted, {len(deferred):,} deferred "
+            f"({deferred['order_qty'].sum():,} units) as impossible to pick on time."
+        ]
+        if len(deferred):
+            by = ['deferral_reason', 'zone'] + (['pod_priority'] if 'pod_priority' in deferred.columns else [])
+            summary = deferred.groupby(by, observed=True).agg(
+                lines=('order_qty', 'size'), units=('order_qty', 'sum'), orders=('order_id', 'nunique'))
+            rows.append(summary.to_string())
+        if len(admitted):
+            capacity = AdmissionFilter.capacity_by_cutoff(admitted, start_time, base_date)
+            short = capacity[capacity['shortfall_sec'] > 0]
+            if len(short):
+                rows.append(f"Pick time exceeds picker capacity before {len(short)} cutoff(s); "
+                            f"worst shortfall {short['shortfall_sec'].max() / 3600:,.1f} picker-hours "
+                            f"by {short['shortfall_sec'].idxmax()}.")
+        return "\n".join(rows)
+
+    @staticmethod
+    def save(deferred: pd.DataFrame, base_date: date):
+        os.makedirs("output", exist_ok=True)
+        columns = [c for c in DEFERRED_COLUMNS if c in deferred.columns]
+        deferred[columns].to_csv(f"output/{base_date}_Deferred.csv", index=False)
@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+import zipfile
+import pandas as pd
+from datetime import datetime
+from typing import List, Optional
+from .columnar import PackedPicklists
+from .picklist_builder import PicklistBuilder
+
+
+class ZoneCheckpoints:
+    """
+    Built picklists of finished zone tasks, saved so a rerun only rebuilds the zones that
+    failed, changed or never finished.
+
+    Each task's picklists are one .npz of PackedPicklists arrays (rows into the task's
+    lines, quantities, scores), named by a key over the task's zone, a hash of its lines
+    and the settings that shape a build. Changing any line of a zone, CUTOFF_MAP (through
+    abs_cutoff), a constraint, a time estimate or the start time gives the zone a new key,
+    so stale files are never read; they are left in the directory until it is cleared.
+    """
+    FORMAT_VERSION = 2
+
+    def __init__(self, directory: str, start_time: datetime):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._settings = json.dumps({**PicklistBuilder.build_settings(), 'start_time': start_time.isoformat(),
+                                     'version': self.FORMAT_VERSION}, sort_keys=True)
+
+    def key(self, zone, lines: pd.DataFrame) -> str:
+        digest = hashlib.sha256(self._settings.encode())
+        digest.update(str(zone).encode())
+        digest.update(json.dumps([str(c) for c in lines.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(lines, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"zone_{key}.npz")
+
+    def save(self, key: str, picklists: List[dict]):
+        # Write next to the target and swap in, so a crash never leaves a half-written checkpoint
+        staging = self.path(key) + ".tmp"
+        with open(staging, 'wb') as fh:
+            PackedPicklists.of_picklists(picklists).save(fh)
+        os.replace(staging, self.path(key))
+
+    def load(self, key: str, zone, lines: pd.DataFrame) -> Optional[List[dict]]:
+        """
+        Picklists of the checkpoint for key, with items on a LineStore of lines (the
+        task's input), or None when there is no readable checkpoint.
+        """
+        try:
+            packed = PackedPicklists.load(self.path(key))
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return None
+        if len(packed.rows) and packed.rows.max() >= len(lines):
+            return None
+        return PicklistBuilder.unpack_picklists(zone, packed, lines)
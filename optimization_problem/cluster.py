@@ -0,0 +1,323 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import traceback
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Callable, Dict, Optional, Sequence
+from .config import Config
+from .core_logic import ATCScoringStrategy
+from .columnar import PackedPicklists
+from .instrumentation import Trace
+from .picklist_builder import PicklistBuilder
+
+# Every message is a header (type, task id, payload length) followed by the payload
+HEADER = struct.Struct("!BIQ")
+HELLO, TASK, RESULT, ERROR, HEARTBEAT, SHUTDOWN = range(1, 7)
+
+
+def _message(kind: int, task_id: int = 0, payload: bytes = b"") -> bytes:
+    return HEADER.pack(kind, task_id, len(payload)) + payload
+
+
+async def _read_message(reader: asyncio.StreamReader):
+    kind, task_id, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return kind, task_id, await reader.readexactly(length)
+
+
+def _split_address(address: str):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def encode_frame(df: pd.DataFrame) -> bytes:
+    """
+    Lines of a zone task as an uncompressed .npz: numeric, bool and datetime columns as
+    arrays, everything else as integer codes plus a str categories array, so no pickled
+    objects cross the wire.
+    """
+    arrays = {'columns': np.array([str(name) for name in df.columns], dtype=str)}
+    for i, name in enumerate(df.columns):
+        col = df[name]
+        values = None if isinstance(col.dtype, pd.CategoricalDtype) else col.to_numpy()
+        if values is not None and values.dtype != object:
+            arrays[f"values_{i}"] = values
+        else:
+            codes, uniques = pd.factorize(col)
+            arrays[f"codes_{i}"] = codes
+            arrays[f"categories_{i}"] = np.array([str(v) for v in uniques], dtype=str)
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def decode_frame(data: bytes) -> pd.DataFrame:
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        columns = {}
+        for i, name in enumerate(arrays['columns'].tolist()):
+            if f"values_{i}" in arrays:
+                columns[name] = arrays[f"values_{i}"]
+            else:
+                columns[name] = pd.Categorical.from_codes(arrays[f"codes_{i}"], arrays[f"categories_{i}"])
+    return pd.DataFrame(columns)
+
+
+class ClusterCoordinator:
+    """
+    Builds zones on ClusterWorkers over TCP (DISPATCH_MODE = "cluster").
+
+    The coordinator listens on Config.CLUSTER_ADDRESS for the length of one build; workers
+    connect and pull zone tasks, largest first, one at a time. A task carries the zone's
+    lines (encode_frame), the start time and the build settings of this Config; the
+    answer is the zone's PackedPicklists, turned back into picklists on the task's lines
+    here, so the merge and the scheduler see the same picklists as a local build.
+
+    Workers send a heartbeat every Config.CLUSTER_HEARTBEAT_SEC. A worker that misses five
+    in a row or drops its connection is dropped, and its zone goes back to the queue for
+    the next worker, up to Config.CLUSTER_MAX_ATTEMPTS times. A zone that raises on a
+    worker is a failure, not retried. If no worker is connected for
+    Config.CLUSTER_WAIT_SEC, the zones still queued fail.
+
+    Port 0 listens on a free port; bound_address holds the address workers should use
+    once listening is set.
+    """
+    def __init__(self, address: Optional[str] = None):
+        self.address = address or Config.CLUSTER_ADDRESS
+        self.timeout = Config.CLUSTER_HEARTBEAT_SEC * 5
+        self.bound_address = None
+        self.listening = threading.Event()
+
+    def build_zones(self, zones: Sequence, costs: Sequence[float], lines_of: Callable[[int], pd.DataFrame],
+                    start_time: datetime, errors: Dict[int, str],
+                    on_result: Callable[[int, object], None] = None) -> list:
+        """
+        Picklists per zone task, in task order (None where errors holds the failure).
+        lines_of(i) gives task i's lines; it is called when the task is sent.
+        """
+        self.listening.clear()
+        with Trace.current().stage("cluster_pool", tasks=len(zones)) as stage:
+            results, workers = asyncio.run(self._build(zones, costs, lines_of, start_time, errors, on_result))
+            stage["workers"] = len(workers)
+        return results
+
+    async def _build(self, zones, costs, lines_of, start_time, errors, on_result):
+        trace = Trace.current()
+        loop = asyncio.get_running_loop()
+        results = [None] * len(zones)
+        attempts = [0] * len(zones)
+        queue = asyncio.PriorityQueue()
+        for i in range(len(zones)):
+            queue.put_nowait((-costs[i], i))
+        left = len(zones)
+        finished = asyncio.Event()
+        if not left:
+            finished.set()
+        connected, seen, handlers = set(), set(), set()
+        settings = PicklistBuilder.build_settings()
+
+        def finish(i):
+            nonlocal left
+            left -= 1
+            if left == 0:
+                finished.set()
+
+        def reassign(i, reason: str):
+            attempts[i] += 1
+            trace.count("cluster_retries")
+            if attempts[i] >= Config.CLUSTER_MAX_ATTEMPTS:
+                errors[i] = f"Gave up after {attempts[i]} attempts; last: {reason}"
+                finish(i)
+            else:
+                queue.put_nowait((-costs[i], i))
+
+        async def next_task():
+            get, done = asyncio.ensure_future(queue.get()), asyncio.ensure_future(finished.wait())
+            await asyncio.wait({get, done}, return_when=asyncio.FIRST_COMPLETED)
+            done.cancel()
+            if get.done():
+                return get.result()[1]
+            get.cancel()
+            return None
+
+        async def serve_worker(reader, writer):
+            handlers.add(asyncio.current_task())
+            name, current = None, None
+            try:
+                kind, _, payload = await asyncio.wait_for(_read_message(reader), self.timeout)
+                if kind != HELLO:
+                    return
+                name = json.loads(payload)["name"]
+                connected.add(name)
+                seen.add(name)
+                while (current := await next_task()) is not None:
+                    lines = lines_of(current)
+                    header = json.dumps({"zone": str(zones[current]), "start_time": start_time.isoformat(),
+                                         "settings": settings}).encode()
+                    writer.write(_message(TASK, current, struct.pack("!I", len(header)) + header + encode_frame(lines)))
+                    await writer.drain()
+                    while True:
+                        kind, task_id, payload = await asyncio.wait_for(_read_message(reader), self.timeout)
+                        if kind == HEARTBEAT or task_id != current:
+                            continue
+                        if kind == RESULT:
+                            packed = PackedPicklists.load(io.BytesIO(payload))
+                            picklists = await loop.run_in_executor(
+                                None, PicklistBuilder.unpack_picklists, zones[current], packed, lines)
+                            results[current] = picklists
+                            if on_result is not None:
+                                on_result(current, picklists)
+                        else:
+                            errors[current] = f"On worker {name}:\n{payload.decode()}"
+                        finish(current)
+                        current = None
+                        break
+                writer.write(_message(SHUTDOWN))
+                await writer.drain()
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError) as exc:
+                if current is not None:
+                    reason = f"worker {name} lost ({type(exc).__name__})"
+                    print(f"Zone {zones[current]}: {reason}; reassigning.")
+                    reassign(current, reason)
+            except Exception:
+                # A bad payload or a failing on_result fails the zone instead of leaving it in flight
+                if current is not None:
+                    errors[current] = f"Serving worker {name}:\n{traceback.format_exc()}"
+                    finish(current)
+            finally:
+                connected.discard(name)
+                writer.close()
+
+        host, port = _split_address(self.address)
+        server = await asyncio.start_server(serve_worker, host, port)
+        self.bound_address = f"{host}:{server.sockets[0].getsockname()[1]}"
+        self.listening.set()
+        print(f"Coordinating {len(zones)} zone tasks on {self.bound_address}; waiting for workers...")
+        last_worker = time.monotonic()
+        async with server:
+            while not finished.is_set():
+                try:
+                    await asyncio.wait_for(finished.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                if connected:
+                    last_worker = time.monotonic()
+                elif time.monotonic() - last_worker > Config.CLUSTER_WAIT_SEC:
+                    while not queue.empty():
+                        _, i = queue.get_nowait()
+                        errors[i] = f"No worker connected for {Config.CLUSTER_WAIT_SEC} s"
+                        finish(i)
+            server.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+        trace.count("cluster_workers", len(seen))
+        return results, seen
+
+
+class ClusterWorker:
+    """
+    Remote zone builder. Connects to a ClusterCoordinator, builds each zone it is sent
+    with PicklistBuilder under the coordinator's build settings and sends back the zone's
+    PackedPicklists; a side thread sends heartbeats meanwhile. Stops when the coordinator
+    shuts it down, or with forever=True reconnects for the next build.
+    """
+    def __init__(self, address: str, name: Optional[str] = None):
+        self.address = address
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+
+    def run(self, forever: bool = False, connect_timeout: float = 60.0):
+        while True:
+            sock = self._connect(connect_timeout)
+            if sock is None:
+                print(f"No coordinator on {self.address} after {connect_timeout:.0f} s.")
+                return
+            self._serve(sock)
+            if not forever:
+                return
+
+    def _connect(self, timeout: float) -> Optional[socket.socket]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                return socket.create_connection(_split_address(self.address))
+            except OSError:
+                time.sleep(0.5)
+        return None
+
+    def _serve(self, sock: socket.socket):
+        lock, stop = threading.Lock(), threading.Event()
+
+        def send(kind: int, task_id: int = 0, payload: bytes = b""):
+            with lock:
+                sock.sendall(_message(kind, task_id, payload))
+
+        def heartbeat():
+            while not stop.wait(Config.CLUSTER_HEARTBEAT_SEC):
+                try:
+                    send(HEARTBEAT)
+                except OSError:
+                    return
+
+        reader = sock.makefile('rb')
+        try:
+            send(HELLO, 0, json.dumps({"name": self.name}).encode())
+            threading.Thread(target=heartbeat, daemon=True).start()
+            while True:
+                header = reader.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return
+                kind, task_id, length = HEADER.unpack(header)
+                payload = reader.read(length)
+                if kind == SHUTDOWN:
+                    return
+                if kind == TASK:
+                    try:
+                        result = self.build(payload)
+                    except Exception:
+                        send(ERROR, task_id, traceback.format_exc().encode())
+                    else:
+                        send(RESULT, task_id, result)
+        except OSError:
+            return
+        finally:
+            stop.set()
+            reader.close()
+            sock.close()
+
+    @staticmethod
+    def build(payload: bytes) -> bytes:
+        """
+        Build one TASK payload and return the RESULT payload.
+        """
+        (header_len,) = struct.unpack_from("!I", payload)
+        header = json.loads(payload[4:4 + header_len])
+        lines = decode_frame(payload[4 + header_len:])
+        settings = header["settings"]
+        settings["FRAGILE_ZONES"] = set(settings["FRAGILE_ZONES"])
+        for name, value in settings.items():
+            setattr(Config, name, value)
+
+        start_time = datetime.fromisoformat(header["start_time"])
+        picklists = PicklistBuilder(lines, start_time, strategy=ATCScoringStrategy()).generate_picklists()
+        buffer = io.BytesIO()
+        PackedPicklists.of_picklists(picklists).save(buffer)
+        return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zone build worker for DISPATCH_MODE = 'cluster'")
+    parser.add_argument("address", nargs="?", default=Config.CLUSTER_ADDRESS, help="coordinator host:port")
+    parser.add_argument("--name", default=None)
+    parser.add_argument("--forever", action="store_true", help="reconnect for the next build after each one")
+    parser.add_argument("--connect-timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    ClusterWorker(args.address, args.name).run(args.forever, args.connect_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List
+from .travel import TravelTimeIndex
+
+LOCATION_COLUMNS = ('floor', 'aisle', 'rack')
+CODE_COLUMNS = ('store_idx', 'order_idx', 'key_idx')
+
+
+class ZoneColumns:
+    """
+    Typed column arrays for the order lines of one zone.
+    Row i of every array refers to row i of the frame the columns were built from.
+    """
+    __slots__ = (
+        'qty', 'weight', 'cutoff_ns', 'bin_rank', 'location_rank', 'max_pods',
+        'store_idx', 'order_idx', 'key_idx', 'floor_code', 'aisle_pos', 'n_keys', 'n_orders',
+    )
+
+    def __init__(self, qty, weight, cutoff_ns, bin_rank, location_rank, max_pods, store_idx, order_idx, key_idx,
+                 floor_code, aisle_pos):
+        self.qty = qty
+        self.weight = weight
+        self.cutoff_ns = cutoff_ns
+        self.bin_rank = bin_rank
+        self.location_rank = location_rank
+        self.max_pods = max_pods
+        self.store_idx = store_idx
+        self.order_idx = order_idx
+        self.key_idx = key_idx
+        # Travel cells (TravelTimeIndex.location_arrays)
+        self.floor_code = floor_code
+        self.aisle_pos = aisle_pos
+        self.n_keys = int(key_idx.max()) + 1 if len(key_idx) else 0
+        self.n_orders = int(order_idx.max()) + 1 if len(order_idx) else 0
+
+    def __len__(self):
+        return len(self.qty)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ZoneColumns":
+        return cls(**cls.frame_arrays(df))
+
+    @classmethod
+    def from_partition(cls, arrays: Dict[str, np.ndarray], start: int, stop: int) -> "ZoneColumns":
+        """
+        Columns for rows [start, stop) of arrays produced by frame_arrays over a zone-sorted frame.
+        Codes are re-numbered densely so per-zone totals stay zone sized.
+        """
+        part = {name: arr[start:stop] for name, arr in arrays.items()}
+        for name in CODE_COLUMNS:
+            part[name] = np.unique(part[name], return_inverse=True)[1]
+        return cls(**part)
+
+    @classmethod
+    def frame_arrays(cls, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        order_idx, _ = pd.factorize(df['order_id'], use_na_sentinel=False)
+        sku_idx, skus = pd.factorize(df['sku'], use_na_sentinel=False)
+        store_idx, _ = pd.factorize(df['store_id'], use_na_sentinel=False)
+        # (order_id, sku) pairs share one remaining quantity
+        key_idx, _ = pd.factorize(order_idx.astype(np.int64) * max(len(skus), 1) + sku_idx)
+
+        bin_rank = df['bin_rank'].to_numpy() if 'bin_rank' in df.columns else np.zeros(len(df), dtype=np.int64)
+        floor_code, aisle_pos = TravelTimeIndex.location_arrays(df)
+
+        return {
+            'qty': df['order_qty'].to_numpy(),
+            'weight': df['weight_in_grams'].to_numpy(dtype=float),
+            'cutoff_ns': df['abs_cutoff'].to_numpy(dtype='datetime64[ns]').astype(np.int64),
+            'bin_rank': bin_rank,
+            'location_rank': cls._location_rank(df, bin_rank),
+            'max_pods': df['pods_per_picklist_in_that_zone'].to_numpy(),
+            'store_idx': store_idx,
+            'order_idx': order_idx,
+            'key_idx': key_idx,
+            'floor_code': floor_code,
+            'aisle_pos': aisle_pos,
+        }
+
+    @staticmethod
+    def _location_rank(df: pd.DataFrame, bin_rank: np.ndarray) -> np.ndarray:
+        """
+        Position of each row in the static (floor, aisle, rack, bin_rank) walk order.
+        Location columns compare as strings, exactly like the record builder's sort key,
+        and ties fall back to row order since lexsort is stable.
+        """
+        keys = [bin_rank]
+        for col in reversed(LOCATION_COLUMNS):
+            if col in df.columns:
+                keys.append(np.array([str(v) for v in df[col].tolist()]))
+        order = np.lexsort(keys)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        return rank
+
+
+class RowGroups:
+    """
+    Rows grouped by an integer code (CSR layout), e.g. all lines of an order.
+    """
+    __slots__ = ('order', 'offsets')
+
+    def __init__(self, codes: np.ndarray, n_codes: int):
+        self.order = np.argsort(codes, kind='stable')
+        self.offsets = np.zeros(n_codes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=n_codes), out=self.offsets[1:])
+
+    def rows(self, codes) -> np.ndarray:
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in codes])
+
+
+class PackedPicklists:
+    """
+    Columnar picks of one zone packed into flat arrays, so results cross process
+    boundaries as a handful of buffers instead of lists of item dicts.
+    Picklist i owns entries offsets[i]:offsets[i + 1]. float_qty marks the quantities the
+    builder produced as floats (weight-limited picks), so unpack restores each one's type.
+    """
+    __slots__ = ('rows', 'qty', 'float_qty', 'scores', 'completing', 'offsets', 'store_counts')
+
+    def __init__(self, rows, qty, float_qty, scores, completing, offsets, store_counts):
+        self.rows = rows
+        self.qty = qty
+        self.float_qty = float_qty
+        self.scores = scores
+        self.completing = completing
+        self.offsets = offsets
+        self.store_counts = store_counts
+
+    def __len__(self):
+        return len(self.store_counts)
+
+    @classmethod
+    def pack(cls, picklists: Iterable, row_offset: int = 0) -> "PackedPicklists":
+        """
+        Pack (picked, units, stores) tuples as yielded by PicklistBuilder.build_zone_columns.
+        """
+        rows, qty, scores, completing, offsets, store_counts = [], [], [], [], [0], []
+        for picked, _, stores in picklists:
+            for row, q, score, is_completing in picked:
+                rows.append(row + row_offset)
+                qty.append(q)
+                scores.append(score)
+                completing.append(is_completing)
+            offsets.append(len(rows))
+            store_counts.append(len(stores))
+        return cls(
+            np.array(rows, dtype=np.int64), np.array(qty, dtype=float), _float_mask(qty), np.array(scores, dtype=float),
+            np.array(completing, dtype=bool), np.array(offsets, dtype=np.int64), np.array(store_counts, dtype=np.int64),
+        )
+
+    @classmethod
+    def of_picklists(cls, picklists: List[dict]) -> "PackedPicklists":
+        """
+        Pack built picklists whose items are PickedItems on one LineStore.
+        """
+        items = [item for pl in picklists for item in pl['items']]
+        return cls(
+            np.array([item.row for item in items], dtype=np.int64),
+            np.array([item.qty for item in items], dtype=float),
+            _float_mask([item.qty for item in items]),
+            np.array([item.atc_score for item in items], dtype=float),
+            np.array([bool(item.is_completing) for item in items], dtype=bool),
+            np.cumsum([0] + [len(pl['items']) for pl in picklists]).astype(np.int64),
+            np.array([pl['store_count'] for pl in picklists], dtype=np.int64),
+        )
+
+    def save(self, fh):
+        """
+        Write the arrays as an uncompressed .npz (no pickled objects) to a binary file.
+        """
+        np.savez(fh, **{name: getattr(self, name) for name in self.__slots__})
+
+    @classmethod
+    def load(cls, fh) -> "PackedPicklists":
+        with np.load(fh, allow_pickle=False) as arrays:
+            return cls(*(arrays[name] for name in cls.__slots__))
+
+    def unpack(self) -> List[tuple]:
+        """
+        Back to (picked, units, store_count) tuples, with int and float quantities as built.
+        """
+        qty = [q if is_float else int(q) for q, is_float in zip(self.qty.tolist(), self.float_qty.tolist())]
+        rows, scores, completing = self.rows.tolist(), self.scores.tolist(), self.completing.tolist()
+        picklists = []
+        for i, store_count in enumerate(self.store_counts.tolist()):
+            start, stop = self.offsets[i], self.offsets[i + 1]
+            picked = list(zip(rows[start:stop], qty[start:stop], scores[start:stop], completing[start:stop]))
+            picklists.append((picked, sum(qty[start:stop]), store_count))
+        return picklists
+
+
+def _float_mask(qty: List) -> np.ndarray:
+    return np.array([isinstance(q, (float, np.floating)) for q in qty], dtype=bool)
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from .config import Config
+from .data_loader import DataLoader
+
+
+class CompiledDataset:
+    """
+    Cleaned, typed and zone-sorted input stored as one .npy file per column plus a zone
+    offset index in manifest.json. Reloads memory-map the columns, so a run starts
+    without re-parsing the CSV and a worker only touches its own zone's pages.
+
+    String columns are stored as integer codes with a separate categories file.
+    The cache is stale when the source file's hash or Config.CUTOFF_MAP changes.
+    """
+    FORMAT_VERSION = 1
+    MANIFEST = "manifest.json"
+
+    def __init__(self, directory: str, manifest: dict, columns: Dict[str, np.ndarray],
+                 categories: Dict[str, np.ndarray]):
+        self.directory = directory
+        self.manifest = manifest
+        self.columns = columns
+        self.categories = categories
+        self.zones: List[Tuple[str, int, int]] = [tuple(z) for z in manifest['zones']]
+
+    def __len__(self):
+        return self.manifest['n_rows']
+
+    @classmethod
+    def open_or_compile(cls, source: str, directory: str) -> "CompiledDataset":
+        dataset = cls.open(source, directory)
+        if dataset is None:
+            cls.compile(source, directory)
+            dataset = cls.load(directory)
+        return dataset
+
+    @classmethod
+    def open(cls, source: str, directory: str, mmap_mode: Optional[str] = 'r') -> Optional["CompiledDataset"]:
+        """
+        Memory-map a compiled dataset, or return None if it is missing or stale for source.
+        """
+        manifest_path = os.path.join(directory, cls.MANIFEST)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as fh:
+            manifest = json.load(fh)
+        if manifest.get('cache_key') != cls.cache_key(source):
+            return None
+        return cls.load(directory, mmap_mode)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = 'r') -> "CompiledDataset":
+        """
+        Map a compiled dataset without checking it against its source (e.g. in workers).
+        """
+        with open(os.path.join(directory, cls.MANIFEST)) as fh:
+            manifest = json.load(fh)
+        columns, categories = {}, {}
+        for name, kind in manifest['columns'].items():
+            columns[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            if kind == 'categorical':
+                categories[name] = np.load(os.path.join(directory, f"{name}.categories.npy"))
+        return cls(directory, manifest, columns, categories)
+
+    @classmethod
+    def compile(cls, source: str, directory: str):
+        df, _ = DataLoader.load_and_clean(source)
+        print(f"Compiling {len(df):,} lines to {directory}...")
+
+        codes, zone_names = pd.factorize(df['zone'])
+        valid = np.flatnonzero(codes >= 0)
+        order = valid[np.argsort(codes[valid], kind='stable')]
+        df = df.iloc[order]
+        counts = np.bincount(codes[valid], minlength=len(zone_names))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        # Write next to the target and swap in, so readers never see a half-written dataset
+        staging = directory.rstrip(os.sep) + ".tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        kinds = {}
+        for name in df.columns:
+            col = df[name]
+            if pd.api.types.is_numeric_dtype(col) or pd.api.types.is_datetime64_any_dtype(col):
+                kinds[name] = 'array'
+                np.save(os.path.join(staging, f"{name}.npy"), col.to_numpy())
+            else:
+                kinds[name] = 'categorical'
+                col = col.astype('category')
+                np.save(os.path.join(staging, f"{name}.npy"), col.cat.codes.to_numpy())
+                np.save(os.path.join(staging, f"{name}.categories.npy"),
+                        np.array([str(c) for c in col.cat.categories], dtype=str))
+
+        manifest = {
+            'cache_key': cls.cache_key(source),
+            'n_rows': len(df),
+            'columns': kinds,
+            'zones': [[str(zone), int(offsets[i]), int(offsets[i + 1])] for i, zone in enumerate(zone_names)],
+        }
+        with open(os.path.join(staging, cls.MANIFEST), 'w') as fh:
+            json.dump(manifest, fh)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+
+    @classmethod
+    def cache_key(cls, source: str) -> str:
+        digest = hashlib.sha256()
+        with open(source, 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 20), b''):
+                digest.update(block)
+        digest.update(json.dumps(Config.CUTOFF_MAP, sort_keys=True).encode())
+        digest.update(str(cls.FORMAT_VERSION).encode())
+        return digest.hexdigest()
+
+    def frame(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """
+        Rows [start, stop) as a DataFrame; only those slices of the mapped columns are read.
+        """
+        stop = len(self) if stop is None else stop
+        data = {}
+        for name, arr in self.columns.items():
+            values = np.array(arr[start:stop])
+            if name in self.categories:
+                data[name] = pd.Categorical.from_codes(values, self.categories[name])
+            else:
+                data[name] = values
+        return pd.DataFrame(data, index=pd.RangeIndex(start, stop))
@@ -12,8 +12,81 @@ class Config:
     TIME_ZONE_TO_STAGING = 120
     TIME_UNLOAD_PER_ORDER = 30
     
+    # Duration model: "flat" (TIME_BIN_TO_BIN per unique bin) or "travel" (an S-shaped route
+    # over the visited floors and aisles, from a per-zone travel-time index, plus
+    # TRAVEL_BIN_STOP_SEC per unique bin). Travel: walking one aisle end to end, the cross
+    # aisle per aisle number between a floor's outermost visited aisles, each extra floor.
+    DURATION_MODEL = "flat"
+    TRAVEL_AISLE_SEC = 20
+    TRAVEL_CROSS_AISLE_SEC = 4
+    TRAVEL_FLOOR_SEC = 60
+    TRAVEL_BIN_STOP_SEC = 10
+
     # ATC Lookahead Factor
     ATC_K = 2.0 
+
+    # Picklist builder engine: "records" (dict based), "columnar" (NumPy arrays)
+    # or "indexed" (columnar with an incremental seed index)
+    BUILDER_MODE = "records"
+
+    # Zone dispatch to pool workers: "frames" (pickled DataFrame per zone),
+    # "shared" (zone-sorted columns in shared memory, workers get offsets) or "cluster"
+    # (zone lines sent over TCP to `python -m optimization_problem.cluster` workers)
+    DISPATCH_MODE = "frames"
+
+    # Cluster dispatch: the coordinator listens here for the length of a build. Workers
+    # heartbeat every CLUSTER_HEARTBEAT_SEC and are dropped after five missed beats; their
+    # zone is retried elsewhere up to CLUSTER_MAX_ATTEMPTS times. Queued zones fail after
+    # CLUSTER_WAIT_SEC without any connected worker.
+    CLUSTER_ADDRESS = "127.0.0.1:7700"
+    CLUSTER_HEARTBEAT_SEC = 2.0
+    CLUSTER_MAX_ATTEMPTS = 3
+    CLUSTER_WAIT_SEC = 60
+
+    # Zones with more lines than this are built as sub-partitions of whole
+    # (floor, aisle) locations and merged afterwards. None disables splitting.
+    ZONE_SPLIT_LINES = None
+    ZONE_SPLIT_COLUMNS = ("floor", "aisle")
+
+    # Stream input.csv in chunks of this many rows into per-zone partition files
+    # instead of loading it whole. None loads the file in one go.
+    STREAM_CHUNK_ROWS = None
+
+    # Directory of the compiled (.npy per column) copy of input.csv. When set, runs
+    # memory-map it and only recompile when input.csv or CUTOFF_MAP changes.
+    COMPILED_DATA_DIR = None
+
+    # Directory of per-zone build checkpoints. When set, finished zones are saved as they
+    # arrive and reruns rebuild only zones whose lines or build settings changed, or that
+    # failed. None disables checkpoints.
+    CHECKPOINT_DIR = None
+
+    # Schedule and write the plan even if some zone builds failed, leaving their lines
+    # unplanned. False raises ZoneBuildError once the other zones are built (and checkpointed).
+    ALLOW_PARTIAL_PLAN = False
+
+    # Keep lines that cannot be picked on time even alone at the start time (or in any shift
+    # before their cutoff) out of the build, in a deferred bucket with its own report.
+    # In-memory runs only: raises with COMPILED_DATA_DIR or STREAM_CHUNK_ROWS.
+    ADMISSION_FILTER = False
+
+    # Seconds of merge/move/swap local search per zone after the build (run in the worker
+    # pool). None skips the improvement stage. Flat DURATION_MODEL only: raises with "travel".
+    LOCAL_SEARCH_SECONDS = None
+
+    # Picker assignment: "legacy" (single picker heap) or "pooled" (per-shift picker pools)
+    SCHEDULER_MODE = "legacy"
+
+    # Schedule zones as their builds finish and write assignments from a writer thread as
+    # they are made, instead of build, then schedule, then write. Same plan as the staged
+    # run; needs SCHEDULER_MODE = "pooled" and SCHEDULE_ORDER = "edd". In-memory runs
+    # only: raises with COMPILED_DATA_DIR, STREAM_CHUNK_ROWS or LOCAL_SEARCH_SECONDS.
+    PIPELINE = False
+
+    # Order the pooled scheduler takes pending picklists in: "input" (builder order),
+    # "edd" (earliest deadline first) or "atc" (apparent tardiness cost at picker time)
+    SCHEDULE_ORDER = "input"
+    SCHEDULE_ATC_K = 2.0
     
     # Shift Definitions: (Name, Start, End, Count, DayOffset)
     SHIFTS = [
@@ -30,3 +103,18 @@ class Config:
     }
     
     GLOBAL_START_TIME_STR = "21:00"
+
+    # Write a JSON trace of stage timings, counters and per-zone worker stats here. None disables it.
+    TRACE_PATH = None
+    # With TRACE_PATH set, also dump a cProfile per pool worker (worker_<pid>.prof) into this directory
+    PROFILE_DIR = None
+
+    # Address of a resident planning service (python -m optimization_problem.service),
+    # "unix:/path/to.sock" or "host:port". When set, main.py asks it for the plan instead of
+    # planning in-process. Up to SERVICE_QUEUE_SIZE requests wait; more are refused (503).
+    PLANNING_SERVICE = None
+    SERVICE_QUEUE_SIZE = 8
+
+    # Result files: "files" (one CSV per picklist) or "single" (one CSV plus a byte-offset index)
+    OUTPUT_LAYOUT = "files"
+    OUTPUT_WRITER_THREADS = 8
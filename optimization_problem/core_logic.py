@@ -1,8 +1,11 @@
 from abc import ABC, abstractmethod
+import bisect
 import math
-from datetime import datetime
-from typing import Dict, List
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
 from .config import Config
+from .travel import RouteState, item_cell, items_prefix_costs
 
 
 class ScoringStrategy(ABC):
@@ -10,6 +13,16 @@ class ScoringStrategy(ABC):
     def calculate_score(self, item: Dict, current_time: datetime) -> float:
         pass
 
+    def calculate_scores(self, qty: np.ndarray, time_until_cutoff: np.ndarray, current_time: datetime) -> np.ndarray:
+        """
+        Batched scoring used by the columnar builder. Falls back to calculate_score per line;
+        strategies that can score with array ops should override this.
+        """
+        return np.array([
+            self.calculate_score({'order_qty': q, 'abs_cutoff': current_time + timedelta(seconds=t)}, current_time)
+            for q, t in zip(qty.tolist(), time_until_cutoff.tolist())
+        ], dtype=float)
+
 
 class ATCScoringStrategy(ScoringStrategy):
     def calculate_score(self, item: Dict, current_time: datetime) -> float:
@@ -30,8 +43,34 @@ class ATCScoringStrategy(ScoringStrategy):
 
         return pick_density * urgency
 
+    def calculate_scores(self, qty: np.ndarray, time_until_cutoff: np.ndarray, current_time: datetime) -> np.ndarray:
+        process_time = Config.TIME_BIN_TO_BIN + (qty * Config.TIME_PICK_PER_UNIT)
+        pick_density = qty / process_time
+
+        overhead = Config.TIME_START_TO_ZONE + Config.TIME_ZONE_TO_STAGING
+        slack = (time_until_cutoff - process_time - overhead)
+
+        exponent = - np.maximum(slack, 0) / Config.ATC_K
+        # Only exponents above the float underflow point give a non-zero urgency. Those few go
+        # through math.exp so batched scores stay bit-identical to calculate_score.
+        urgency = np.zeros(len(exponent))
+        live = np.flatnonzero(exponent > -746.0)
+        urgency[live] = [math.exp(x) for x in exponent[live].tolist()]
+
+        return np.where(slack < 0, 0.0, pick_density * urgency)
+
 
 class LogicCore:
+    # Calls of duration_from_counts in this process, for the run trace
+    duration_estimates = 0
+    DURATION_MODELS = ("flat", "travel")
+
+    @staticmethod
+    def travel_model() -> bool:
+        if Config.DURATION_MODEL not in LogicCore.DURATION_MODELS:
+            raise ValueError(f"Unknown duration model: {Config.DURATION_MODEL}")
+        return Config.DURATION_MODEL == "travel"
+
     @staticmethod
     def estimate_picklist_duration(items: List[dict]) -> float:
         if not items:
@@ -40,12 +79,204 @@ class LogicCore:
         unique_bins = set(i.get('bin_rank', 0) for i in items)
         unique_orders = set(i['order_id'] for i in items)
         total_units = sum(i['order_qty'] for i in items)
+        travel_sec = RouteState(item_cell(i) for i in items).cost if LogicCore.travel_model() else None
 
+        return LogicCore.duration_from_counts(len(unique_bins), total_units, len(unique_orders), travel_sec)
+
+    @staticmethod
+    def duration_from_counts(n_bins: int, total_units: float, n_orders: int, travel_sec: float = None) -> float:
+        """
+        Flat model (travel_sec None): TIME_BIN_TO_BIN per bin. Travel model: the route's
+        walking seconds plus TRAVEL_BIN_STOP_SEC per bin.
+        """
+        LogicCore.duration_estimates += 1
+        if travel_sec is None:
+            bins_sec = n_bins * Config.TIME_BIN_TO_BIN
+        else:
+            bins_sec = n_bins * Config.TRAVEL_BIN_STOP_SEC + travel_sec
         duration = (
             Config.TIME_START_TO_ZONE +
-            (len(unique_bins) * Config.TIME_BIN_TO_BIN) +
+            bins_sec +
             (total_units * Config.TIME_PICK_PER_UNIT) +
-            (len(unique_orders) * Config.TIME_UNLOAD_PER_ORDER) +
+            (n_orders * Config.TIME_UNLOAD_PER_ORDER) +
             Config.TIME_ZONE_TO_STAGING
         )
         return duration
+
+    @staticmethod
+    def min_duration() -> float:
+        """
+        Duration of the shortest possible picklist: one unit of one order from one bin.
+        """
+        return LogicCore.duration_from_counts(1, 1, 1, Config.TRAVEL_AISLE_SEC if LogicCore.travel_model() else None)
+
+    @staticmethod
+    def duration_state(items: Iterable[dict] = ()) -> "PicklistDurationState":
+        """
+        Running duration of a picklist under Config.DURATION_MODEL.
+        """
+        return TravelDurationState(items) if LogicCore.travel_model() else PicklistDurationState(items)
+
+
+class PicklistDurationState:
+    """
+    Running LogicCore duration of a growing picklist. Keeps the unique bins, unique orders
+    and total units, so asking what adding a line would cost (what_if_add) and adding it
+    (commit) are both O(1) instead of re-estimating the whole picklist. what_if and add
+    take the line's travel cell too, which only TravelDurationState uses.
+    """
+    __slots__ = ('bins', 'orders', 'units')
+
+    def __init__(self, items: Iterable[dict] = ()):
+        self.bins = set()
+        self.orders = set()
+        self.units = 0
+        for item in items:
+            self.commit(item)
+
+    @property
+    def duration(self) -> float:
+        if not self.orders:
+            return 0.0
+        return LogicCore.duration_from_counts(len(self.bins), self.units, len(self.orders))
+
+    def what_if_add(self, item: dict) -> float:
+        return self.what_if(item.get('bin_rank', 0), item['order_id'], item['order_qty'])
+
+    def commit(self, item: dict):
+        self.add(item.get('bin_rank', 0), item['order_id'], item['order_qty'])
+
+    def what_if(self, bin_key, order_key, units: float, cell: tuple = None) -> float:
+        return LogicCore.duration_from_counts(
+            len(self.bins) + (bin_key not in self.bins),
+            self.units + units,
+            len(self.orders) + (order_key not in self.orders),
+        )
+
+    def add(self, bin_key, order_key, units: float, cell: tuple = None):
+        self.bins.add(bin_key)
+        self.orders.add(order_key)
+        self.units += units
+
+
+class TravelDurationState(PicklistDurationState):
+    """
+    PicklistDurationState of the travel model: also keeps the RouteState of the cells
+    visited, so the route cost of a line is an O(1) lookup as well.
+    """
+    __slots__ = ('route',)
+
+    def __init__(self, items: Iterable[dict] = ()):
+        self.route = RouteState()
+        super().__init__(items)
+
+    @property
+    def duration(self) -> float:
+        if not self.orders:
+            return 0.0
+        return LogicCore.duration_from_counts(len(self.bins), self.units, len(self.orders), self.route.cost)
+
+    def what_if_add(self, item: dict) -> float:
+        return self.what_if(item.get('bin_rank', 0), item['order_id'], item['order_qty'], item_cell(item))
+
+    def commit(self, item: dict):
+        self.add(item.get('bin_rank', 0), item['order_id'], item['order_qty'], item_cell(item))
+
+    def what_if(self, bin_key, order_key, units: float, cell: tuple = None) -> float:
+        return LogicCore.duration_from_counts(
+            len(self.bins) + (bin_key not in self.bins),
+            self.units + units,
+            len(self.orders) + (order_key not in self.orders),
+            self.route.cost + self.route.added_cost(cell),
+        )
+
+    def add(self, bin_key, order_key, units: float, cell: tuple = None):
+        super().add(bin_key, order_key, units)
+        self.route.add(cell)
+
+
+class PicklistProfile:
+    """
+    Cumulative LogicCore duration components of a picklist's items, in order, for splitting.
+
+    durations[k - 1] and deadlines[k - 1] are the duration and earliest cutoff of the first
+    k items. Both are monotone in k, so once computed the longest prefix that fits a time
+    window is a binary search; they are extended lazily, only as far as a query needs.
+
+    Remainder headers come from suffix aggregates (unique bins, orders, stores, units and
+    earliest cutoff of items[k:]), computed once from the first split point to the end.
+    A remainder's profile shares them at an offset, so later splits of the same picklist
+    read their remainder headers without rescanning items. Under the travel model the
+    prefix route grows in a RouteState and the suffix routes are one batched pass.
+    """
+    __slots__ = ('items', 'durations', 'deadlines', '_state', '_suffix', '_offset')
+
+    def __init__(self, items: List[dict], suffix: "_SuffixAggregates" = None, offset: int = 0):
+        self.items = items
+        self.durations = []
+        self.deadlines = []
+        self._state = LogicCore.duration_state()
+        self._suffix = suffix
+        self._offset = offset
+
+    def longest_prefix(self, max_seconds: float) -> int:
+        """
+        Number of leading items whose duration stays within max_seconds.
+        """
+        durations, deadlines = self.durations, self.deadlines
+        if durations and durations[-1] > max_seconds:
+            return bisect.bisect_right(durations, max_seconds)
+        state, items = self._state, self.items
+        route = getattr(state, 'route', None)
+        while len(durations) < len(items):
+            item = items[len(durations)]
+            if route is None:
+                state.add(item.get('bin_rank', 0), item['order_id'], item['order_qty'])
+                durations.append(LogicCore.duration_from_counts(len(state.bins), state.units, len(state.orders)))
+            else:
+                state.commit(item)
+                durations.append(state.duration)
+            cutoff = item['abs_cutoff']
+            deadlines.append(cutoff if not deadlines or cutoff < deadlines[-1] else deadlines[-1])
+            if durations[-1] > max_seconds:
+                return len(durations) - 1
+        return len(durations)
+
+    def remainder(self, taken: int):
+        """
+        Header of items[taken:] as (duration, deadline, units, store_count), and its profile.
+        """
+        if self._suffix is None:
+            self._suffix, self._offset = _SuffixAggregates(self.items[taken:]), -taken
+        suffix, k = self._suffix, self._offset + taken
+        travel_sec = suffix.travel[k] if suffix.travel is not None else None
+        duration = LogicCore.duration_from_counts(suffix.bins[k], suffix.units[k], suffix.orders[k], travel_sec)
+        header = (duration, suffix.deadlines[k], suffix.units[k], suffix.stores[k])
+        return header, PicklistProfile(self.items[taken:], suffix, k)
+
+
+class _SuffixAggregates:
+    """
+    Per start index k: unique bins, unique orders, unique stores, units and earliest
+    cutoff of items[k:], and under the travel model its route seconds (None otherwise).
+    """
+    __slots__ = ('bins', 'orders', 'stores', 'units', 'deadlines', 'travel')
+
+    def __init__(self, items: List[dict]):
+        n = len(items)
+        self.bins, self.orders, self.stores = [0] * (n + 1), [0] * (n + 1), [0] * (n + 1)
+        self.units, self.deadlines = [0] * (n + 1), [None] * (n + 1)
+        bins, orders, stores = set(), set(), set()
+        for k in range(n - 1, -1, -1):
+            item = items[k]
+            bins.add(item.get('bin_rank', 0))
+            orders.add(item['order_id'])
+            stores.add(item['store_id'])
+            self.bins[k], self.orders[k], self.stores[k] = len(bins), len(orders), len(stores)
+            self.units[k] = item['order_qty'] + self.units[k + 1]
+            cutoff, later = item['abs_cutoff'], self.deadlines[k + 1]
+            self.deadlines[k] = cutoff if later is None or cutoff < later else later
+        self.travel = None
+        if LogicCore.travel_model():
+            # Suffix routes are the prefix routes of the reversed items
+            self.travel = items_prefix_costs(items[::-1])[::-1].tolist() + [0.0]
@@ -1,39 +1,101 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from typing import Dict, Optional
 from .config import Config
+from .zone_partitions import ZonePartitionFiles
 
 class DataLoader:
+    # Columns the pipeline reads; anything else in the file is skipped at parse time
+    USED_COLUMNS = {
+        'dt', 'order_id', 'sku', 'order_qty', 'weight_in_grams', 'zone', 'pod_priority', 'store_id',
+        'bin', 'bin_rank', 'floor', 'aisle', 'rack', 'pods_per_picklist_in_that_zone',
+    }
+    # sku and store_id keep their natural dtype, so numeric ids still sort as numbers
+    CATEGORICAL_COLUMNS = ('zone', 'pod_priority')
+    DTYPES = {'weight_in_grams': 'float64'}
+    BASE_DATE = datetime(2025, 8, 12).date()
+
     @staticmethod
-    def load_and_clean(filepath: str):
+    def load_and_clean(filepath: str, categorical: bool = True, dtypes: Optional[Dict[str, str]] = None):
         print(f"Loading data from {filepath}...")
-        df = pd.read_csv(filepath)
-        
+        df = pd.read_csv(filepath, **DataLoader._read_options(filepath, categorical, dtypes))
+        return DataLoader._clean(df), DataLoader.BASE_DATE
+
+    @staticmethod
+    def stream_to_zones(filepath: str, directory: Optional[str] = None, chunksize: Optional[int] = None):
+        """
+        Read the input in chunks of chunksize rows (default Config.STREAM_CHUNK_ROWS), clean
+        each chunk and spill it into per-zone partition files, so only one chunk is in memory.
+        """
+        chunksize = chunksize or Config.STREAM_CHUNK_ROWS
+        print(f"Streaming data from {filepath} in chunks of {chunksize:,} rows...")
+        partitions = ZonePartitionFiles(directory)
+        try:
+            options = DataLoader._read_options(filepath, categorical=False, dtypes=None)
+            for chunk in pd.read_csv(filepath, chunksize=chunksize, **options):
+                partitions.append(DataLoader._clean(chunk))
+        except Exception:
+            partitions.cleanup()
+            raise
+        return partitions, DataLoader.BASE_DATE
+
+    @staticmethod
+    def _clean(df: pd.DataFrame) -> pd.DataFrame:
         # Normalize columns
         df.columns = [c.lower().strip() for c in df.columns]
         
         # Clean data
         df['weight_in_grams'] = df['weight_in_grams'].fillna(0).astype(float)
         df['dt'] = pd.to_datetime(df['dt'])
-        base_date = datetime(2025, 8, 12).date()
         
         # Calculate Cutoffs
-        df['abs_cutoff'] = df.apply(DataLoader._get_absolute_cutoff, axis=1)
+        df['abs_cutoff'] = DataLoader._get_absolute_cutoffs(df)
         
-        return df, base_date
+        return df
 
     @staticmethod
-    def _get_absolute_cutoff(row):
-        prio = row.get('pod_priority', 'P9')
-        time_str = Config.CUTOFF_MAP.get(prio, "11:00")
-        
-        cutoff_time = datetime.strptime(time_str, "%H:%M").time()
-        order_dt = row['dt']
-        base_date = order_dt.date()
+    def _read_options(filepath: str, categorical: bool, dtypes: Optional[Dict[str, str]]) -> dict:
+        """
+        usecols and per-column dtypes for read_csv, keyed by the file's raw header names.
+        """
+        wanted = dict(DataLoader.DTYPES)
+        if categorical:
+            wanted.update({col: 'category' for col in DataLoader.CATEGORICAL_COLUMNS})
+        wanted.update(dtypes or {})
+
+        header = pd.read_csv(filepath, nrows=0).columns
+        normalized = {raw: raw.lower().strip() for raw in header}
+        return {
+            'usecols': [raw for raw, col in normalized.items() if col in DataLoader.USED_COLUMNS],
+            'dtype': {raw: wanted[col] for raw, col in normalized.items() if col in wanted},
+        }
 
-        cutoff_dt = datetime.combine(base_date, cutoff_time)
+    @staticmethod
+    def _get_absolute_cutoffs(df: pd.DataFrame) -> pd.Series:
+        """
+        Absolute cutoff per line: priority -> time-of-day offset on the order date, moved to
+        the next day for early-morning cutoffs or cutoffs not after the order time.
+        """
+        if 'pod_priority' in df.columns:
+            codes, priorities = pd.factorize(df['pod_priority'])
+        else:
+            codes, priorities = np.zeros(len(df), dtype=np.int64), pd.Index(['P9'])
 
-        # Move early-morning cutoffs to the next day and ensure we never set a cutoff behind order time
-        if cutoff_time.hour < 12 or cutoff_dt <= order_dt:
-            cutoff_dt += timedelta(days=1)
+        default = DataLoader._cutoff_offset("11:00")
+        offsets = np.array(
+            [DataLoader._cutoff_offset(Config.CUTOFF_MAP.get(p, "11:00")) for p in priorities] + [default],
+            dtype='timedelta64[ns]',
+        )
+        # Unknown / missing priorities carry code -1, which picks the trailing default
+        offset = pd.Series(offsets[codes], index=df.index)
 
-        return cutoff_dt
+        cutoff = df['dt'].dt.normalize() + offset
+        next_day = (offset < pd.Timedelta(hours=12)) | (cutoff <= df['dt'])
+        cutoff = cutoff + pd.to_timedelta(next_day.astype(np.int64), unit='D')
+        return cutoff.astype(df['dt'].dtype)
+
+    @staticmethod
+    def _cutoff_offset(time_str: str) -> np.timedelta64:
+        cutoff_time = datetime.strptime(time_str, "%H:%M")
+        return np.timedelta64(timedelta(hours=cutoff_time.hour, minutes=cutoff_time.minute), 'ns')
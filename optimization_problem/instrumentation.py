@@ -0,0 +1,217 @@
+import cProfile
+import glob
+import itertools
+import json
+import os
+import pstats
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from .config import Config
+from .core_logic import LogicCore
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """
+    Peak resident set size of this process (or of its finished children) in MiB.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return usage.ru_maxrss * scale / 2**20
+
+
+class Trace:
+    """
+    Stage timers, counters and per-zone worker stats of one run, written as a JSON trace.
+
+    The trace of the current process is Trace.current(); it is a no-op _NullTrace unless a
+    run activated one, so instrumented code calls it unconditionally. Hot loops keep plain
+    local counts and report them once per zone. Pool workers run each task under a fresh
+    trace (Trace.run_task) and return its stats, which the parent adds with add_task.
+    """
+    enabled = True
+    _current: "Trace" = None
+    _profile_seq = itertools.count()
+
+    def __init__(self, profile_dir: Optional[str] = None):
+        self.profile_dir = profile_dir
+        self.started = datetime.now()
+        self._origin = time.perf_counter()
+        self._duration_base = LogicCore.duration_estimates
+        self.stages = []
+        self.counters: Dict[str, float] = defaultdict(int)
+        self.zones = []
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    @staticmethod
+    def current() -> "Trace":
+        return Trace._current
+
+    @staticmethod
+    def activate(trace: Optional["Trace"]) -> "Trace":
+        """
+        Make trace (None for the no-op trace) current and return the previous one.
+        """
+        previous = Trace._current
+        Trace._current = trace if trace is not None else _NULL_TRACE
+        return previous
+
+    @contextmanager
+    def stage(self, name: str, **attrs):
+        """
+        Time a block. The yielded dict can be filled with extra fields for the stage entry.
+        """
+        start = time.perf_counter()
+        duration_calls = LogicCore.duration_estimates
+        try:
+            yield attrs
+        finally:
+            self.stages.append({
+                "name": name,
+                "start_sec": start - self._origin,
+                "seconds": time.perf_counter() - start,
+                "duration_estimates": LogicCore.duration_estimates - duration_calls,
+                "peak_rss_mb": peak_rss_mb(),
+                "children_peak_rss_mb": peak_rss_mb(children=True),
+                **attrs,
+            })
+
+    def count(self, name: str, n: float = 1):
+        self.counters[name] += n
+
+    def add_counts(self, counts: Dict[str, float]):
+        for name, n in counts.items():
+            self.counters[name] += n
+
+    def add_task(self, label, stats: dict):
+        """
+        Fold the stats of one worker task (see run_task) into this trace.
+        """
+        self.add_counts(stats['counters'])
+        self.zones.append({"zone": str(label), **stats})
+
+    @staticmethod
+    def run_task(func: Callable, args: tuple, profile_dir: Optional[str] = None):
+        """
+        Run func(*args) in a pool worker under its own trace. Returns (result, stats).
+        With profile_dir, the task's cProfile is dumped there; merge_profiles combines the
+        dumps per worker process.
+        """
+        trace = Trace()
+        previous = Trace.activate(trace)
+        profiler = cProfile.Profile() if profile_dir else None
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            if profiler:
+                profiler.enable()
+            result = func(*args)
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(
+                    profile_dir, f"worker_{os.getpid()}.part{next(Trace._profile_seq)}.prof"))
+            Trace.activate(previous)
+
+        trace.count("duration_estimates", LogicCore.duration_estimates - trace._duration_base)
+        stats = {
+            "pid": os.getpid(),
+            "seconds": time.perf_counter() - start,
+            "cpu_seconds": time.process_time() - cpu_start,
+            "peak_rss_mb": peak_rss_mb(),
+            "counters": dict(trace.counters),
+        }
+        return result, stats
+
+    @staticmethod
+    def merge_profiles(profile_dir: str):
+        """
+        Combine the per-task cProfile dumps in profile_dir into one worker_<pid>.prof per process.
+        """
+        parts = defaultdict(list)
+        for path in glob.glob(os.path.join(profile_dir, "worker_*.part*.prof")):
+            parts[os.path.basename(path).split(".part")[0]].append(path)
+        for name, paths in parts.items():
+            target = os.path.join(profile_dir, f"{name}.prof")
+            stats = pstats.Stats(*paths)
+            if os.path.exists(target):
+                stats.add(target)
+            stats.dump_stats(target)
+            for path in paths:
+                os.remove(path)
+
+    def to_dict(self) -> dict:
+        counters = dict(self.counters)
+        # Calls made in this process; workers' calls are already in the counters
+        counters["duration_estimates"] = counters.get("duration_estimates", 0) + \
+            LogicCore.duration_estimates - self._duration_base
+
+        workers = defaultdict(lambda: {"tasks": 0, "seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_mb": None})
+        for zone in self.zones:
+            worker = workers[zone["pid"]]
+            worker["tasks"] += 1
+            worker["seconds"] += zone["seconds"]
+            worker["cpu_seconds"] += zone["cpu_seconds"]
+            if zone["peak_rss_mb"] is not None:
+                worker["peak_rss_mb"] = max(worker["peak_rss_mb"] or 0, zone["peak_rss_mb"])
+
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "total_seconds": time.perf_counter() - self._origin,
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(children=True),
+            "config": {
+                "BUILDER_MODE": Config.BUILDER_MODE,
+                "DISPATCH_MODE": Config.DISPATCH_MODE,
+                "SCHEDULER_MODE": Config.SCHEDULER_MODE,
+                "SCHEDULE_ORDER": Config.SCHEDULE_ORDER,
+            },
+            "stages": self.stages,
+            "counters": counters,
+            "zones": self.zones,
+            "workers": {str(pid): stats for pid, stats in workers.items()},
+        }
+
+    def write(self, path: str):
+        if self.profile_dir:
+            self.merge_profiles(self.profile_dir)
+        with open(path, "w") as fh:
+            json.dump(self.to_dict(), fh, indent=2, default=str)
+
+
+class _NullTrace(Trace):
+    """
+    Trace that records nothing; current when no run is being traced.
+    """
+    enabled = False
+
+    def __init__(self):
+        self.profile_dir = None
+
+    @contextmanager
+    def stage(self, name: str, **attrs):
+        yield attrs
+
+    def count(self, name: str, n: float = 1):
+        pass
+
+    def add_counts(self, counts: Dict[str, float]):
+        pass
+
+    def add_task(self, label, stats: dict):
+        pass
+
+
+_NULL_TRACE = _NullTrace()
+Trace._current = _NULL_TRACE
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from collections.abc import Mapping
+from typing import Dict, List
+
+
+class LineStore:
+    """
+    Order lines of a frame held once as one list per column, indexed by row. Values are
+    what DataFrame.to_dict('records') would give (Python scalars, str, Timestamp), and
+    repeated values (categories, strings, timestamps) share one object across rows.
+    Picked items refer to a row here instead of carrying a copy of it.
+    """
+    __slots__ = ('names', 'columns')
+
+    def __init__(self, names: List[str], columns: Dict[str, list]):
+        self.names = names
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns[self.names[0]]) if self.names else 0
+
+    def __reduce__(self):
+        return LineStore, (self.names, self.columns)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "LineStore":
+        columns = {}
+        for name in df.columns:
+            col = df[name]
+            if pd.api.types.is_numeric_dtype(col) and not isinstance(col.dtype, pd.CategoricalDtype):
+                columns[name] = col.tolist()
+            else:
+                codes, uniques = pd.factorize(col, use_na_sentinel=False)
+                values = np.empty(len(uniques), dtype=object)
+                values[:] = list(uniques)
+                columns[name] = values[codes].tolist()
+        return cls(list(df.columns), columns)
+
+    def record(self, row: int) -> dict:
+        return {name: self.columns[name][row] for name in self.names}
+
+
+class PickedItem(Mapping):
+    """
+    One picked line: a row of a LineStore plus the picked quantity (and, once scored, its
+    atc_score and is_completing). Reads like the item dicts the builders used to copy:
+    the row's columns with order_qty replaced, followed by atc_score, is_completing and
+    picked_qty. dict(item) builds the full dict when it is really needed.
+    """
+    __slots__ = ('store', 'row', 'qty', 'atc_score', 'is_completing')
+
+    def __init__(self, store: LineStore, row: int, qty, atc_score=None, is_completing=None):
+        self.store = store
+        self.row = row
+        self.qty = qty
+        self.atc_score = atc_score
+        self.is_completing = is_completing
+
+    def __reduce__(self):
+        return PickedItem, (self.store, self.row, self.qty, self.atc_score, self.is_completing)
+
+    def __getitem__(self, key):
+        if key == 'order_qty':
+            return self.qty
+        if self.atc_score is not None:
+            if key == 'picked_qty':
+                return self.qty
+            if key == 'atc_score':
+                return self.atc_score
+            if key == 'is_completing':
+                return self.is_completing
+        return self.store.columns[key][self.row]
+
+    def __iter__(self):
+        yield from self.store.names
+        if self.atc_score is not None:
+            yield from ('atc_score', 'is_completing', 'picked_qty')
+
+    def __len__(self):
+        return len(self.store.names) + (3 if self.atc_score is not None else 0)
+
+    def __repr__(self):
+        return f"PickedItem({dict(self)!r})"
+
+
+class Picklist(Mapping):
+    """
+    Picklist header with __slots__ instead of a per-picklist dict. Reads and updates of
+    its fields work as on the dict it replaces (pl['deadline'], pl['picklist_no'] = ...).
+    Fields live in underscored slots so 'items' does not hide Mapping.items(). profile
+    caches the scheduler's PicklistProfile of the items; it is not a field.
+    """
+    FIELDS = ('picklist_no', 'zone', 'type', 'items', 'duration_sec', 'deadline', 'total_units', 'store_count')
+    _SLOTS = {field: '_' + field for field in FIELDS}
+    __slots__ = tuple(_SLOTS.values()) + ('profile',)
+
+    def __init__(self, picklist_no: str, zone, type: str, items: list, duration_sec: float, deadline,
+                 total_units, store_count: int):
+        self._picklist_no = picklist_no
+        self._zone = zone
+        self._type = type
+        self._items = items
+        self._duration_sec = duration_sec
+        self._deadline = deadline
+        self._total_units = total_units
+        self._store_count = store_count
+        self.profile = None
+
+    def __reduce__(self):
+        return Picklist, tuple(getattr(self, slot) for slot in self._SLOTS.values())
+
+    def __getitem__(self, key):
+        return getattr(self, self._SLOTS[key])
+
+    def __setitem__(self, key, value):
+        setattr(self, self._SLOTS[key], value)
+        if key == 'items':
+            self.profile = None
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"Picklist({dict(self)!r})"
@@ -0,0 +1,324 @@
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import List, Optional, Tuple
+from .config import Config
+from .core_logic import LogicCore
+from .instrumentation import Trace
+
+# Line fields the search needs, in the order of the encoded line tuples
+BIN, ORDER, STORE, QTY, WEIGHT, SLACK, PODS = range(7)
+
+
+class _PicklistState:
+    """
+    Lines of one picklist with the counts the duration model and constraints need.
+    min_slack is recomputed when lines change.
+    """
+    __slots__ = ('lines', 'bins', 'orders', 'stores', 'units', 'weight', 'min_slack')
+
+    def __init__(self):
+        self.lines = []
+        self.bins = Counter()
+        self.orders = Counter()
+        self.stores = Counter()
+        self.units = 0
+        self.weight = 0
+        self.min_slack = float('inf')
+
+
+class PicklistLocalSearch:
+    """
+    Improve the built picklists of one zone with merge, move and swap neighborhoods.
+
+    A step is taken only if it lowers the total LogicCore duration of the zone, and every
+    picklist that receives a line still meets the builder constraints: units, weight,
+    stores (pods of its first line, the builder's seed) and finishing before its earliest
+    cutoff when started at start_time. Lines are never split, and lines added to a picklist
+    go after its existing lines. Removing a line only needs a check when it is the first
+    one, as the next line's pods become the limit.
+
+    Lines are tuples (bin_rank, order_id, store_id, qty, weight, slack, pods), slack being
+    the seconds from start_time to the line's cutoff.
+    """
+    def __init__(self, picklists: List[List[tuple]], max_weight: float, budget_sec: Optional[float] = None):
+        self.max_weight = max_weight
+        self.deadline = time.perf_counter() + budget_sec if budget_sec is not None else None
+        self.lines = [line for lines in picklists for line in lines]
+        # Source (picklist, item) of every line, for the caller to rebuild picklists from
+        self.origin = [(p, k) for p, lines in enumerate(picklists) for k in range(len(lines))]
+        self.states = [_PicklistState() for _ in picklists]
+        self.by_bin = defaultdict(set)
+        self.by_order = defaultdict(set)
+        self.steps = {"merges": 0, "moves": 0, "swaps": 0}
+        # Picklists changed in the last and in the current round. A pair of picklists
+        # neither of which changed since it was last checked is skipped.
+        self.recent = set()
+        self.touched = set(range(len(picklists)))
+
+        line = 0
+        for p, lines in enumerate(picklists):
+            for _ in lines:
+                self._add(p, line)
+                line += 1
+            self._refresh(p)
+        self.initial_duration = self.total_duration()
+
+    def run(self) -> float:
+        """
+        Apply improving steps until none is left or the time budget runs out.
+        Returns the duration saved in seconds.
+        """
+        while self.touched and not self.out_of_time():
+            self.recent, self.touched = self.touched, set()
+            self._merge_pass()
+            self._move_pass()
+            self._swap_pass()
+        return self.initial_duration - self.total_duration()
+
+    def plan(self) -> List[List[Tuple[int, int]]]:
+        """
+        Non-empty picklists in their original order, as lists of (picklist, item) sources.
+        """
+        return [[self.origin[line] for line in state.lines] for state in self.states if state.lines]
+
+    def out_of_time(self) -> bool:
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def total_duration(self) -> float:
+        return sum(self._duration(len(s.bins), s.units, len(s.orders)) for s in self.states)
+
+    @staticmethod
+    def _duration(n_bins: int, units: float, n_orders: int) -> float:
+        return LogicCore.duration_from_counts(n_bins, units, n_orders) if n_orders else 0.0
+
+    def _feasible(self, n_bins, units, n_orders, n_stores, weight, min_slack, pods) -> bool:
+        return (units <= Config.MAX_ITEMS_PER_PICKLIST and weight <= self.max_weight and n_stores <= pods
+                and LogicCore.duration_from_counts(n_bins, units, n_orders) <= min_slack)
+
+    def _add(self, p: int, line: int):
+        state, data = self.states[p], self.lines[line]
+        state.lines.append(line)
+        state.bins[data[BIN]] += 1
+        state.orders[data[ORDER]] += 1
+        state.stores[data[STORE]] += 1
+        state.units += data[QTY]
+        state.weight += data[QTY] * data[WEIGHT]
+        self.by_bin[data[BIN]].add(p)
+        self.by_order[data[ORDER]].add(p)
+
+    def _remove(self, p: int, line: int):
+        state, data = self.states[p], self.lines[line]
+        state.lines.remove(line)
+        for counts, key, index in ((state.bins, data[BIN], self.by_bin), (state.orders, data[ORDER], self.by_order),
+                                   (state.stores, data[STORE], None)):
+            counts[key] -= 1
+            if not counts[key]:
+                del counts[key]
+                if index is not None:
+                    index[key].discard(p)
+        state.units -= data[QTY]
+        state.weight -= data[QTY] * data[WEIGHT]
+
+    def _refresh(self, p: int):
+        state = self.states[p]
+        state.min_slack = min((self.lines[line][SLACK] for line in state.lines), default=float('inf'))
+
+    def _exchange(self, p: int, out: Optional[int], into: Optional[int]):
+        """
+        Counts of picklist p after removing line out and adding line into (either may be None):
+        (duration, feasible).
+        """
+        state = self.states[p]
+        n_bins, n_orders, n_stores = len(state.bins), len(state.orders), len(state.stores)
+        units, weight = state.units, state.weight
+        min_slack = state.min_slack
+        if out is not None:
+            data = self.lines[out]
+            n_bins -= state.bins[data[BIN]] == 1
+            n_orders -= state.orders[data[ORDER]] == 1
+            n_stores -= state.stores[data[STORE]] == 1
+            units -= data[QTY]
+            weight -= data[QTY] * data[WEIGHT]
+            if data[SLACK] == min_slack:
+                min_slack = min((self.lines[line][SLACK] for line in state.lines if line != out), default=float('inf'))
+        if into is None:
+            feasible = not state.lines or out != state.lines[0] or n_orders == 0 or \
+                n_stores <= self.lines[state.lines[1]][PODS]
+            return self._duration(n_bins, units, n_orders), feasible
+
+        data = self.lines[into]
+        # A key of the removed line only stays in p if another line of p still has it
+        gone = self.lines[out] if out is not None else (None,) * len(data)
+        n_bins += state.bins.get(data[BIN], 0) <= (gone[BIN] == data[BIN])
+        n_orders += state.orders.get(data[ORDER], 0) <= (gone[ORDER] == data[ORDER])
+        n_stores += state.stores.get(data[STORE], 0) <= (gone[STORE] == data[STORE])
+        units += data[QTY]
+        weight += data[QTY] * data[WEIGHT]
+        min_slack = min(min_slack, data[SLACK])
+        first = next((line for line in state.lines if line != out), into)
+        feasible = self._feasible(n_bins, units, n_orders, n_stores, weight, min_slack, self.lines[first][PODS])
+        return self._duration(n_bins, units, n_orders), feasible
+
+    def _merge_pass(self):
+        """
+        Merge each picklist, smallest first, into the picklist that saves the most.
+        """
+        order = sorted((p for p, s in enumerate(self.states) if s.lines), key=lambda p: self.states[p].units)
+        for a in order:
+            if self.out_of_time():
+                break
+            src = self.states[a]
+            if not src.lines:
+                continue
+            src_duration = self._duration(len(src.bins), src.units, len(src.orders))
+            best, best_gain = None, 1e-9
+            for b, dst in enumerate(self.states):
+                if b == a or not dst.lines or not self._changed(a, b):
+                    continue
+                units, weight = src.units + dst.units, src.weight + dst.weight
+                if units > Config.MAX_ITEMS_PER_PICKLIST or weight > self.max_weight:
+                    continue
+                min_slack = min(src.min_slack, dst.min_slack)
+                n_bins = len(dst.bins) + sum(1 for k in src.bins if k not in dst.bins)
+                n_orders = len(dst.orders) + sum(1 for k in src.orders if k not in dst.orders)
+                n_stores = len(dst.stores) + sum(1 for k in src.stores if k not in dst.stores)
+                if not self._feasible(n_bins, units, n_orders, n_stores, weight, min_slack,
+                                      self.lines[dst.lines[0]][PODS]):
+                    continue
+                gain = src_duration + self._duration(len(dst.bins), dst.units, len(dst.orders)) - \
+                    self._duration(n_bins, units, n_orders)
+                if gain > best_gain:
+                    best, best_gain = b, gain
+            if best is not None:
+                self._relocate([(line, a, best) for line in src.lines])
+                self.steps["merges"] += 1
+
+    def _partners(self, p: int, line: int) -> List[int]:
+        """
+        Picklists other than p that share the line's bin or order, the only ones a lone
+        bin or order line can be moved to with a gain.
+        """
+        data = self.lines[line]
+        return sorted((self.by_bin[data[BIN]] | self.by_order[data[ORDER]]) - {p})
+
+    def _changed(self, a: int, b: int) -> bool:
+        return a in self.recent or b in self.recent or a in self.touched or b in self.touched
+
+    def _relocate(self, moves: List[Tuple[int, int, int]]):
+        """
+        Move each (line, from, to), all removals first.
+        """
+        for line, src, _ in moves:
+            self._remove(src, line)
+        for line, _, dst in moves:
+            self._add(dst, line)
+        for _, src, dst in moves:
+            self.touched.update((src, dst))
+        for p in set(p for _, src, dst in moves for p in (src, dst)):
+            self._refresh(p)
+
+    def _lone_lines(self, p: int) -> List[int]:
+        state = self.states[p]
+        return [line for line in state.lines
+                if state.bins[self.lines[line][BIN]] == 1 or state.orders[self.lines[line][ORDER]] == 1]
+
+    def _move_pass(self):
+        """
+        Move lines that are alone in their picklist with their bin or order to a picklist
+        that already visits that bin or order.
+        """
+        for a, src in enumerate(self.states):
+            for line in self._lone_lines(a):
+                if self.out_of_time():
+                    return
+                src_before = self._duration(len(src.bins), src.units, len(src.orders))
+                src_after, src_ok = self._exchange(a, line, None)
+                if not src_ok:
+                    continue
+                best, best_gain = None, 1e-9
+                for b in self._partners(a, line):
+                    if not self._changed(a, b):
+                        continue
+                    dst = self.states[b]
+                    dst_after, feasible = self._exchange(b, None, line)
+                    gain = src_before - src_after + self._duration(len(dst.bins), dst.units, len(dst.orders)) - dst_after
+                    if feasible and gain > best_gain:
+                        best, best_gain = b, gain
+                if best is not None:
+                    self._relocate([(line, a, best)])
+                    self.steps["moves"] += 1
+
+    def _swap_pass(self):
+        """
+        Swap a lone bin or order line with a line of a picklist that visits that bin or
+        order, for lines a plain move cannot place (e.g. the target is full). The other
+        line must be lone in its picklist or share a bin or order with this one; otherwise
+        the swap adds at least as many visits as it frees.
+        """
+        for a, src in enumerate(self.states):
+            for line in self._lone_lines(a):
+                if self.out_of_time():
+                    return
+                if line not in src.lines:
+                    continue
+                src_before = self._duration(len(src.bins), src.units, len(src.orders))
+                best, best_gain = None, 1e-9
+                for b in self._partners(a, line):
+                    if not self._changed(a, b):
+                        continue
+                    dst = self.states[b]
+                    dst_before = self._duration(len(dst.bins), dst.units, len(dst.orders))
+                    for other in dst.lines:
+                        data = self.lines[other]
+                        if data[BIN] not in src.bins and data[ORDER] not in src.orders and \
+                                dst.bins[data[BIN]] > 1 and dst.orders[data[ORDER]] > 1:
+                            continue
+                        src_after, src_ok = self._exchange(a, line, other)
+                        if not src_ok:
+                            continue
+                        dst_after, dst_ok = self._exchange(b, other, line)
+                        gain = src_before + dst_before - src_after - dst_after
+                        if dst_ok and gain > best_gain:
+                            best, best_gain = (b, other), gain
+                if best is not None:
+                    b, other = best
+                    self._relocate([(line, a, b), (other, b, a)])
+                    self.steps["swaps"] += 1
+
+    @staticmethod
+    def encode(picklists: List[dict], start_time: datetime) -> List[List[tuple]]:
+        """
+        Line tuples of each picklist, in item order.
+        """
+        return [
+            [
+                (item.get('bin_rank', 0), item['order_id'], item['store_id'], item['order_qty'],
+                 item['weight_in_grams'], (item['abs_cutoff'] - start_time).total_seconds(),
+                 item['pods_per_picklist_in_that_zone'])
+                for item in pl['items']
+            ]
+            for pl in picklists
+        ]
+
+    @staticmethod
+    def check_config():
+        """
+        Raise ValueError under the travel duration model: the neighborhoods are priced with
+        the flat model's counts, so they cannot tell which steps shorten a route.
+        """
+        if LogicCore.travel_model():
+            raise ValueError('Local search needs DURATION_MODEL = "flat"; unset LOCAL_SEARCH_SECONDS')
+
+    @staticmethod
+    def improve_zone(zone, lines: List[List[tuple]], max_weight: float, budget_sec: Optional[float]):
+        """
+        Pool task: search one zone and return (plan, seconds saved).
+        """
+        search = PicklistLocalSearch(lines, max_weight, budget_sec)
+        saved = search.run()
+        Trace.current().add_counts({
+            'local_search_saved_sec': saved,
+            **{f'local_search_{name}': n for name, n in search.steps.items()},
+        })
+        return search.plan(), saved
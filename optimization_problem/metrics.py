@@ -0,0 +1,201 @@
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from .config import Config
+
+
+def shift_capacity(shifts=None) -> pd.DataFrame:
+    """
+    Pickers, seconds per picker and total capacity seconds for each shift in Config.SHIFTS.
+    """
+    shifts = Config.SHIFTS if shifts is None else shifts
+    key = tuple(tuple(s) for s in shifts)
+    if key not in _capacity_cache:
+        rows = []
+        for shift_name, start_s, end_s, count, _ in shifts:
+            s = datetime.strptime(start_s, "%H:%M")
+            e = datetime.strptime(end_s, "%H:%M")
+            if e <= s:
+                e += timedelta(days=1)
+            duration = (e - s).total_seconds()
+            rows.append((shift_name, count, duration, duration * count))
+        _capacity_cache[key] = pd.DataFrame(
+            rows, columns=['shift', 'pickers', 'shift_sec', 'capacity_sec']).groupby('shift', sort=False).agg(
+            pickers=('pickers', 'sum'), shift_sec=('shift_sec', 'max'), capacity_sec=('capacity_sec', 'sum'))
+    return _capacity_cache[key]
+
+
+_capacity_cache: Dict[tuple, pd.DataFrame] = {}
+
+
+class PlanMetrics:
+    """
+    Evaluation KPIs of a plan. Assignments and unassigned picklists are flattened once
+    into a line table and a picklist table; every total and the per-zone, per-shift and
+    per-priority breakdowns are grouped reductions over those two tables.
+    """
+    def __init__(self, lines: pd.DataFrame, jobs: pd.DataFrame, runtime_sec: float = 0.0):
+        self.lines = lines
+        self.jobs = jobs
+        self.runtime_sec = runtime_sec
+
+        self.units_available = lines['order_qty'].sum().item()
+        self.units_picked = lines['picked_units'].sum().item()
+        self.units_on_time = lines['on_time_units'].sum().item()
+        self.units_deferred = lines.loc[lines['deferred'], 'order_qty'].sum().item() \
+            if 'deferred' in lines.columns else 0
+
+        demand = lines.groupby('order_id', sort=False, observed=True).agg(
+            total=('order_qty', 'sum'), picked=('picked_units', 'sum'))
+        self.total_orders = len(demand)
+        self.completed_orders = int((demand['picked'] >= demand['total']).sum())
+
+        scheduled = jobs[jobs['assigned']]
+        self.wasted_effort_sec = float(scheduled.loc[~scheduled['on_time'], 'duration_sec'].sum())
+        self.worked_sec = float(scheduled['duration_sec'].sum())
+        capacity = shift_capacity()
+        self.capacity_sec = float(capacity['capacity_sec'].sum())
+
+        self.by_zone = self._line_breakdown('zone')
+        self.by_priority = self._line_breakdown('pod_priority')
+
+        per_shift = scheduled.groupby('shift', sort=False).agg(
+            picklists=('duration_sec', 'size'),
+            worked_sec=('duration_sec', 'sum'),
+            wasted_sec=('wasted_sec', 'sum'),
+            units_picked=('units', 'sum'),
+            units_on_time=('on_time_units', 'sum'))
+        self.by_shift = capacity.join(per_shift, how='outer').fillna(0)
+        self.by_shift['utilization'] = _percent(self.by_shift['worked_sec'], self.by_shift['capacity_sec'])
+
+    @property
+    def picked_pct(self) -> float:
+        return (self.units_picked / self.units_available * 100) if self.units_available > 0 else 0
+
+    @property
+    def on_time_pct(self) -> float:
+        return (self.units_on_time / self.units_available * 100) if self.units_available > 0 else 0
+
+    @property
+    def utilization(self) -> float:
+        return (self.worked_sec / self.capacity_sec * 100) if self.capacity_sec > 0 else 0
+
+    @classmethod
+    def compute(cls, assignments: List[dict], unassigned: List[dict],
+                perf_start: Optional[float] = None, deferred: Optional[pd.DataFrame] = None) -> "PlanMetrics":
+        """
+        deferred holds lines the admission filter kept out of the build; they count as
+        demand that was not picked.
+        """
+        lines, jobs = cls.flatten(assignments, unassigned)
+        if deferred is not None and len(deferred):
+            lines['deferred'] = False
+            lines = pd.concat([lines, pd.DataFrame({
+                'order_id': deferred['order_id'].to_numpy(),
+                'order_qty': deferred['order_qty'].to_numpy(),
+                'zone': deferred['zone'].to_numpy(),
+                'pod_priority': deferred['pod_priority'].to_numpy() if 'pod_priority' in deferred.columns else None,
+                'assigned': False,
+                'on_time': False,
+                'picked_units': 0,
+                'on_time_units': 0,
+                'deferred': True,
+            })], ignore_index=True)
+        runtime = time.time() - perf_start if perf_start else 0
+        return cls(lines, jobs, runtime)
+
+    @staticmethod
+    def flatten(assignments: List[dict], unassigned: List[dict]):
+        """
+        One pass over every item: (lines, jobs) tables. Lines of unassigned picklists
+        count towards demand only.
+        """
+        all_items = []
+        sizes, zones, durations, statuses, shifts, assigned = [], [], [], [], [], []
+
+        for is_assigned, pls in ((True, assignments), (False, unassigned)):
+            for pl in pls:
+                items = pl['items']
+                all_items.extend(items)
+                sizes.append(len(items))
+                # Picklists are built per zone, so the first item's zone is the picklist's
+                zones.append(items[0]['zone'] if items else None)
+                durations.append(pl.get('duration_sec', 0))
+                statuses.append(pl.get('status'))
+                shifts.append(pl['picker_id'].rsplit('_', 1)[0] if is_assigned and pl.get('picker_id') else None)
+                assigned.append(is_assigned)
+
+        job_no = np.repeat(np.arange(len(sizes)), sizes)
+        qtys = np.asarray([item['order_qty'] for item in all_items])
+        units = np.bincount(job_no, weights=qtys, minlength=len(sizes)) if len(sizes) else np.empty(0)
+
+        jobs = pd.DataFrame({
+            'duration_sec': np.asarray(durations, dtype=np.float64),
+            'shift': shifts,
+            'assigned': np.asarray(assigned, dtype=bool),
+            'units': units,
+        })
+        jobs['on_time'] = jobs['assigned'] & (np.asarray(statuses, dtype=object) == 'OnTime')
+        jobs['wasted_sec'] = np.where(jobs['on_time'], 0.0, jobs['duration_sec'])
+        jobs['on_time_units'] = np.where(jobs['on_time'], jobs['units'], 0.0)
+
+        lines = pd.DataFrame({
+            'order_id': [item['order_id'] for item in all_items],
+            'order_qty': qtys,
+            'zone': np.asarray(zones, dtype=object)[job_no],
+            'pod_priority': [item.get('pod_priority') for item in all_items],
+            'assigned': jobs['assigned'].to_numpy()[job_no],
+            'on_time': jobs['on_time'].to_numpy()[job_no],
+        })
+        lines['picked_units'] = np.where(lines['assigned'], lines['order_qty'], 0)
+        lines['on_time_units'] = np.where(lines['on_time'], lines['order_qty'], 0)
+        return lines, jobs
+
+    def _line_breakdown(self, column: str) -> pd.DataFrame:
+        out = self.lines.groupby(column, sort=True, dropna=False).agg(
+            lines=('order_qty', 'size'),
+            units_available=('order_qty', 'sum'),
+            units_picked=('picked_units', 'sum'),
+            units_on_time=('on_time_units', 'sum'))
+        out['picked_pct'] = _percent(out['units_picked'], out['units_available'])
+        return out
+
+    def as_dict(self) -> dict:
+        return {
+            'units_picked': self.units_picked,
+            'units_available': self.units_available,
+            'units_on_time': self.units_on_time,
+            'units_deferred': self.units_deferred,
+            'completed_orders': self.completed_orders,
+            'total_orders': self.total_orders,
+            'wasted_effort_sec': self.wasted_effort_sec,
+            'worked_sec': self.worked_sec,
+            'capacity_sec': self.capacity_sec,
+            'utilization': self.utilization,
+            'runtime_sec': self.runtime_sec,
+            'by_zone': self.by_zone.reset_index().to_dict('records'),
+            'by_shift': self.by_shift.reset_index().to_dict('records'),
+            'by_priority': self.by_priority.reset_index().to_dict('records'),
+        }
+
+    def report(self) -> str:
+        schedule_mode = Config.SCHEDULER_MODE if Config.SCHEDULER_MODE == "legacy" else f"{Config.SCHEDULER_MODE}/{Config.SCHEDULE_ORDER}"
+        return "\n".join([
+            "\n" + "-"*25,
+            "Evaluation Metrics",
+            "-"*25,
+            f"1. Total units successfully picked before cutoff: {self.units_picked:,} / {self.units_available:,} ({self.picked_pct:.1f}%)",
+            f"   On-time units ({schedule_mode} schedule): {self.units_on_time:,} / {self.units_available:,} ({self.on_time_pct:.1f}%)",
+            *([f"   Deferred at admission (cannot be on time): {self.units_deferred:,} units"] if self.units_deferred else []),
+            f"2. Number of Completed Orders: {self.completed_orders:,} / {self.total_orders:,}",
+            f"3. Wasted picking effort (late picklists): {self.wasted_effort_sec:.2f} sec",
+            f"4. Picker utilization: {self.utilization:.2f}%",
+            f"5. Scalability and runtime: {self.runtime_sec:.2f} sec",
+            "="*40 + "\n",
+        ])
+
+
+def _percent(part: pd.Series, whole: pd.Series) -> pd.Series:
+    return (part / whole.where(whole > 0) * 100).fillna(0.0)
@@ -1,31 +1,455 @@
 import multiprocessing
+import traceback
+import numpy as np
 import pandas as pd
+from collections import defaultdict
 from datetime import datetime
-from typing import List
+from typing import Callable, Dict, List, Sequence
+from .config import Config
 from .picklist_builder import PicklistBuilder
 from .core_logic import ATCScoringStrategy
+from .columnar import ZoneColumns, PackedPicklists
+from .line_store import LineStore
+from .shared_zones import SharedZoneStore
+from .zone_partitions import ZonePartitionFiles
+from .compiled_dataset import CompiledDataset
+from .instrumentation import Trace
+from .checkpoints import ZoneCheckpoints
+from .cluster import ClusterCoordinator
+from .local_search import PicklistLocalSearch
+
+# Per-worker views of the shared zone columns, set by the pool initializer
+_shared_columns = None
+_shared_blocks = None
+
+# Per-worker memory-mapped compiled datasets, by directory
+_compiled_datasets = {}
+
+
+def _attach_shared_columns(spec):
+    global _shared_columns, _shared_blocks
+    _shared_columns, _shared_blocks = SharedZoneStore.attach(spec)
+
+
+def _run_task(task):
+    idx, func, args, traced, profile_dir, isolated = task
+    try:
+        if not traced:
+            return idx, func(*args), None, None
+        result, stats = Trace.run_task(func, args, profile_dir)
+        return idx, result, stats, None
+    except Exception:
+        if not isolated:
+            raise
+        return idx, None, None, traceback.format_exc()
+
+
+class ZoneBuildError(RuntimeError):
+    pass
+
+
+class _ZoneArrivals:
+    """
+    Task results gathered per zone for an on_zone callback: once every task of a zone is
+    in, its picklists are numbered in task order, as _merge_partitions numbers them, and
+    handed over. Without a callback nothing is kept.
+    """
+    def __init__(self, zone_of_task: Sequence, on_zone: Callable = None):
+        self.zone_of_task = zone_of_task
+        self.on_zone = on_zone
+        self.results = {}
+        self.tasks_of_zone = {}
+        for j, zone in enumerate(zone_of_task):
+            self.tasks_of_zone.setdefault(zone, []).append(j)
+
+    def arrived(self, i: int, picklists: List[dict]):
+        if self.on_zone is None:
+            return
+        self.results[i] = picklists
+        zone = self.zone_of_task[i]
+        tasks = self.tasks_of_zone[zone]
+        if all(j in self.results for j in tasks):
+            self.on_zone(zone, ScalableOptimizationEngine._merge_partitions(
+                [zone] * len(tasks), [self.results[j] for j in tasks]))
 
 
 class ScalableOptimizationEngine:
-    def __init__(self, n_workers: int = None):
+    DISPATCH_MODES = ("frames", "shared", "cluster")
+
+    def __init__(self, n_workers: int = None, dispatch: str = None):
         self.n_workers = n_workers or multiprocessing.cpu_count()
+        self.dispatch = dispatch or Config.DISPATCH_MODE
+        if self.dispatch not in self.DISPATCH_MODES:
+            raise ValueError(f"Unknown dispatch mode: {self.dispatch}")
+        self._pool = None
+
+    def start_pool(self):
+        """
+        Fork the worker pool now and keep it for every later map of this engine, instead of
+        one pool per map. Workers see Config as it was here. Maps that need a pool
+        initializer (shared dispatch, scenario sweeps) still get a pool of their own.
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.n_workers)
+
+    def close_pool(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def run_parallel_build(self, df: pd.DataFrame, start_time: datetime,
+                           on_zone: Callable[[object, List[dict]], None] = None) -> List[dict]:
+        """
+        Picklists of every zone, in zone order. on_zone(zone, picklists) is called in this
+        process as soon as all of a zone's tasks are in, with its final numbering.
+        """
+        parts = self.split_labels(df)
+        if self.dispatch == "shared":
+            return self._run_shared_build(df, start_time, parts, on_zone)
+
+        n_zones = df['zone'].nunique()
+        with Trace.current().stage("zone_fan_out", zones=n_zones):
+            tasks, zone_of_task, costs = self.zone_tasks(df, start_time, parts)
+
+        workers = f"cluster workers on {Config.CLUSTER_ADDRESS}" if self.dispatch == "cluster" else f"{self.n_workers} workers"
+        print(f"Parallelizing optimization across {n_zones} zones ({len(tasks)} partitions) using {workers}...")
+
+        results = self._build_zones(self._process_zone, tasks, costs, zone_of_task, start_time,
+                                    lambda i: tasks[i][0], on_zone)
+        return self._merge_partitions(zone_of_task, results)
+
+    @staticmethod
+    def zone_tasks(df: pd.DataFrame, start_time: datetime, parts: np.ndarray = None):
+        """
+        _process_zone tasks of the frames dispatch, with their zones and costs: one per
+        zone (in first-appearance order) and split label.
+        """
+        parts = parts if parts is not None else ScalableOptimizationEngine.split_labels(df)
+        tasks, zone_of_task, costs = [], [], []
+        for zone in df['zone'].unique():
+            in_zone = (df['zone'] == zone).to_numpy()
+            zone_parts = parts[in_zone]
+            zone_df = df[in_zone]
+            for part in np.unique(zone_parts):
+                part_df = zone_df[zone_parts == part].copy()
+                tasks.append((part_df, start_time))
+                zone_of_task.append(zone)
+                costs.append(ScalableOptimizationEngine.estimate_zone_cost(len(part_df), part_df['order_qty'].sum()))
+        return tasks, zone_of_task, costs
+
+    def _run_shared_build(self, df: pd.DataFrame, start_time: datetime, parts: np.ndarray,
+                          on_zone: Callable = None) -> List[dict]:
+        """
+        Partition once, share the columns, and ship only zone offsets to workers.
+        Workers return PackedPicklists; items are built here on one LineStore of the sorted frame.
+        """
+        picklists = []
+        counters = defaultdict(int)
+
+        with SharedZoneStore(df, parts) as store:
+            lines = LineStore.from_frame(store.frame)
+            tasks = [(zone, start, stop, start_time) for zone, start, stop in store.partitions]
+            units = np.add.reduceat(store.frame['order_qty'].to_numpy(), [start for _, start, _ in store.partitions]) \
+                if tasks else []
+            costs = [self.estimate_zone_cost(stop - start, u) for (_, start, stop), u in zip(store.partitions, units)]
+            n_zones = len(set(zone for zone, _, _ in store.partitions))
+            print(f"Parallelizing optimization across {n_zones} zones ({len(tasks)} partitions) "
+                  f"using {self.n_workers} workers (shared memory)...")
+
+            zones = [zone for zone, _, _ in store.partitions]
+            arrivals = _ZoneArrivals(zones, on_zone)
+
+            def unpack(task, packed):
+                zone, start, _ = store.partitions[task]
+                built = []
+                for picked, units, store_count in packed.unpack():
+                    items = PicklistBuilder.inflate_items(lines, picked, start)
+                    deadline = min(i['abs_cutoff'] for i in items)
+                    built.append(PicklistBuilder.make_picklist(0, zone, items, deadline, units, store_count))
+                return built
+
+            errors = {}
+            results = self._map_largest_first(
+                self._process_zone_shared, tasks, costs, zones, errors=errors,
+                on_result=(lambda i, packed: arrivals.arrived(i, unpack(i, packed))) if on_zone else None,
+                initializer=_attach_shared_columns, initargs=(store.spec,))
+            self.report_failures(zones, errors)
+            for i in errors:
+                arrivals.arrived(i, [])
+
+            for i, packed in enumerate(results):
+                if packed is None:
+                    continue
+                for pl in arrivals.results.pop(i, None) or unpack(i, packed):
+                    counters[zones[i]] += 1
+                    pl['picklist_no'] = f"PL_{counters[zones[i]]:06d}"
+                    picklists.append(pl)
+
+        return picklists
+
+    def run_partitioned_build(self, partitions: ZonePartitionFiles, start_time: datetime) -> List[dict]:
+        """
+        Build from per-zone partition files (see DataLoader.stream_to_zones). Workers load
+        their own zone file, so no process ever holds more than one zone of input.
+        """
+        zones = partitions.zones()
+        tasks = [(partitions.path(zone), start_time) for zone in zones]
+        costs = [self.estimate_zone_cost(partitions.line_counts[zone], partitions.unit_counts[zone]) for zone in zones]
+
+        print(f"Parallelizing optimization across {len(zones)} zone files using {self.n_workers} workers...")
+
+        results = self._build_zones(self._process_zone_file, tasks, costs, zones, start_time,
+                                    lambda i: partitions.load_zone(zones[i]))
+        return self._merge_partitions(zones, results)
+
+    def run_compiled_build(self, dataset: CompiledDataset, start_time: datetime) -> List[dict]:
+        """
+        Build from a CompiledDataset. Workers memory-map it themselves and read only
+        their zone's row range.
+        """
+        tasks = [(dataset.directory, start, stop, start_time) for _, start, stop in dataset.zones]
+        units = dataset.columns['order_qty']
+        costs = [self.estimate_zone_cost(stop - start, units[start:stop].sum()) for _, start, stop in dataset.zones]
 
-    def run_parallel_build(self, df: pd.DataFrame, start_time: datetime) -> List[dict]:
-        zones = df['zone'].unique()
-        tasks = []
+        print(f"Parallelizing optimization across {len(tasks)} compiled zones using {self.n_workers} workers...")
 
-        for zone in zones:
-            zone_df = df[df['zone'] == zone].copy()
-            tasks.append((zone_df, start_time))
+        zones = [zone for zone, _, _ in dataset.zones]
+        results = self._build_zones(self._process_zone_compiled, tasks, costs, zones, start_time,
+                                    lambda i: dataset.frame(*dataset.zones[i][1:]))
+        return self._merge_partitions(zones, results)
 
-        print(f"Parallelizing optimization across {len(zones)} zones using {self.n_workers} workers...")
+    def improve_picklists(self, picklists: List[dict], start_time: datetime,
+                          budget_sec: float = None) -> List[dict]:
+        """
+        Run PicklistLocalSearch on each zone's picklists in the pool, with budget_sec
+        (default Config.LOCAL_SEARCH_SECONDS) per zone. Changed picklists are rebuilt from
+        their items; the zone's picklists are renumbered since merges drop some.
+        """
+        by_zone, tasks = self.search_tasks(picklists, start_time, budget_sec)
+        costs = [sum(len(pl['items']) for pl in pls) for pls in by_zone.values()]
+        results = self._map_largest_first(PicklistLocalSearch.improve_zone, tasks, costs, list(by_zone))
+        return self.apply_search_results(by_zone, results)
 
-        with multiprocessing.Pool(self.n_workers) as pool:
-            results = pool.starmap(self._process_zone, tasks)
+    @staticmethod
+    def search_tasks(picklists: List[dict], start_time: datetime, budget_sec: float = None):
+        """
+        Picklists grouped by zone, and one PicklistLocalSearch.improve_zone task per zone.
+        """
+        PicklistLocalSearch.check_config()
+        budget_sec = budget_sec if budget_sec is not None else Config.LOCAL_SEARCH_SECONDS
+        by_zone = defaultdict(list)
+        for pl in picklists:
+            by_zone[pl['zone']].append(pl)
+        tasks = [(zone, PicklistLocalSearch.encode(pls, start_time), PicklistBuilder.max_weight_for(zone), budget_sec)
+                 for zone, pls in by_zone.items()]
+        return by_zone, tasks
+
+    @staticmethod
+    def apply_search_results(by_zone: dict, results: List[tuple]) -> List[dict]:
+        improved, saved = [], 0.0
+        for (zone, picklists), (plan, zone_saved) in zip(by_zone.items(), results):
+            improved.extend(ScalableOptimizationEngine._apply_plan(zone, picklists, plan))
+            saved += zone_saved
+        print(f"Local search saved {saved / 60:,.1f} picker-minutes "
+              f"({sum(len(pls) for pls in by_zone.values())} -> {len(improved)} picklists).")
+        return improved
+
+    @staticmethod
+    def _apply_plan(zone, picklists: List[dict], plan: List[list]) -> List[dict]:
+        result = []
+        for number, sources in enumerate(plan, 1):
+            first = sources[0][0]
+            if len(sources) == len(picklists[first]['items']) and \
+                    all(p == first and k == i for i, (p, k) in enumerate(sources)):
+                pl = picklists[first]
+                pl['picklist_no'] = f"PL_{number:06d}"
+            else:
+                items = [picklists[p]['items'][k] for p, k in sources]
+                pl = PicklistBuilder.make_picklist(number, zone, items, min(i['abs_cutoff'] for i in items),
+                                                   sum(i['order_qty'] for i in items),
+                                                   len(set(i['store_id'] for i in items)))
+            result.append(pl)
+        return result
+
+    def _build_zones(self, func: Callable, tasks: List[tuple], costs: Sequence[float], zones: Sequence,
+                     start_time: datetime, lines_of: Callable[[int], pd.DataFrame],
+                     on_zone: Callable = None) -> List[List[dict]]:
+        """
+        Run zone build tasks that return picklists, isolating failures: a task that raises
+        is reported and gives no picklists, so the other zones still finish. With the
+        cluster dispatch, the tasks' lines go to remote workers instead of func. on_zone
+        gets each zone as its last task arrives (see run_parallel_build).
+
+        With Config.CHECKPOINT_DIR set, each task's picklists are checkpointed as they
+        arrive, keyed by its input lines (lines_of(i)) and the build settings, and tasks
+        with a valid checkpoint are restored instead of rebuilt.
+        """
+        results = [None] * len(tasks)
+        keys = {}
+        checkpoints = ZoneCheckpoints(Config.CHECKPOINT_DIR, start_time) if Config.CHECKPOINT_DIR else None
+        if checkpoints:
+            with Trace.current().stage("checkpoint_restore", tasks=len(tasks)) as stage:
+                for i, zone in enumerate(zones):
+                    lines = lines_of(i)
+                    keys[i] = checkpoints.key(zone, lines)
+                    results[i] = checkpoints.load(keys[i], zone, lines)
+                stage["restored"] = sum(result is not None for result in results)
+            print(f"Restored {stage['restored']} of {len(tasks)} zone builds from {Config.CHECKPOINT_DIR}.")
+            Trace.current().count("checkpoints_restored", stage["restored"])
+
+        arrivals = _ZoneArrivals(zones, on_zone)
+        pending = []
+        for i, result in enumerate(results):
+            if result is None:
+                pending.append(i)
+            else:
+                arrivals.arrived(i, result)
+        if not pending:
+            return results
 
-        return [pl for zone_results in results for pl in zone_results]
+        def arrived(j, picklists):
+            if checkpoints:
+                checkpoints.save(keys[pending[j]], picklists)
+                Trace.current().count("checkpoints_saved")
+            arrivals.arrived(pending[j], picklists)
+
+        on_result = arrived if checkpoints or on_zone else None
+        errors = {}
+        if self.dispatch == "cluster":
+            built = ClusterCoordinator().build_zones(
+                [zones[i] for i in pending], [costs[i] for i in pending], lambda j: lines_of(pending[j]),
+                start_time, errors, on_result=on_result)
+        else:
+            built = self._map_largest_first(func, [tasks[i] for i in pending], [costs[i] for i in pending],
+                                            [zones[i] for i in pending], errors=errors, on_result=on_result)
+        self.report_failures([zones[i] for i in pending], errors)
+        for j, i in enumerate(pending):
+            results[i] = built[j] if j not in errors else []
+            if j in errors:
+                arrivals.arrived(i, [])
+        return results
+
+    @staticmethod
+    def report_failures(labels: Sequence, errors: Dict[int, str]):
+        """
+        Print the traceback of every failed task (see _map_largest_first's errors) under its
+        zone, then raise ZoneBuildError unless Config.ALLOW_PARTIAL_PLAN is set. Callers
+        report once every other task is in, so finished zones are checkpointed first.
+        """
+        if not errors:
+            return
+        Trace.current().count("failed_zones", len(errors))
+        for idx in sorted(errors):
+            print(f"Zone {labels[idx]} failed; its lines are left unplanned:\n{errors[idx]}")
+        failed = f"{len(errors)} zone task(s) failed: {', '.join(str(labels[idx]) for idx in sorted(errors))}"
+        if not Config.ALLOW_PARTIAL_PLAN:
+            raise ZoneBuildError(f"{failed}. Set Config.ALLOW_PARTIAL_PLAN to plan without them.")
+        print(failed)
+
+    def _map_largest_first(self, func: Callable, tasks: List[tuple], costs: Sequence[float],
+                           labels: Sequence = None, errors: Dict[int, str] = None,
+                           on_result: Callable[[int, object], None] = None, **pool_kwargs) -> list:
+        """
+        Run func(*task) for every task, submitting the most expensive ones first with
+        chunksize 1 so a long-tail zone starts early instead of last. Results come
+        back in task order. When a trace is active, each task's worker stats are added
+        to it under its label (the zone).
+
+        With an errors dict, a task that raises does not abort the pool: its formatted
+        traceback goes into errors[i] and its result is None. on_result(i, result) is
+        called in this process as each successful result arrives.
+        """
+        order = sorted(range(len(tasks)), key=lambda i: -costs[i])
+        results = [None] * len(tasks)
+        trace = Trace.current()
+        labels = labels if labels is not None else range(len(tasks))
+
+        work = [(i, func, tasks[i], trace.enabled, trace.profile_dir, errors is not None) for i in order]
+
+        def collect(pool):
+            for idx, result, stats, error in pool.imap_unordered(_run_task, work, chunksize=1):
+                if error is not None:
+                    errors[idx] = error
+                    continue
+                results[idx] = result
+                if stats is not None:
+                    trace.add_task(labels[idx], {"cost": float(costs[idx]), **stats})
+                if on_result is not None:
+                    on_result(idx, result)
+
+        with trace.stage("zone_pool", tasks=len(tasks), workers=self.n_workers):
+            if self._pool is not None and not pool_kwargs:
+                collect(self._pool)
+            else:
+                with multiprocessing.Pool(self.n_workers, **pool_kwargs) as pool:
+                    collect(pool)
+
+        return results
+
+    @staticmethod
+    def estimate_zone_cost(lines: int, units: float) -> float:
+        # Greedy cost grows with lines scanned per picklist times the number of picklists
+        return lines * (1 + units / Config.MAX_ITEMS_PER_PICKLIST)
+
+    @staticmethod
+    def split_labels(df: pd.DataFrame) -> np.ndarray:
+        """
+        Sub-partition label per row. Zones with more than Config.ZONE_SPLIT_LINES lines are cut
+        into walk-ordered buckets of whole Config.ZONE_SPLIT_COLUMNS locations (e.g. floor, aisle)
+        of about that many lines each; everything else is partition 0.
+        """
+        labels = np.zeros(len(df), dtype=np.int64)
+        threshold = Config.ZONE_SPLIT_LINES
+        split_cols = [c for c in Config.ZONE_SPLIT_COLUMNS if c in df.columns]
+        if not threshold or not split_cols:
+            return labels
+
+        zone_codes, _ = pd.factorize(df['zone'])
+        sizes = np.bincount(zone_codes[zone_codes >= 0])
+        for code in np.flatnonzero(sizes > threshold):
+            pos = np.flatnonzero(zone_codes == code)
+            location = df.iloc[pos][split_cols].astype(str).agg('|'.join, axis=1)
+            loc_codes, locations = pd.factorize(location, sort=True)
+            loc_start = np.concatenate([[0], np.cumsum(np.bincount(loc_codes, minlength=len(locations)))[:-1]])
+            labels[pos] = (loc_start // threshold)[loc_codes]
+
+        return labels
+
+    @staticmethod
+    def _merge_partitions(zone_of_task: List[str], results: List[List[dict]]) -> List[dict]:
+        """
+        Concatenate partition results in task order and number picklists per zone.
+        """
+        merged = []
+        counters = defaultdict(int)
+        for zone, zone_results in zip(zone_of_task, results):
+            for pl in zone_results:
+                counters[zone] += 1
+                pl['picklist_no'] = f"PL_{counters[zone]:06d}"
+                merged.append(pl)
+        return merged
 
     @staticmethod
     def _process_zone(zone_df: pd.DataFrame, start_time: datetime) -> List[dict]:
         builder = PicklistBuilder(zone_df, start_time, strategy=ATCScoringStrategy())
         return builder.generate_picklists()
+
+    @staticmethod
+    def _process_zone_file(path: str, start_time: datetime) -> List[dict]:
+        return ScalableOptimizationEngine._process_zone(ZonePartitionFiles.load(path), start_time)
+
+    @staticmethod
+    def _process_zone_compiled(directory: str, start: int, stop: int, start_time: datetime) -> List[dict]:
+        if directory not in _compiled_datasets:
+            _compiled_datasets[directory] = CompiledDataset.load(directory)
+        zone_df = _compiled_datasets[directory].frame(start, stop)
+        return ScalableOptimizationEngine._process_zone(zone_df, start_time)
+
+    @staticmethod
+    def _process_zone_shared(zone: str, start: int, stop: int, start_time: datetime) -> PackedPicklists:
+        cols = ZoneColumns.from_partition(_shared_columns, start, stop)
+        # The record builder has no columnar form; the columnar one gives the same picklists
+        mode = "indexed" if Config.BUILDER_MODE == "indexed" else "columnar"
+        builder = PicklistBuilder(None, start_time, strategy=ATCScoringStrategy(), mode=mode)
+        return PackedPicklists.pack(builder.build_zone_columns(cols, PicklistBuilder.max_weight_for(zone)))
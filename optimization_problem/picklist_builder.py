@@ -1,158 +1,446 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Optional
 from collections import defaultdict
 from .config import Config
 from .core_logic import LogicCore, ScoringStrategy, ATCScoringStrategy
+from .columnar import ZoneColumns, RowGroups, PackedPicklists
+from .line_store import LineStore, PickedItem, Picklist
+from .seed_index import SeedIndex
+from .travel import TravelTimeIndex
+from .instrumentation import Trace
 
 
 class PicklistBuilder:
-    def __init__(self, df: pd.DataFrame, start_time: datetime, strategy: Optional[ScoringStrategy] = None):
+    MODES = ("records", "columnar", "indexed")
+    # Config settings that change what a zone build produces
+    BUILD_SETTINGS = (
+        'MAX_ITEMS_PER_PICKLIST', 'MAX_WEIGHT_STD', 'MAX_WEIGHT_FRAGILE', 'FRAGILE_ZONES',
+        'TIME_START_TO_ZONE', 'TIME_BIN_TO_BIN', 'TIME_PICK_PER_UNIT', 'TIME_ZONE_TO_STAGING',
+        'TIME_UNLOAD_PER_ORDER', 'ATC_K', 'BUILDER_MODE', 'DURATION_MODEL', 'TRAVEL_AISLE_SEC',
+        'TRAVEL_CROSS_AISLE_SEC', 'TRAVEL_FLOOR_SEC', 'TRAVEL_BIN_STOP_SEC',
+    )
+
+    def __init__(self, df: pd.DataFrame, start_time: datetime, strategy: Optional[ScoringStrategy] = None,
+                 mode: Optional[str] = None):
         self.df = df
         self.current_time = start_time
         self.strategy = strategy or ATCScoringStrategy()
+        self.mode = mode or Config.BUILDER_MODE
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown builder mode: {self.mode}")
 
     def generate_picklists(self) -> List[dict]:
         picklists = []
         pl_counter = 1
-        
+        build_zone = self._build_zone_records if self.mode == "records" else self._build_zone_columnar
+
         # 1. Partition by Zone
-        grouped = self.df.groupby(['zone'])
-        
+        grouped = self.df.groupby('zone', observed=True)
+
         for zone, group_df in grouped:
-            # Convert to list of dicts
-            items_pool = group_df.to_dict('records')
-            
-            # Track remaining qty for each (order_id, sku) pair
-            remaining = defaultdict(int)
-            order_remaining_qty = defaultdict(int)
-            for item in items_pool:
-                key = (item['order_id'], item['sku'])
-                remaining[key] += item['order_qty']
-                order_remaining_qty[item['order_id']] += item['order_qty']
-            
-            max_weight = Config.MAX_WEIGHT_FRAGILE if zone in Config.FRAGILE_ZONES else Config.MAX_WEIGHT_STD
-            
-            while any(qty > 0 for qty in remaining.values()):
-                # Step 1: Score Items
-                available_items = []
-                for item in items_pool:
-                    key = (item['order_id'], item['sku'])
-                    remaining_qty = remaining[key]
-                    if remaining_qty > 0:
-                        item_for_score = {**item, 'order_qty': remaining_qty}
-                        atc_score = self.strategy.calculate_score(item_for_score, self.current_time)
-                        
-                        # Check if picking this item completes the order
-                        is_completing = (order_remaining_qty[item['order_id']] == remaining_qty)
-                        
-                        available_items.append({
-                            **item_for_score, 
-                            'atc_score': atc_score,
-                            'is_completing': is_completing
-                        })
-                
-                if not available_items:
-                    break
-                
-                # Sort: ATC Score (Desc), Is Completing (Desc), Floor (Asc), Aisle (Asc), Rack (Asc), Bin Rank (Asc)
-                available_items.sort(key=lambda x: (
-                    -x['atc_score'], 
-                    -int(x['is_completing']),
-                    str(x.get('floor', '')), 
-                    str(x.get('aisle', '')), 
-                    str(x.get('rack', '')), 
-                    x.get('bin_rank', 0)
-                ))
-                
-                # Step 2: Seed Selection
-                seed = available_items[0]
-                seed_key = (seed['order_id'], seed['sku'])
-                
-                # Calculate max pickable quantity
-                max_qty_by_weight = max_qty_by_limit = Config.MAX_ITEMS_PER_PICKLIST
-                if seed['weight_in_grams'] > 0:
-                    max_qty_by_weight = max_weight // seed['weight_in_grams']
-                
-                seed_qty = min(remaining[seed_key], max_qty_by_limit, max_qty_by_weight)
-                
-                if seed_qty <= 0:
-                    remaining[seed_key] = 0
-                    continue
-                
-                current_picklist_items = [{
-                    **seed,
-                    'order_qty': seed_qty,
-                    'picked_qty': seed_qty
-                }]
-                remaining[seed_key] -= seed_qty
-                order_remaining_qty[seed['order_id']] -= seed_qty
-                
-                # Track Picklist State
-                current_weight = seed_qty * seed['weight_in_grams']
-                current_units = seed_qty
-                current_stores = {seed['store_id']}
-                
-                # Cutoff constraint
-                min_cutoff = seed['abs_cutoff']
-                max_pods = seed['pods_per_picklist_in_that_zone']
-                
-                # Step 3: Grow Picklist
-                for item in available_items[1:]:
-                    item_key = (item['order_id'], item['sku'])
-                    if remaining[item_key] <= 0:
-                        continue
-                    
-                    # Check store constraint
-                    if len(current_stores) >= max_pods and item['store_id'] not in current_stores:
-                        continue
-                    
-                    # Calculate max quantity
-                    max_qty_by_weight = max_qty_by_items = Config.MAX_ITEMS_PER_PICKLIST - current_units
-                    
-                    if item['weight_in_grams'] > 0:
-                        max_qty_by_weight = (max_weight - current_weight) // item['weight_in_grams']
-
-                    pick_qty = min(remaining[item_key], max_qty_by_items, max_qty_by_weight)
-                    
-                    if pick_qty <= 0:
-                        continue
-                    
-                    # Create item
-                    picked_item = {
-                        **item,
-                        'order_qty': pick_qty,
-                        'picked_qty': pick_qty
-                    }
-                    
-                    # Time Validity Check
-                    proposed_min_cutoff = min(min_cutoff, item['abs_cutoff'])
-                    temp_picklist = current_picklist_items + [picked_item]
-                    duration = LogicCore.estimate_picklist_duration(temp_picklist)
-                    finish_time = self.current_time + timedelta(seconds=duration)
-                    
-                    if finish_time <= proposed_min_cutoff:
-                        # Add item
-                        current_picklist_items.append(picked_item)
-                        current_weight += pick_qty * item['weight_in_grams']
-                        current_units += pick_qty
-                        current_stores.add(item['store_id'])
-                        min_cutoff = proposed_min_cutoff
-                        remaining[item_key] -= pick_qty
-                        order_remaining_qty[item['order_id']] -= pick_qty
-                
-                # Finalize Picklist
-                final_duration = LogicCore.estimate_picklist_duration(current_picklist_items)
-                picklists.append({
-                    "picklist_no": f"PL_{pl_counter:06d}",
-                    "zone": zone,
-                    "type": "Fragile" if zone in Config.FRAGILE_ZONES else "Standard",
-                    "items": current_picklist_items,
-                    "duration_sec": final_duration,
-                    "deadline": min_cutoff,
-                    "total_units": current_units,
-                    "store_count": len(current_stores)
-                })
+            for items, min_cutoff, units, stores in build_zone(group_df, self.max_weight_for(zone)):
+                picklists.append(self.make_picklist(pl_counter, zone, items, min_cutoff, units, len(stores)))
                 pl_counter += 1
-                
+
+        return picklists
+
+    @staticmethod
+    def max_weight_for(zone) -> float:
+        return Config.MAX_WEIGHT_FRAGILE if zone in Config.FRAGILE_ZONES else Config.MAX_WEIGHT_STD
+
+    @staticmethod
+    def make_picklist(number: int, zone, items: List[PickedItem], deadline, units, store_count: int) -> Picklist:
+        # Finalize Picklist
+        final_duration = LogicCore.estimate_picklist_duration(items)
+        return Picklist(
+            picklist_no=f"PL_{number:06d}",
+            zone=zone,
+            type="Fragile" if zone in Config.FRAGILE_ZONES else "Standard",
+            items=items,
+            duration_sec=final_duration,
+            deadline=deadline,
+            total_units=units,
+            store_count=store_count,
+        )
+
+    @staticmethod
+    def build_settings() -> dict:
+        """
+        Current values of BUILD_SETTINGS, JSON-ready (FRAGILE_ZONES as a sorted list).
+        """
+        settings = {name: getattr(Config, name) for name in PicklistBuilder.BUILD_SETTINGS}
+        settings['FRAGILE_ZONES'] = sorted(settings['FRAGILE_ZONES'])
+        return settings
+
+    @staticmethod
+    def unpack_picklists(zone, packed: PackedPicklists, lines: pd.DataFrame) -> List[Picklist]:
+        """
+        Picklists of one zone task from its PackedPicklists, with items on a LineStore of
+        lines (the task's input, which packed rows index), numbered from 1.
+        """
+        store = LineStore.from_frame(lines)
+        picklists = []
+        for number, (picked, units, store_count) in enumerate(packed.unpack(), 1):
+            items = PicklistBuilder.inflate_items(store, picked)
+            picklists.append(PicklistBuilder.make_picklist(
+                number, zone, items, min(i['abs_cutoff'] for i in items), units, store_count))
         return picklists
+
+    @staticmethod
+    def report_zone(lines: int, picklists: int, seeds: int, candidates: int):
+        """
+        Add one zone's build counts to the current trace.
+        """
+        Trace.current().add_counts({
+            'zones': 1,
+            'lines': lines,
+            'picklists': picklists,
+            'seed_iterations': seeds,
+            'candidates_evaluated': candidates,
+        })
+
+    @staticmethod
+    def inflate_items(store: LineStore, picked, row_offset: int = 0) -> List[PickedItem]:
+        """
+        Turn columnar (row, qty, atc_score, is_completing) picks into items on store,
+        whose row row_offset + row is the pick's line.
+        """
+        return [
+            PickedItem(store, row + row_offset, qty, score, completing)
+            for row, qty, score, completing in picked
+        ]
+
+    def _build_zone_records(self, group_df: pd.DataFrame, max_weight: float):
+        # Lines are read from the store by row; candidates are (row, remaining, score, completing) tuples
+        store = LineStore.from_frame(group_df)
+        cols = store.columns
+        n_lines = len(group_df)
+
+        def column(name, default):
+            return cols[name] if name in cols else [default] * n_lines
+
+        keys = list(zip(cols['order_id'], cols['sku']))
+        order_l, store_l, weight_l = cols['order_id'], cols['store_id'], cols['weight_in_grams']
+        cutoff_l, pods_l = cols['abs_cutoff'], cols['pods_per_picklist_in_that_zone']
+        bin_l = column('bin_rank', 0)
+        location_key = [
+            (str(floor), str(aisle), str(rack), bin_rank)
+            for floor, aisle, rack, bin_rank in zip(column('floor', ''), column('aisle', ''), column('rack', ''), bin_l)
+        ]
+        cell_l = TravelTimeIndex.from_frame(group_df).cells if LogicCore.travel_model() else [None] * n_lines
+
+        # Track remaining qty for each (order_id, sku) pair
+        remaining = defaultdict(int)
+        order_remaining_qty = defaultdict(int)
+        for key, order_id, qty in zip(keys, order_l, cols['order_qty']):
+            remaining[key] += qty
+            order_remaining_qty[order_id] += qty
+
+        seeds = candidates = picklists = 0
+        while any(qty > 0 for qty in remaining.values()):
+            seeds += 1
+            # Step 1: Score Items
+            available_items = []
+            for row, key in enumerate(keys):
+                remaining_qty = remaining[key]
+                if remaining_qty > 0:
+                    atc_score = self.strategy.calculate_score(PickedItem(store, row, remaining_qty), self.current_time)
+
+                    # Check if picking this item completes the order
+                    is_completing = (order_remaining_qty[order_l[row]] == remaining_qty)
+
+                    available_items.append((row, remaining_qty, atc_score, is_completing))
+
+            if not available_items:
+                break
+
+            # Sort: ATC Score (Desc), Is Completing (Desc), Floor (Asc), Aisle (Asc), Rack (Asc), Bin Rank (Asc)
+            available_items.sort(key=lambda x: (-x[2], -int(x[3])) + location_key[x[0]])
+
+            # Step 2: Seed Selection
+            seed, _, seed_score, seed_completing = available_items[0]
+            seed_key = keys[seed]
+
+            # Calculate max pickable quantity
+            max_qty_by_weight = max_qty_by_limit = Config.MAX_ITEMS_PER_PICKLIST
+            if weight_l[seed] > 0:
+                max_qty_by_weight = max_weight // weight_l[seed]
+
+            seed_qty = min(remaining[seed_key], max_qty_by_limit, max_qty_by_weight)
+
+            if seed_qty <= 0:
+                remaining[seed_key] = 0
+                continue
+
+            current_picklist_items = [PickedItem(store, seed, seed_qty, seed_score, seed_completing)]
+            duration_state = LogicCore.duration_state()
+            duration_state.add(bin_l[seed], order_l[seed], seed_qty, cell_l[seed])
+            remaining[seed_key] -= seed_qty
+            order_remaining_qty[order_l[seed]] -= seed_qty
+
+            # Track Picklist State
+            current_weight = seed_qty * weight_l[seed]
+            current_units = seed_qty
+            current_stores = {store_l[seed]}
+
+            # Cutoff constraint
+            min_cutoff = cutoff_l[seed]
+            max_pods = pods_l[seed]
+
+            # Step 3: Grow Picklist
+            candidates += len(available_items) - 1
+            for row, _, score, completing in available_items[1:]:
+                item_key = keys[row]
+                if remaining[item_key] <= 0:
+                    continue
+
+                # Check store constraint
+                if len(current_stores) >= max_pods and store_l[row] not in current_stores:
+                    continue
+
+                # Calculate max quantity
+                max_qty_by_weight = max_qty_by_items = Config.MAX_ITEMS_PER_PICKLIST - current_units
+
+                if weight_l[row] > 0:
+                    max_qty_by_weight = (max_weight - current_weight) // weight_l[row]
+
+                pick_qty = min(remaining[item_key], max_qty_by_items, max_qty_by_weight)
+
+                if pick_qty <= 0:
+                    continue
+
+                # Time Validity Check
+                proposed_min_cutoff = min(min_cutoff, cutoff_l[row])
+                duration = duration_state.what_if(bin_l[row], order_l[row], pick_qty, cell_l[row])
+                finish_time = self.current_time + timedelta(seconds=duration)
+
+                if finish_time <= proposed_min_cutoff:
+                    # Add item
+                    current_picklist_items.append(PickedItem(store, row, pick_qty, score, completing))
+                    duration_state.add(bin_l[row], order_l[row], pick_qty, cell_l[row])
+                    current_weight += pick_qty * weight_l[row]
+                    current_units += pick_qty
+                    current_stores.add(store_l[row])
+                    min_cutoff = proposed_min_cutoff
+                    remaining[item_key] -= pick_qty
+                    order_remaining_qty[order_l[row]] -= pick_qty
+
+            picklists += 1
+            yield current_picklist_items, min_cutoff, current_units, current_stores
+
+        self.report_zone(n_lines, picklists, seeds, candidates)
+
+    def _build_zone_columnar(self, group_df: pd.DataFrame, max_weight: float):
+        store = LineStore.from_frame(group_df)
+        for picked, units, stores in self.build_zone_columns(ZoneColumns.from_frame(group_df), max_weight):
+            items = self.inflate_items(store, picked)
+            yield items, min(i['abs_cutoff'] for i in items), units, stores
+
+    def build_zone_columns(self, cols: ZoneColumns, max_weight: float):
+        """
+        Run the columnar or indexed greedy over one zone's columns.
+        Yields (picked, units, stores) per picklist, where picked holds (row, qty, atc_score, is_completing).
+        """
+        if self.mode == "indexed":
+            return self._picked_indexed(cols, max_weight)
+        return self._picked_columnar(cols, max_weight)
+
+    def _picked_columnar(self, cols: ZoneColumns, max_weight: float):
+        """
+        Same greedy as _build_zone_records, but every seed iteration scores and ranks the
+        remaining lines in one batched pass over typed columns instead of rebuilding dicts.
+        Only the (order_id, sku) and order totals a picklist touched are updated.
+        """
+        zone = _ColumnarZone(cols, self.current_time, max_weight)
+        picklists = 0
+
+        while True:
+            # Step 1: Score and rank all open lines at once
+            row_remaining = zone.remaining[cols.key_idx]
+            active = np.flatnonzero(row_remaining > 0)
+            if not active.size:
+                break
+
+            active_qty = row_remaining[active]
+            scores = self.strategy.calculate_scores(active_qty, zone.time_until_cutoff[active], self.current_time)
+            completing = zone.order_remaining_qty[cols.order_idx[active]] == active_qty
+            rank = np.lexsort((cols.location_rank[active], ~completing, -scores))
+
+            # Steps 2-3: Seed and grow
+            picklist = zone.build_picklist(_RankedScan(active[rank], scores[rank], completing[rank], cols.store_idx))
+            if picklist is not None:
+                picklists += 1
+                yield picklist
+
+        self.report_zone(len(cols), picklists, zone.seeds, zone.candidates)
+
+    def _picked_indexed(self, cols: ZoneColumns, max_weight: float):
+        """
+        Columnar greedy with seeds taken from a SeedIndex kept ordered across iterations.
+        After each picklist only the lines of the orders it touched are re-scored.
+        """
+        zone = _ColumnarZone(cols, self.current_time, max_weight)
+        index = SeedIndex(cols.location_rank, cols.store_idx, zone.time_until_cutoff, self.strategy, self.current_time)
+        index.refresh(np.arange(len(cols)), zone.remaining[cols.key_idx], zone.order_remaining_qty[cols.order_idx])
+        picklists = 0
+
+        while len(index):
+            picklist = zone.build_picklist(index.scan())
+            if picklist is not None:
+                picklists += 1
+                yield picklist
+
+            # Remaining qty and is_completing can only have changed for lines of touched orders
+            rows = zone.order_rows.rows(sorted(zone.touched_orders))
+            index.refresh(rows, zone.remaining[cols.key_idx[rows]], zone.order_remaining_qty[cols.order_idx[rows]])
+
+        self.report_zone(len(cols), picklists, zone.seeds, zone.candidates)
+
+
+class _RankedScan:
+    """
+    Iterator over one batched ranking, as (row, atc_score, is_completing), that can be
+    narrowed to a set of stores for the rest of the scan.
+    """
+    def __init__(self, rows: np.ndarray, scores: np.ndarray, completing: np.ndarray, store_idx: np.ndarray):
+        self._rows = rows
+        self._scores = scores
+        self._completing = completing
+        self._store_idx = store_idx
+        self._pos = 0
+        self._entries = zip(rows.tolist(), scores.tolist(), completing.tolist())
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self._pos += 1
+        return next(self._entries)
+
+    def narrow(self, stores):
+        rest = np.arange(self._pos, len(self._rows))
+        rest = rest[np.isin(self._store_idx[self._rows[rest]], list(stores))]
+        self._entries = zip(self._rows[rest].tolist(), self._scores[rest].tolist(), self._completing[rest].tolist())
+
+
+class _ColumnarZone:
+    """
+    Mutable state of one zone shared by the columnar and indexed builders.
+    """
+    def __init__(self, cols: ZoneColumns, current_time: datetime, max_weight: float):
+        self.cols = cols
+        self.max_weight = max_weight
+        self.now_ns = pd.Timestamp(current_time).value
+        self.time_until_cutoff = (cols.cutoff_ns - self.now_ns) / 1e9
+
+        self.remaining = np.zeros(cols.n_keys, dtype=cols.qty.dtype)
+        np.add.at(self.remaining, cols.key_idx, cols.qty)
+        self.order_remaining_qty = np.zeros(cols.n_orders, dtype=cols.qty.dtype)
+        np.add.at(self.order_remaining_qty, cols.order_idx, cols.qty)
+        self.order_rows = RowGroups(cols.order_idx, cols.n_orders)
+        self.touched_orders = set()
+        # Seeds taken and grow candidates examined, for the run trace
+        self.seeds = 0
+        self.candidates = 0
+
+        # Plain lists for the scalar grow loop
+        self.key_l = cols.key_idx.tolist()
+        self.order_l = cols.order_idx.tolist()
+        self.store_l = cols.store_idx.tolist()
+        self.weight_l = cols.weight.tolist()
+        self.bin_l = cols.bin_rank.tolist()
+        self.cutoff_l = cols.cutoff_ns.tolist()
+        self.time_left_l = self.time_until_cutoff.tolist()
+        self.pods_l = cols.max_pods.tolist()
+        self.cell_l = TravelTimeIndex(cols.floor_code, cols.aisle_pos).cells if LogicCore.travel_model() \
+            else [None] * len(cols)
+
+    def build_picklist(self, candidates):
+        """
+        Seed with the first (row, atc_score, is_completing) candidate and grow over the rest in order.
+        Once the picklist holds max_pods stores the scan is narrowed to those stores, since no
+        other line can be added any more. Returns None if the seed cannot be picked at all.
+        """
+        remaining, order_remaining_qty = self.remaining, self.order_remaining_qty
+        key_l, order_l, store_l, weight_l, bin_l = self.key_l, self.order_l, self.store_l, self.weight_l, self.bin_l
+        cell_l = self.cell_l
+        max_weight = self.max_weight
+
+        seed, seed_score, seed_completing = next(candidates)
+        self.seeds += 1
+        seed_key = key_l[seed]
+        self.touched_orders = {order_l[seed]}
+
+        max_qty_by_weight = max_qty_by_limit = Config.MAX_ITEMS_PER_PICKLIST
+        if weight_l[seed] > 0:
+            max_qty_by_weight = max_weight // weight_l[seed]
+
+        seed_qty = min(remaining[seed_key].item(), max_qty_by_limit, max_qty_by_weight)
+
+        if seed_qty <= 0:
+            remaining[seed_key] = 0
+            return None
+
+        picked = [(seed, seed_qty, seed_score, seed_completing)]
+        remaining[seed_key] -= seed_qty
+        order_remaining_qty[order_l[seed]] -= seed_qty
+
+        current_weight = seed_qty * weight_l[seed]
+        current_units = seed_qty
+        current_stores = {store_l[seed]}
+        duration_state = LogicCore.duration_state()
+        duration_state.add(bin_l[seed], order_l[seed], seed_qty, cell_l[seed])
+        duration = duration_state.duration
+        min_cutoff = self.cutoff_l[seed]
+        max_pods = self.pods_l[seed]
+        if len(current_stores) >= max_pods:
+            candidates.narrow(current_stores)
+
+        examined = 0
+        for row, score, completing in candidates:
+            examined += 1
+            if current_units >= Config.MAX_ITEMS_PER_PICKLIST:
+                break
+
+            # A line due before the current picklist could finish never fits
+            if self.time_left_l[row] < duration:
+                continue
+
+            if len(current_stores) >= max_pods and store_l[row] not in current_stores:
+                continue
+
+            item_key = key_l[row]
+            item_remaining = remaining[item_key].item()
+            if item_remaining <= 0:
+                continue
+
+            max_qty_by_weight = max_qty_by_items = Config.MAX_ITEMS_PER_PICKLIST - current_units
+            if weight_l[row] > 0:
+                max_qty_by_weight = (max_weight - current_weight) // weight_l[row]
+
+            pick_qty = min(item_remaining, max_qty_by_items, max_qty_by_weight)
+            if pick_qty <= 0:
+                continue
+
+            proposed_min_cutoff = min(min_cutoff, self.cutoff_l[row])
+            proposed_duration = duration_state.what_if(bin_l[row], order_l[row], pick_qty, cell_l[row])
+
+            if proposed_duration * 1e9 <= proposed_min_cutoff - self.now_ns:
+                picked.append((row, pick_qty, score, completing))
+                current_weight += pick_qty * weight_l[row]
+                current_units += pick_qty
+                if store_l[row] not in current_stores:
+                    current_stores.add(store_l[row])
+                    if len(current_stores) >= max_pods:
+                        candidates.narrow(current_stores)
+                duration_state.add(bin_l[row], order_l[row], pick_qty, cell_l[row])
+                duration = proposed_duration
+                min_cutoff = proposed_min_cutoff
+                remaining[item_key] -= pick_qty
+                order_remaining_qty[order_l[row]] -= pick_qty
+                self.touched_orders.add(order_l[row])
+
+        self.candidates += examined
+        return picked, current_units, current_stores
@@ -0,0 +1,81 @@
+import pandas as pd
+from datetime import date, datetime
+from typing import List, Tuple
+from .config import Config
+from .instrumentation import Trace
+from .parallel_engine import ScalableOptimizationEngine
+from .scheduler import IncrementalScheduler, Scheduler
+from .utils import ResultWriter
+
+
+class PipelinedPlan:
+    """
+    Build, schedule and write as one pipeline (Config.PIPELINE) instead of three stages.
+
+    Zones go to an IncrementalScheduler as their builds arrive (imap_unordered, or cluster
+    workers). Pending picklists wait in one deadline-ordered queue; those due before the
+    earliest cutoff of every zone still building are assigned right away, since no
+    picklist of those zones can be due earlier. Assignments go to a ResultWriter thread as
+    they are made. The plan is the one the pooled scheduler in "edd" order makes from the
+    staged build: queue ties keep the staged order, because a zone's picklists are
+    numbered from the line count of the zones before it (a zone never has more picklists
+    than lines) and split remainders after every line.
+    """
+    def __init__(self, engine: ScalableOptimizationEngine, base_date: date, start_time: datetime):
+        self.check_config()
+        self.engine = engine
+        self.base_date = base_date
+        self.start_time = start_time
+        self.writer = None
+
+    @staticmethod
+    def check_config():
+        """
+        Raise ValueError for settings the pipeline cannot honour; main checks before loading.
+        """
+        if Config.SCHEDULER_MODE != "pooled" or Config.SCHEDULE_ORDER != "edd":
+            raise ValueError('Pipelined planning needs SCHEDULER_MODE = "pooled" and SCHEDULE_ORDER = "edd"')
+        if Config.COMPILED_DATA_DIR or Config.STREAM_CHUNK_ROWS or Config.LOCAL_SEARCH_SECONDS is not None:
+            raise ValueError("Pipelined planning needs an in-memory run without local search; "
+                             "unset COMPILED_DATA_DIR, STREAM_CHUNK_ROWS and LOCAL_SEARCH_SECONDS")
+
+    def run(self, df: pd.DataFrame) -> Tuple[List[dict], List[dict], List[dict]]:
+        """
+        (picklists, assignments, unassigned). The writer is still open; close_writer()
+        finishes the output.
+        """
+        trace = Trace.current()
+        zones = df.groupby('zone', observed=True, sort=False)['abs_cutoff'].agg(['size', 'min'])
+        zones = zones.loc[[zone for zone in df['zone'].unique() if zone in zones.index]]
+        first_seq = dict(zip(zones.index, (zones['size'].cumsum() - zones['size']).tolist()))
+        earliest = dict(zip(zones.index, zones['min']))
+        building = set(zones.index)
+
+        schedule = IncrementalScheduler(Scheduler.create_pickers(self.base_date), self.start_time,
+                                        first_seq=len(df))
+        self.writer = ResultWriter(self.base_date, background=True)
+
+        def on_zone(zone, picklists):
+            schedule.add(picklists, [first_seq[zone] + k for k in range(len(picklists))])
+            building.discard(zone)
+            made = schedule.advance(min((earliest[z] for z in building), default=None))
+            if made:
+                self.writer.add(schedule.assignments[-made:])
+            if building:
+                trace.count("pipeline_early_assignments", made)
+
+        with trace.stage("build") as stage:
+            picklists = self.engine.run_parallel_build(df, self.start_time, on_zone=on_zone)
+            stage["picklists"] = len(picklists)
+        print(f"Generated {len(picklists)} candidate picklists.")
+
+        with trace.stage("schedule"):
+            made = len(schedule.assignments)
+            schedule.advance()
+            assignments, unassigned = schedule.finish()
+            self.writer.add(assignments[made:])
+        Scheduler.report_schedule(assignments, unassigned)
+        return picklists, assignments, unassigned
+
+    def close_writer(self):
+        self.writer.close()
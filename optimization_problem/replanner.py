@@ -0,0 +1,228 @@
+import heapq
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from .config import Config
+from .core_logic import ATCScoringStrategy
+from .data_loader import DataLoader
+from .instrumentation import Trace
+from .line_store import Picklist
+from .parallel_engine import ScalableOptimizationEngine
+from .picklist_builder import PicklistBuilder
+from .scheduler import Scheduler
+
+
+class IncrementalPlanner:
+    """
+    Keeps the order lines, picklists and assignments of the last plan so that a delta of
+    new or cancelled lines does not need a full rerun.
+
+    replan(now, added, cancelled):
+      - assignments that started before now are frozen (in progress or done) and their
+        picked quantities are consumed;
+      - only zones touched by the delta are rebuilt, from their lines minus what frozen
+        assignments already picked, with the builder clock at now;
+      - not-started picklists of all other zones are kept as they are;
+      - all not-started work is rescheduled from now, with every picker available once
+        its frozen assignments end.
+
+    Rebuild cost is that of the touched zones only, and scheduling covers only the part
+    of the day that has not started yet.
+    """
+    def __init__(self, df: pd.DataFrame, base_date: date, start_time: datetime, n_workers: Optional[int] = None,
+                 engine: Optional[ScalableOptimizationEngine] = None):
+        self.base_date = base_date
+        self.start_time = start_time
+        self.now = start_time
+        self.engine = engine or ScalableOptimizationEngine(n_workers)
+
+        self._initial = df
+        self.zone_lines: Dict[str, pd.DataFrame] = {}
+        for zone, lines in df.groupby('zone', sort=False, observed=True):
+            self.zone_lines[zone] = lines
+        # Zones each order has lines in, so a cancellation only looks at those zones
+        self._order_zones: Dict[str, set] = defaultdict(set)
+        self._index_orders(df)
+
+        # Not-started picklists per zone, in scheduling order; zones keep first-appearance order
+        self.pending: Dict[str, List[dict]] = {}
+        self.frozen: List[dict] = []
+        self.scheduled: List[dict] = []
+        self.unassigned: List[dict] = []
+        # Units picked by frozen assignments per (order_id, sku)
+        self.consumed: Dict[Tuple, float] = defaultdict(int)
+        self._numbers: Dict[str, int] = defaultdict(int)
+
+    @property
+    def assignments(self) -> List[dict]:
+        return self.frozen + self.scheduled
+
+    def plan(self) -> Tuple[List[dict], List[dict]]:
+        """
+        Full build (and local search, with Config.LOCAL_SEARCH_SECONDS set) and schedule at
+        start_time; the baseline later deltas are applied to.
+        """
+        trace = Trace.current()
+        with trace.stage("replan_build", zones=len(self.zone_lines)):
+            picklists = self.engine.run_parallel_build(self._initial, self.start_time)
+            if Config.LOCAL_SEARCH_SECONDS is not None:
+                picklists = self.engine.improve_picklists(picklists, self.start_time)
+        self._initial = None
+
+        self.pending = {zone: [] for zone in self.zone_lines}
+        for pl in picklists:
+            self.pending[pl['zone']].append(pl)
+            self._numbers[pl['zone']] += 1
+
+        with trace.stage("replan_schedule"):
+            return self._schedule(self.start_time)
+
+    def replan(self, now: datetime, added: Optional[pd.DataFrame] = None,
+               cancelled: Optional[pd.DataFrame] = None) -> Tuple[List[dict], List[dict]]:
+        """
+        Apply a delta at time now. added holds raw lines in the input.csv schema; cancelled
+        holds order_id and optionally sku (without sku the whole order is cancelled).
+        Units already picked by started assignments cannot be cancelled.
+        Returns the full plan: (frozen + rescheduled assignments, unassigned picklists).
+        """
+        if now < self.now:
+            raise ValueError(f"Cannot replan at {now}, the last plan was made at {self.now}")
+        self.now = now
+        trace = Trace.current()
+
+        self._freeze(now)
+        affected = set()
+        if added is not None and len(added):
+            affected |= self._add_lines(added)
+        if cancelled is not None and len(cancelled):
+            affected |= self._cancel_lines(cancelled)
+
+        with trace.stage("replan_build", zones=len(affected)):
+            for zone in self.zone_lines:
+                if zone in affected:
+                    self.pending[zone] = self._rebuild_zone(zone, now)
+        trace.count("replan_zones_rebuilt", len(affected))
+
+        with trace.stage("replan_schedule"):
+            return self._schedule(now)
+
+    def _freeze(self, now: datetime):
+        """
+        Move assignments that started before now to frozen, and return everything else
+        (not-started assignments and unassigned picklists) to the pending picklists of its zone.
+        """
+        pending = defaultdict(list)
+        for assignment in sorted(self.scheduled, key=lambda a: a['start_time']):
+            if assignment['start_time'] < now:
+                self.frozen.append(assignment)
+                for item in assignment['items']:
+                    self.consumed[(item['order_id'], item['sku'])] += item['order_qty']
+            else:
+                pl = self._as_picklist(assignment)
+                pending[pl['zone']].append(pl)
+        for pl in self.unassigned:
+            pending[pl['zone']].append(pl)
+
+        self.scheduled, self.unassigned = [], []
+        self.pending = {zone: pending.get(zone, []) for zone in self.zone_lines}
+
+    def _index_orders(self, lines: pd.DataFrame):
+        pairs = lines[['order_id', 'zone']].drop_duplicates()
+        for order_id, zone in zip(pairs['order_id'], pairs['zone']):
+            self._order_zones[order_id].add(zone)
+
+    def _add_lines(self, added: pd.DataFrame) -> set:
+        added = DataLoader._clean(added.copy())
+        self._index_orders(added)
+        for zone, lines in added.groupby('zone', sort=False, observed=True):
+            if zone in self.zone_lines:
+                self.zone_lines[zone] = pd.concat([self.zone_lines[zone], lines], ignore_index=True)
+            else:
+                self.zone_lines[zone] = lines.reset_index(drop=True)
+                self.pending[zone] = []
+        return set(added['zone'].unique())
+
+    def _cancel_lines(self, cancelled: pd.DataFrame) -> set:
+        cancelled = cancelled.rename(columns=lambda c: c.lower().strip())
+        by_order = 'sku' not in cancelled.columns
+        targets = set(cancelled['order_id']) if by_order else set(zip(cancelled['order_id'], cancelled['sku']))
+
+        orders = targets if by_order else set(order_id for order_id, _ in targets)
+        zones = set().union(*(self._order_zones.get(order_id, ()) for order_id in orders))
+
+        affected = set()
+        for zone in zones:
+            lines = self.zone_lines[zone]
+            if by_order:
+                hit = lines['order_id'].isin(targets).to_numpy()
+            else:
+                hit = np.fromiter(((o, s) in targets for o, s in zip(lines['order_id'], lines['sku'])),
+                                  dtype=bool, count=len(lines))
+            if hit.any():
+                self.zone_lines[zone] = lines[~hit]
+                affected.add(zone)
+        return affected
+
+    def open_lines(self, zone: str) -> pd.DataFrame:
+        """
+        Lines of zone with the units frozen assignments picked taken off. Consumption of an
+        (order_id, sku) is charged to its lines in order, as the builder picks them.
+        """
+        lines = self.zone_lines[zone]
+        qty = lines['order_qty'].to_numpy()
+        consumed = np.array([self.consumed.get(key, 0) for key in zip(lines['order_id'], lines['sku'])],
+                            dtype=np.float64)
+        before = lines.groupby(['order_id', 'sku'], sort=False, observed=True)['order_qty'].cumsum().to_numpy() - qty
+        open_qty = qty - np.clip(consumed - before, 0, qty).astype(qty.dtype)
+        keep = open_qty > 0
+        return lines[keep].assign(order_qty=open_qty[keep])
+
+    def _rebuild_zone(self, zone: str, now: datetime) -> List[dict]:
+        lines = self.open_lines(zone)
+        if lines.empty:
+            return []
+        picklists = PicklistBuilder(lines, now, strategy=ATCScoringStrategy()).generate_picklists()
+        for pl in picklists:
+            self._numbers[zone] += 1
+            pl['picklist_no'] = f"PL_{self._numbers[zone]:06d}"
+        return picklists
+
+    def pickers_at(self, now: datetime) -> list:
+        """
+        Picker heap as Scheduler.create_pickers, with each picker busy until its last
+        frozen assignment ends.
+        """
+        busy_until = {}
+        for assignment in self.frozen:
+            pid = assignment['picker_id']
+            busy_until[pid] = max(busy_until.get(pid, assignment['end_time']), assignment['end_time'])
+
+        pickers = [
+            (max(start, busy_until.get(pid, start)), pid, shift_end)
+            for start, pid, shift_end in Scheduler.create_pickers(self.base_date)
+        ]
+        heapq.heapify(pickers)
+        return pickers
+
+    def _schedule(self, now: datetime) -> Tuple[List[dict], List[dict]]:
+        picklists = [pl for zone in self.zone_lines for pl in self.pending.get(zone, [])]
+        self.scheduled, self.unassigned = Scheduler.assign_picklists(
+            picklists, self.pickers_at(now), max(now, self.start_time))
+        return self.assignments, self.unassigned
+
+    @staticmethod
+    def _as_picklist(assignment: dict) -> Picklist:
+        items = assignment['items']
+        zone = items[0]['zone']
+        return Picklist(
+            picklist_no=assignment['picklist_no'],
+            zone=zone,
+            type="Fragile" if zone in Config.FRAGILE_ZONES else "Standard",
+            items=items,
+            duration_sec=assignment['duration_sec'],
+            deadline=min(i['abs_cutoff'] for i in items),
+            total_units=sum(i['order_qty'] for i in items),
+            store_count=len(set(i['store_id'] for i in items)),
+        )
@@ -0,0 +1,140 @@
+import itertools
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, List, Optional, Union
+import pandas as pd
+from .config import Config
+from .data_loader import DataLoader
+from .local_search import PicklistLocalSearch
+from .metrics import PlanMetrics
+from .parallel_engine import ScalableOptimizationEngine
+from .scheduler import Scheduler
+
+# Cleaned input of the sweep, set by the pool initializer so each worker receives it once
+_scenario_data = None
+
+# KPIs of PlanMetrics that go into the comparison table
+KPI_COLUMNS = [
+    'units_available', 'units_picked', 'units_on_time', 'completed_orders', 'total_orders',
+    'wasted_effort_sec', 'worked_sec', 'capacity_sec', 'utilization',
+]
+
+
+def _set_scenario_data(df: pd.DataFrame, base_date: date, cutoff_map: dict):
+    global _scenario_data
+    _scenario_data = (df, base_date, cutoff_map)
+
+
+def _check_parameters(names):
+    unknown = sorted(set(name for name in names if not hasattr(Config, name)))
+    if unknown:
+        raise ValueError(f"Unknown Config parameters: {', '.join(unknown)}")
+
+
+@contextmanager
+def config_overrides(overrides: Dict[str, object]):
+    """
+    Set Config attributes for the duration of the block and restore them afterwards.
+    """
+    _check_parameters(overrides)
+    previous = {name: getattr(Config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(Config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(Config, name, value)
+
+
+class ScenarioSweep:
+    """
+    What-if runs of the builder and scheduler under different Config overrides.
+
+    The input is loaded and cleaned once and handed to the pool workers when they start.
+    Each scenario runs whole in one worker. Its overrides travel with the task and are
+    applied to that worker's Config only while the scenario runs, so scenarios with
+    different settings run side by side. Zones are built one after another inside the
+    worker; the parallelism is across scenarios. A scenario that overrides CUTOFF_MAP
+    recomputes the cutoffs of the shared input inside its worker.
+    """
+    def __init__(self, df: pd.DataFrame, base_date: date, n_workers: Optional[int] = None):
+        self.df = df
+        self.base_date = base_date
+        self.engine = ScalableOptimizationEngine(n_workers)
+
+    @staticmethod
+    def grid(**values: list) -> List[Dict[str, object]]:
+        """
+        Every combination of the given values, e.g. grid(ATC_K=[1, 2], MAX_ITEMS_PER_PICKLIST=[1000, 2000]).
+        """
+        names = list(values)
+        return [dict(zip(names, combo)) for combo in itertools.product(*(values[name] for name in names))]
+
+    def run(self, scenarios: Union[List[Dict[str, object]], Dict[str, Dict[str, object]]]) -> pd.DataFrame:
+        """
+        Run every scenario and return one row per scenario: its overrides, the PlanMetrics
+        KPIs, the picklist count and the build, schedule and total seconds. scenarios is a
+        list of overrides or a dict of name -> overrides; {} is the current Config.
+        """
+        if not isinstance(scenarios, dict):
+            scenarios = {self.scenario_name(overrides): overrides for overrides in scenarios}
+        _check_parameters(name for overrides in scenarios.values() for name in overrides)
+
+        names = list(scenarios)
+        tasks = [(scenarios[name],) for name in names]
+        print(f"Running {len(tasks)} scenarios using {self.engine.n_workers} workers...")
+        results = self.engine._map_largest_first(
+            self._run_scenario, tasks, [1.0] * len(tasks), names,
+            initializer=_set_scenario_data, initargs=(self.df, self.base_date, dict(Config.CUTOFF_MAP)))
+
+        rows = [{'scenario': name, **{k: repr(v) for k, v in scenarios[name].items()}, **result}
+                for name, result in zip(names, results)]
+        return pd.DataFrame(rows).set_index('scenario')
+
+    @staticmethod
+    def scenario_name(overrides: Dict[str, object]) -> str:
+        return ", ".join(f"{name}={value!r}" for name, value in overrides.items()) or "baseline"
+
+    @staticmethod
+    def _run_scenario(overrides: Dict[str, object]) -> dict:
+        df, base_date, cutoff_map = _scenario_data
+        with config_overrides(overrides):
+            if Config.CUTOFF_MAP != cutoff_map:
+                df = df.assign(abs_cutoff=DataLoader._get_absolute_cutoffs(df))
+            return ScenarioSweep.evaluate(df, base_date)
+
+    @staticmethod
+    def evaluate(df: pd.DataFrame, base_date: date) -> dict:
+        """
+        Build, optionally improve, schedule and measure one plan under the current Config,
+        in this process. The zone tasks and their order are those of the frames dispatch,
+        so the plan is the one the main pipeline makes.
+        """
+        perf_start = time.time()
+        start_time = datetime.combine(base_date, datetime.strptime(Config.GLOBAL_START_TIME_STR, "%H:%M").time())
+
+        tasks, zone_of_task, _ = ScalableOptimizationEngine.zone_tasks(df, start_time)
+        results = [ScalableOptimizationEngine._process_zone(*task) for task in tasks]
+        picklists = ScalableOptimizationEngine._merge_partitions(zone_of_task, results)
+        if Config.LOCAL_SEARCH_SECONDS is not None:
+            by_zone, tasks = ScalableOptimizationEngine.search_tasks(picklists, start_time)
+            results = [PicklistLocalSearch.improve_zone(*task) for task in tasks]
+            picklists = ScalableOptimizationEngine.apply_search_results(by_zone, results)
+        build_sec = time.time() - perf_start
+
+        schedule_start = time.time()
+        assignments, unassigned = Scheduler.assign_picklists(picklists, Scheduler.create_pickers(base_date), start_time)
+        schedule_sec = time.time() - schedule_start
+
+        metrics = PlanMetrics.compute(assignments, unassigned, perf_start)
+        return {
+            **{name: getattr(metrics, name) for name in KPI_COLUMNS},
+            'picked_pct': metrics.picked_pct,
+            'on_time_pct': metrics.on_time_pct,
+            'picklists': len(picklists),
+            'build_sec': build_sec,
+            'schedule_sec': schedule_sec,
+            'runtime_sec': metrics.runtime_sec,
+        }
@@ -1,8 +1,178 @@
 import heapq
+import itertools
+import math
+from collections import defaultdict, deque
 from datetime import datetime, timedelta, date
-from typing import List
+from typing import Callable, List, Optional
 from .config import Config
-from .core_logic import LogicCore
+from .core_logic import LogicCore, PicklistProfile
+from .instrumentation import Trace
+from .line_store import Picklist
+
+class PickerPools:
+    """
+    Idle pickers grouped by shift end, each group a heap on (available_time, picker_id).
+    All pickers of a group share shift_end, so a group's top picker has both the earliest
+    start and the most shift left: it is the group's best candidate for any picklist, and
+    "earliest picker that fits" is a scan over one top per shift. Pickers with less shift
+    left than the shortest possible picklist are dropped as they surface.
+    """
+    def __init__(self, pickers: list, global_op_start_time: datetime):
+        self.global_op_start_time = global_op_start_time
+        self.min_duration = LogicCore.min_duration()
+        self._pools = defaultdict(list)
+        for avail_time, pid, shift_end in pickers:
+            self._pools[shift_end].append((avail_time, pid))
+        for heap in self._pools.values():
+            heapq.heapify(heap)
+        self._prune()
+
+    def __bool__(self):
+        return bool(self._pools)
+
+    def tops(self):
+        """
+        (start_time, picker_id, shift_end) of every group's top picker, earliest start first.
+        """
+        tops = []
+        for shift_end, heap in self._pools.items():
+            avail_time, pid = heap[0]
+            tops.append((max(avail_time, self.global_op_start_time), pid, shift_end))
+        tops.sort()
+        return tops
+
+    def earliest(self, fits: Callable[[datetime, datetime], bool]):
+        """
+        Pop and return the earliest-starting top picker for which fits(start_time, shift_end) holds.
+        """
+        for start_time, pid, shift_end in self.tops():
+            if fits(start_time, shift_end):
+                self.take(shift_end)
+                return start_time, pid, shift_end
+        return None
+
+    def take(self, shift_end: datetime):
+        heap = self._pools[shift_end]
+        heapq.heappop(heap)
+        if not heap:
+            del self._pools[shift_end]
+
+    def release(self, pid: str, avail_time: datetime, shift_end: datetime):
+        heapq.heappush(self._pools[shift_end], (avail_time, pid))
+        self._prune()
+
+    def _prune(self):
+        for shift_end in list(self._pools):
+            heap = self._pools[shift_end]
+            while heap and (shift_end - max(heap[0][0], self.global_op_start_time)).total_seconds() < self.min_duration:
+                heapq.heappop(heap)
+            if not heap:
+                del self._pools[shift_end]
+
+
+class PendingPicklists:
+    """
+    Picklists waiting for a picker, popped in Config.SCHEDULE_ORDER:
+    "input" (builder order, split remainders first), "edd" (earliest deadline, then shortest)
+    or "atc" (apparent tardiness cost at the current picker time).
+
+    ATC index at time t is (1/p) * exp(-max(d - p - t, 0) / (K * p_mean)). While d - p > t the
+    ordering between picklists does not depend on t, so those sit in one static heap; once t
+    passes d - p a picklist moves to an overdue heap ordered by shortest duration. Each
+    picklist is pushed and moved at most once, which keeps a full run O(N log N).
+
+    Ties go to the lower sequence number: push order, numbered from first_seq, unless push
+    is given one.
+    """
+    ORDERS = ("input", "edd", "atc")
+
+    def __init__(self, picklists: List[dict], reference_time: datetime, order: Optional[str] = None,
+                 first_seq: int = 0):
+        self.order = order or Config.SCHEDULE_ORDER
+        if self.order not in self.ORDERS:
+            raise ValueError(f"Unknown schedule order: {self.order}")
+        self.reference_time = reference_time
+        durations = [pl['duration_sec'] for pl in picklists]
+        self.atc_scale = Config.SCHEDULE_ATC_K * (sum(durations) / len(durations) if durations else 1.0)
+
+        self._seq = itertools.count(first_seq)
+        self._size = 0
+        self._fifo = deque()
+        self._heap = []
+        self._critical = []
+        self._overdue = []
+        self._popped = set()
+        self._moved = set()
+        for pl in picklists:
+            self.push(pl)
+
+    def __len__(self):
+        return self._size
+
+    def push(self, pl: dict, front: bool = False, seq: Optional[int] = None):
+        self._size += 1
+        if self.order == "input":
+            if front:
+                self._fifo.appendleft(pl)
+            else:
+                self._fifo.append(pl)
+            return
+
+        seq = next(self._seq) if seq is None else seq
+        if self.order == "edd":
+            heapq.heappush(self._heap, (pl['deadline'], pl['duration_sec'], seq, pl))
+            return
+
+        duration = max(pl['duration_sec'], 1.0)
+        critical = (pl['deadline'] - self.reference_time).total_seconds() - duration
+        heapq.heappush(self._heap, (math.log(duration) + critical / self.atc_scale, seq, pl))
+        heapq.heappush(self._critical, (critical, seq, pl))
+
+    def next_deadline(self):
+        """
+        Deadline of the picklist pop would return next ("edd" only).
+        """
+        if self.order != "edd":
+            raise ValueError(f"next_deadline needs the edd order, not {self.order}")
+        return self._heap[0][0] if self._heap else None
+
+    def pop(self, now: datetime) -> dict:
+        self._size -= 1
+        if self.order == "input":
+            return self._fifo.popleft()
+        if self.order == "edd":
+            return heapq.heappop(self._heap)[-1]
+
+        now_sec = (now - self.reference_time).total_seconds()
+        while self._critical and self._critical[0][0] <= now_sec:
+            _, seq, pl = heapq.heappop(self._critical)
+            if seq not in self._popped:
+                self._moved.add(seq)
+                heapq.heappush(self._overdue, (pl['duration_sec'], seq, pl))
+        while self._heap and (self._heap[0][1] in self._popped or self._heap[0][1] in self._moved):
+            heapq.heappop(self._heap)
+
+        take_overdue = bool(self._overdue)
+        if self._overdue and self._heap:
+            overdue_index = 1.0 / max(self._overdue[0][0], 1.0)
+            slack_index = math.exp(now_sec / self.atc_scale - self._heap[0][0])
+            take_overdue = overdue_index >= slack_index
+
+        _, seq, pl = heapq.heappop(self._overdue if take_overdue else self._heap)
+        self._popped.add(seq)
+        return pl
+
+    def drain(self) -> List[dict]:
+        if self.order == "input":
+            pending = list(self._fifo)
+        else:
+            entries = {entry[-2]: entry[-1] for entry in self._heap + self._overdue if entry[-2] not in self._popped}
+            pending = [entries[seq] for seq in sorted(entries)]
+        self._fifo.clear()
+        self._heap, self._critical, self._overdue = [], [], []
+        self._size = 0
+        return pending
+
 
 class Scheduler:
     @staticmethod
@@ -41,7 +211,35 @@ class Scheduler:
         return picker_windows
 
     @staticmethod
-    def assign_picklists(picklists: List[dict], pickers: list, global_op_start_time: datetime):
+    def assign_picklists(picklists: List[dict], pickers: list, global_op_start_time: datetime,
+                         mode: Optional[str] = None):
+        mode = mode or Config.SCHEDULER_MODE
+        if mode == "pooled":
+            assign = Scheduler._assign_picklists_pooled
+        elif mode == "legacy":
+            assign = Scheduler._assign_picklists_legacy
+        else:
+            raise ValueError(f"Unknown scheduler mode: {mode}")
+
+        assignments, unassigned = assign(picklists, pickers, global_op_start_time)
+        Scheduler.report_schedule(assignments, unassigned)
+        return assignments, unassigned
+
+    @staticmethod
+    def report_schedule(assignments: List[dict], unassigned: List[dict]):
+        """
+        Add a schedule's counts to the current trace.
+        """
+        trace = Trace.current()
+        if trace.enabled:
+            trace.add_counts({
+                "schedule_assigned": len(assignments),
+                "schedule_late": sum(1 for a in assignments if a['status'] != "OnTime"),
+                "schedule_unassigned": len(unassigned),
+            })
+
+    @staticmethod
+    def _assign_picklists_legacy(picklists: List[dict], pickers: list, global_op_start_time: datetime):
         assignments = []
         unassigned = []
         split_counter = 1
@@ -64,11 +262,13 @@ class Scheduler:
                 if finish_time > shift_end:
                     # split picklist to use remaining shift
                     if remaining_shift > 0:
-                        truncated = Scheduler._truncate_picklist_to_time(pl['items'], remaining_shift)
-                        if truncated:
-                            partial_duration = LogicCore.estimate_picklist_duration(truncated)
+                        profile = Scheduler._profile(pl)
+                        taken = profile.longest_prefix(remaining_shift)
+                        if taken:
+                            truncated = pl['items'][:taken]
+                            partial_duration = profile.durations[taken - 1]
                             partial_finish = start_time + timedelta(seconds=partial_duration)
-                            partial_deadline = min(i['abs_cutoff'] for i in truncated if 'abs_cutoff')
+                            partial_deadline = profile.deadlines[taken - 1]
                             
                             # Deadline check for partial
                             if partial_finish <= partial_deadline:
@@ -84,11 +284,12 @@ class Scheduler:
                                 heapq.heappush(pickers, (partial_finish, pid, shift_end))
                                 
                                 # Build remainder and requeue
-                                remainder_items = Scheduler._build_remainder(pl['items'], truncated)
-                                if remainder_items:
-                                    remainder = Scheduler._rebuild_picklist(pl, remainder_items, suffix=split_counter)
+                                Trace.current().count("schedule_splits")
+                                if taken < len(pl['items']):
+                                    remainder = Scheduler._rebuild_picklist(pl, taken, suffix=split_counter)
                                     # Insert remainder to keep ordering
                                     picklists.insert(idx + 1, remainder)
+                                    Trace.current().count("schedule_remainders")
                                     
                                 split_counter += 1
                                 assigned = True
@@ -133,38 +334,179 @@ class Scheduler:
         return assignments, unassigned
 
     @staticmethod
-    def _truncate_picklist_to_time(items, max_seconds):
+    def _assign_picklists_pooled(picklists: List[dict], pickers: list, global_op_start_time: datetime):
         """
-        Greedily take items until duration exceeds max_seconds.
+        Event-driven variant of the legacy loop, see IncrementalScheduler. With "input"
+        order it makes the legacy plan while the earliest picker can take each picklist;
+        when pickers run short the plans part, as the legacy loop drops pickers that
+        pooled keeps for the next picklist.
         """
-        subset = []
-        for item in items:
-            subset.append(item)
-            if LogicCore.estimate_picklist_duration(subset) > max_seconds:
-                subset.pop()
-                break
-        return subset
+        run = IncrementalScheduler(pickers, global_op_start_time, picklists)
+        run.advance()
+        return run.finish()
 
     @staticmethod
-    def _build_remainder(original_items, taken_items):
-        # Simple diff based on some ID or object identity if possible.
-        # Since items are dicts, we can use a unique key or just list slicing if order preserved.
-        # Order is preserved.
-        taken_count = len(taken_items)
-        return original_items[taken_count:]
+    def _assign_late(pl: dict, pools: PickerPools, assignments: List[dict], unassigned: List[dict]):
+        """
+        Earliest picker whose shift holds the whole picklist, even if it finishes late.
+        """
+        duration = timedelta(seconds=pl['duration_sec'])
+        slot = pools.earliest(lambda start, shift_end: start + duration <= shift_end) if pools else None
+        if not slot:
+            unassigned.append(pl)
+            return
+
+        start_time, pid, shift_end = slot
+        finish_time = start_time + duration
+        status = "OnTime" if finish_time <= pl['deadline'] else "Late"
+        assignments.append(Scheduler._assignment(pl, pid, start_time, finish_time, status))
+        pools.release(pid, finish_time, shift_end)
 
     @staticmethod
-    def _rebuild_picklist(original_pl, items, suffix):
-        duration = LogicCore.estimate_picklist_duration(items)
-        # Recalculate deadline
-        deadline = min(i['abs_cutoff'] for i in items)
+    def _assignment(pl: dict, pid: str, start_time: datetime, finish_time: datetime, status: str) -> dict:
         return {
-            "picklist_no": f"{original_pl['picklist_no']}_R{suffix}",
-            "zone": original_pl['zone'],
-            "type": original_pl['type'],
-            "items": items,
-            "duration_sec": duration,
-            "deadline": deadline,
-            "total_units": sum(i['picked_qty'] for i in items),
-            "store_count": len(set(i['store_id'] for i in items))
+            "picklist_no": pl['picklist_no'],
+            "picker_id": pid,
+            "start_time": start_time,
+            "end_time": finish_time,
+            "duration_sec": pl['duration_sec'],
+            "items": pl['items'],
+            "status": status
         }
+
+    @staticmethod
+    def _profile(pl: dict) -> PicklistProfile:
+        """
+        PicklistProfile of pl's items, cached on Picklist objects.
+        """
+        profile = pl.profile if isinstance(pl, Picklist) else None
+        if profile is None:
+            profile = PicklistProfile(pl['items'])
+            if isinstance(pl, Picklist):
+                pl.profile = profile
+        return profile
+
+    @staticmethod
+    def _rebuild_picklist(original_pl, taken: int, suffix):
+        """
+        Remainder of original_pl after its first taken items. Its header comes from the
+        profile's suffix aggregates, and it carries its own profile for the next split.
+        """
+        (duration, deadline, units, store_count), profile = Scheduler._profile(original_pl).remainder(taken)
+        remainder = Picklist(
+            picklist_no=f"{original_pl['picklist_no']}_R{suffix}",
+            zone=original_pl['zone'],
+            type=original_pl['type'],
+            items=original_pl['items'][taken:],
+            duration_sec=duration,
+            deadline=deadline,
+            total_units=units,
+            store_count=store_count,
+        )
+        remainder.profile = profile
+        return remainder
+
+
+class IncrementalScheduler:
+    """
+    The pooled scheduler, fed picklists in batches. Idle pickers live in PickerPools, so the
+    best picker per shift is found in O(S log P), and pickers that cannot take one picklist
+    stay available for the next. Pending picklists (and split remainders) come from
+    PendingPicklists in Config.SCHEDULE_ORDER, evaluated at the earliest picker start.
+    Per picklist: whole and on time, else an on-time prefix up to a shift end, else
+    whole but late (deferred until finish for "edd"/"atc"), else unassigned.
+
+    Assignments are final once made. add picklists as they are built and advance as far as
+    is safe; after the last batch, advance() and finish() give what one call with every
+    picklist would. With "edd", advance(before) only assigns picklists due before
+    `before`, so a caller that knows no later picklist can be due earlier (the earliest
+    cutoff of every zone still building) gets the same plan as scheduling them all at once,
+    provided seqs keep the all-at-once order.
+    """
+    def __init__(self, pickers: list, global_op_start_time: datetime, picklists: List[dict] = (),
+                 order: Optional[str] = None, first_seq: int = 0):
+        self.assignments = []
+        self.unassigned = []
+        self.split_counter = 1
+        self.pools = PickerPools(pickers, global_op_start_time)
+        self.queue = PendingPicklists(list(picklists), global_op_start_time, order, first_seq)
+        self.late = []
+
+    def add(self, picklists: List[dict], seqs: Optional[List[int]] = None):
+        for k, pl in enumerate(picklists):
+            self.queue.push(pl, seq=seqs[k] if seqs is not None else None)
+
+    def advance(self, before=None) -> int:
+        """
+        Assign pending picklists ("edd" with before: only those due before it). Returns the
+        number of assignments made.
+        """
+        queue, pools, assignments = self.queue, self.pools, self.assignments
+        made = len(assignments)
+        while queue and pools:
+            if before is not None and not queue.next_deadline() < before:
+                break
+            pl = queue.pop(pools.tops()[0][0])
+            duration = timedelta(seconds=pl['duration_sec'])
+
+            # 1. Earliest picker finishing within both its shift and the deadline
+            slot = pools.earliest(lambda start, shift_end: start + duration <= min(shift_end, pl['deadline']))
+            if slot:
+                start_time, pid, shift_end = slot
+                finish_time = start_time + duration
+                assignments.append(Scheduler._assignment(pl, pid, start_time, finish_time, "OnTime"))
+                pools.release(pid, finish_time, shift_end)
+                continue
+
+            # 2. Earliest picker that can do an on-time prefix before its shift ends
+            split = None
+            for start_time, pid, shift_end in pools.tops():
+                if start_time + duration <= shift_end:
+                    continue
+                profile = Scheduler._profile(pl)
+                taken = profile.longest_prefix((shift_end - start_time).total_seconds())
+                if not taken:
+                    continue
+                partial_duration = profile.durations[taken - 1]
+                partial_finish = start_time + timedelta(seconds=partial_duration)
+                if partial_finish <= profile.deadlines[taken - 1]:
+                    split = (start_time, pid, shift_end, taken, partial_duration, partial_finish)
+                    break
+
+            if split:
+                start_time, pid, shift_end, taken, partial_duration, partial_finish = split
+                pools.take(shift_end)
+                assignments.append({
+                    "picklist_no": f"{pl['picklist_no']}_S{self.split_counter}",
+                    "picker_id": pid,
+                    "start_time": start_time,
+                    "end_time": partial_finish,
+                    "duration_sec": partial_duration,
+                    "items": pl['items'][:taken],
+                    "status": "OnTime"
+                })
+                pools.release(pid, partial_finish, shift_end)
+                Trace.current().count("schedule_splits")
+
+                if taken < len(pl['items']):
+                    queue.push(Scheduler._rebuild_picklist(pl, taken, suffix=self.split_counter), front=True)
+                    Trace.current().count("schedule_remainders")
+                self.split_counter += 1
+                continue
+
+            # 3. Deadline-aware orders leave late work for whatever capacity is left at the end
+            if queue.order != "input":
+                self.late.append(pl)
+                continue
+
+            Scheduler._assign_late(pl, pools, assignments, self.unassigned)
+        return len(assignments) - made
+
+    def finish(self):
+        """
+        Place deferred late work and whatever is still pending; returns (assignments, unassigned).
+        """
+        for pl in self.late + self.queue.drain():
+            Scheduler._assign_late(pl, self.pools, self.assignments, self.unassigned)
+        self.late = []
+        return self.assignments, self.unassigned
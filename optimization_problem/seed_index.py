@@ -0,0 +1,87 @@
+import heapq
+import numpy as np
+from collections import defaultdict
+from datetime import datetime
+from sortedcontainers import SortedList
+from .core_logic import ScoringStrategy
+
+
+class SeedIndex:
+    """
+    Open lines of a zone ordered by the builder's seed key
+    (-atc_score, -is_completing, floor, aisle, rack, bin_rank).
+
+    Scores depend only on a line's remaining qty (the builder clock does not move), so lines
+    are re-scored lazily: refresh() is called with the rows whose qty or completion status
+    may have changed, and costs O(k log N) for k rows instead of a full re-sort.
+    Lines are also indexed per store so a scan can skip straight to the stores a picklist holds.
+    """
+    def __init__(self, location_rank: np.ndarray, store_idx: np.ndarray, time_until_cutoff: np.ndarray,
+                 strategy: ScoringStrategy, current_time: datetime):
+        self.location_rank = location_rank
+        self.store_idx = store_idx
+        self.time_until_cutoff = time_until_cutoff
+        self.strategy = strategy
+        self.current_time = current_time
+        self._sorted = SortedList()
+        self._by_store = defaultdict(SortedList)
+        self._entries = [None] * len(location_rank)
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def scan(self) -> "SeedScan":
+        return SeedScan(self)
+
+    def refresh(self, rows: np.ndarray, row_remaining: np.ndarray, order_remaining: np.ndarray):
+        """
+        Re-key the given rows from their current remaining qty and order remaining qty.
+        Rows with nothing left are dropped from the index.
+        """
+        for row in rows.tolist():
+            entry = self._entries[row]
+            if entry is not None:
+                self._sorted.remove(entry)
+                self._by_store[int(self.store_idx[row])].remove(entry)
+                self._entries[row] = None
+
+        live = row_remaining > 0
+        rows, qty = rows[live], row_remaining[live]
+        if not rows.size:
+            return
+
+        scores = self.strategy.calculate_scores(qty, self.time_until_cutoff[rows], self.current_time)
+        completing = order_remaining[live] == qty
+        for row, score, is_completing, location, store in zip(rows.tolist(), scores.tolist(), completing.tolist(),
+                                                              self.location_rank[rows].tolist(),
+                                                              self.store_idx[rows].tolist()):
+            entry = (-score, not is_completing, location, row)
+            self._entries[row] = entry
+            self._sorted.add(entry)
+            self._by_store[store].add(entry)
+
+
+class SeedScan:
+    """
+    Iterator over a SeedIndex in seed order, yielding (row, atc_score, is_completing).
+    narrow() continues the scan over the lines of the given stores only.
+    The index must not be refreshed while a scan is in progress.
+    """
+    def __init__(self, index: SeedIndex):
+        self._index = index
+        self._entries = iter(index._sorted)
+        self._last = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        neg_score, not_completing, _, row = self._last = next(self._entries)
+        return row, -neg_score, not not_completing
+
+    def narrow(self, stores):
+        by_store = self._index._by_store
+        self._entries = heapq.merge(*(
+            by_store[store].irange(minimum=self._last, inclusive=(False, True))
+            for store in stores if store in by_store
+        ))
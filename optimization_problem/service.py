@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Callable, List, Optional, Tuple
+from .config import Config
+from .data_loader import DataLoader
+from .metrics import PlanMetrics
+from .parallel_engine import ScalableOptimizationEngine
+from .replanner import IncrementalPlanner
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 503: "Service Unavailable"}
+
+
+class PlanningServiceError(RuntimeError):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _encode(event: dict) -> bytes:
+    return (json.dumps(event, default=_json_default) + "\n").encode()
+
+
+class _Job:
+    __slots__ = ('kind', 'payload', 'events')
+
+    def __init__(self, kind: str, payload: dict):
+        self.kind = kind
+        self.payload = payload
+        # Encoded NDJSON lines for the requesting connection; None ends the stream
+        self.events = asyncio.Queue()
+
+
+class PlanningService:
+    """
+    Resident planner behind a small HTTP API on a Unix socket or TCP port.
+
+    The cleaned input and a forked worker pool stay warm between requests, so a plan pays
+    for neither interpreter start-up nor CSV parsing nor pool start-up. Requests are
+    accepted concurrently and run one at a time, in arrival order, on one planning thread
+    that shares the pool. At most Config.SERVICE_QUEUE_SIZE may wait; further ones get a
+    503 right away. Config is read once, when the service starts.
+
+      POST /plan    {"input_file": path}  full plan; reloads the input if the file changed
+      POST /replan  {"now": iso time, "added": [lines], "cancelled": [{"order_id", "sku"}]}
+      GET  /status
+
+    Plans and re-plans answer with NDJSON events: queued, started, plan, one per
+    assignment and unassigned picklist (with items), metrics, then done (or error).
+    """
+    def __init__(self, input_file: str, n_workers: Optional[int] = None, queue_size: Optional[int] = None):
+        self.engine = ScalableOptimizationEngine(n_workers)
+        self.queue = asyncio.Queue(maxsize=queue_size or Config.SERVICE_QUEUE_SIZE)
+        self.running: Optional[str] = None
+        self.planner: Optional[IncrementalPlanner] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="planner")
+        self._source = None
+        self._signature = None
+        self.df, self.base_date = None, None
+        self._load(input_file)
+
+    def _load(self, input_file: str):
+        path = os.path.abspath(input_file)
+        stat = os.stat(path)
+        if (path, stat.st_mtime_ns, stat.st_size) == self._signature:
+            return
+        self.df, self.base_date = DataLoader.load_and_clean(path)
+        self._source, self._signature = path, (path, stat.st_mtime_ns, stat.st_size)
+        self.planner = None
+
+    async def serve(self, address: str):
+        """
+        Serve on address ("unix:/path/to.sock" or "host:port") until cancelled.
+        """
+        self.engine.start_pool()
+        runner = asyncio.create_task(self._run_jobs())
+        if address.startswith("unix:"):
+            server = await asyncio.start_unix_server(self._handle, path=address[len("unix:"):])
+        else:
+            host, port = address.rsplit(":", 1)
+            server = await asyncio.start_server(self._handle, host, int(port))
+        print(f"Planning service on {address}: {len(self.df):,} lines of {self._source}, "
+              f"{self.engine.n_workers} warm workers.")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            runner.cancel()
+            self._executor.shutdown(wait=True)
+            self.engine.close_pool()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, payload = await self._read_request(reader)
+        except (ValueError, UnicodeDecodeError, asyncio.IncompleteReadError):
+            await self._respond(writer, 400, [_encode({"error": "Malformed request"})])
+            return
+
+        if (method, path) == ("GET", "/status"):
+            await self._respond(writer, 200, [_encode(self.status())])
+        elif method == "POST" and path in ("/plan", "/replan"):
+            job = _Job(path[1:], payload)
+            try:
+                self.queue.put_nowait(job)
+            except asyncio.QueueFull:
+                await self._respond(writer, 503, [_encode({"error": "Planning queue is full"})],
+                                    ["Retry-After: 5"])
+                return
+            job.events.put_nowait(_encode({"event": "queued", "position": self.queue.qsize()}))
+            await self._respond(writer, 200, self._drain(job))
+        else:
+            await self._respond(writer, 404, [_encode({"error": f"No route {method} {path}"})])
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, dict]:
+        method, path, _ = (await reader.readline()).decode().split(" ", 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode()
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return method, path, json.loads(body) if body else {}
+
+    @staticmethod
+    async def _drain(job: _Job):
+        while True:
+            line = await job.events.get()
+            if line is None:
+                return
+            yield line
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, lines, headers: List[str] = ()):
+        try:
+            head = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: application/x-ndjson",
+                    "Connection: close", *headers]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode())
+            if hasattr(lines, "__aiter__"):
+                async for line in lines:
+                    writer.write(line)
+                    await writer.drain()
+            else:
+                writer.writelines(lines)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def status(self) -> dict:
+        return {
+            "input_file": self._source,
+            "lines": len(self.df),
+            "base_date": self.base_date,
+            "workers": self.engine.n_workers,
+            "running": self.running,
+            "queued": self.queue.qsize(),
+            "has_plan": self.planner is not None,
+        }
+
+    async def _run_jobs(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            self.running = job.kind
+            job.events.put_nowait(_encode({"event": "started"}))
+
+            def emit(line: bytes, events: asyncio.Queue = job.events):
+                loop.call_soon_threadsafe(events.put_nowait, line)
+
+            try:
+                await loop.run_in_executor(self._executor, self._execute, job.kind, job.payload, emit)
+            except Exception as exc:
+                job.events.put_nowait(_encode({"event": "error", "error": f"{type(exc).__name__}: {exc}"}))
+            job.events.put_nowait(None)
+            self.running = None
+
+    def _execute(self, kind: str, payload: dict, emit: Callable[[bytes], None]):
+        """
+        Run one job on the planning thread, handing each event to emit as soon as it is
+        encoded, so the connection streams assignments while later ones are still being
+        encoded and the event loop only writes bytes. Metrics come last.
+        """
+        perf_start = time.time()
+        if kind == "plan":
+            self._load(payload.get("input_file") or self._source)
+            start_time = datetime.combine(
+                self.base_date, datetime.strptime(Config.GLOBAL_START_TIME_STR, "%H:%M").time())
+            self.planner = IncrementalPlanner(self.df, self.base_date, start_time, engine=self.engine)
+            assignments, unassigned = self.planner.plan()
+        else:
+            if self.planner is None:
+                raise ValueError("No plan to re-plan; POST /plan first")
+            added = pd.DataFrame(payload["added"]) if payload.get("added") else None
+            cancelled = pd.DataFrame(payload["cancelled"]) if payload.get("cancelled") else None
+            assignments, unassigned = self.planner.replan(
+                datetime.fromisoformat(payload["now"]), added=added, cancelled=cancelled)
+
+        emit(_encode({"event": "plan", "kind": kind, "base_date": self.base_date,
+                      "assignments": len(assignments), "unassigned": len(unassigned)}))
+        for assignment in assignments:
+            emit(_encode({"event": "assignment", **assignment,
+                          "items": [dict(item) for item in assignment['items']]}))
+        for pl in unassigned:
+            emit(_encode({"event": "unassigned", **pl, "items": [dict(item) for item in pl['items']]}))
+        metrics = PlanMetrics.compute(assignments, unassigned, perf_start)
+        emit(_encode({"event": "metrics", **metrics.as_dict(), "report": metrics.report()}))
+        emit(_encode({"event": "done"}))
+
+
+class PlanningClient:
+    """
+    Blocking client of a PlanningService. plan and replan return
+    (base_date, assignments, unassigned, metrics); items come back as plain dicts with
+    timestamps as ISO strings.
+    """
+    def __init__(self, address: str):
+        self.address = address
+
+    def plan(self, input_file: str):
+        return self._plan_request("/plan", {"input_file": os.path.abspath(input_file)})
+
+    def replan(self, now: datetime, added: Optional[pd.DataFrame] = None,
+               cancelled: Optional[pd.DataFrame] = None):
+        payload = {"now": now.isoformat()}
+        if added is not None:
+            payload["added"] = json.loads(added.to_json(orient="records", date_format="iso"))
+        if cancelled is not None:
+            payload["cancelled"] = cancelled.to_dict("records")
+        return self._plan_request("/replan", payload)
+
+    def status(self) -> dict:
+        return asyncio.run(self._request("GET", "/status"))[0]
+
+    def _plan_request(self, path: str, payload: dict):
+        base_date, assignments, unassigned, metrics = None, [], [], None
+        for event in asyncio.run(self._request("POST", path, payload)):
+            kind = event.pop("event")
+            if kind == "error":
+                raise PlanningServiceError(event["error"])
+            if kind == "plan":
+                base_date = date.fromisoformat(event["base_date"])
+            elif kind == "assignment":
+                assignments.append(event)
+            elif kind == "unassigned":
+                unassigned.append(event)
+            elif kind == "metrics":
+                metrics = event
+        return base_date, assignments, unassigned, metrics
+
+    async def _request(self, method: str, path: str, payload: Optional[dict] = None) -> List[dict]:
+        if self.address.startswith("unix:"):
+            reader, writer = await asyncio.open_unix_connection(self.address[len("unix:"):])
+        else:
+            host, port = self.address.rsplit(":", 1)
+            reader, writer = await asyncio.open_connection(host, int(port))
+        body = json.dumps(payload).encode() if payload is not None else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: planner\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+        status = int((await reader.readline()).decode().split(" ", 2)[1])
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        events = [json.loads(line) async for line in reader if line.strip()]
+        writer.close()
+        if status != 200:
+            raise PlanningServiceError(events[0]["error"] if events else f"HTTP {status}")
+        return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident warehouse planning service")
+    parser.add_argument("--input", default="input.csv", help="input file to keep loaded")
+    parser.add_argument("--address", default=Config.PLANNING_SERVICE or "127.0.0.1:8765",
+                        help='"unix:/path/to.sock" or "host:port"')
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    async def run():
+        await PlanningService(args.input, args.workers).serve(args.address)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+from .columnar import ZoneColumns
+
+
+class SharedZoneStore:
+    """
+    Builder columns of a whole frame, sorted by zone with a single stable sort and
+    placed in multiprocessing.shared_memory. Workers attach once by name and then
+    only receive (zone, start, stop) offsets.
+
+    parts optionally sub-divides zones: rows are ordered by (zone, part) and every
+    non-empty (zone, part) becomes its own partition.
+    """
+    def __init__(self, df: pd.DataFrame, parts: Optional[np.ndarray] = None):
+        codes, zone_names = pd.factorize(df['zone'])
+        if parts is None:
+            parts = np.zeros(len(df), dtype=np.int64)
+        valid = np.flatnonzero(codes >= 0)
+        order = valid[np.lexsort((parts[valid], codes[valid]))]
+
+        # Zones keep first-appearance order, like df['zone'].unique()
+        self.frame = df.iloc[order]
+        sorted_codes, sorted_parts = codes[order], parts[order]
+        bounds = np.flatnonzero((np.diff(sorted_codes) != 0) | (np.diff(sorted_parts) != 0)) + 1
+        starts = np.concatenate([[0], bounds]).astype(np.int64) if len(order) else np.empty(0, dtype=np.int64)
+        stops = np.append(starts[1:], len(order))
+        self.partitions: List[Tuple[str, int, int]] = [
+            (zone_names[sorted_codes[start]], int(start), int(stop)) for start, stop in zip(starts, stops)
+        ]
+
+        self._blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.spec: Dict[str, Tuple[str, str, tuple]] = {}
+        try:
+            for name, arr in ZoneColumns.frame_arrays(self.frame).items():
+                block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[:] = arr
+                self._blocks[name] = block
+                self.spec[name] = (block.name, arr.dtype.str, arr.shape)
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks = {}
+
+    @staticmethod
+    def attach(spec: Dict[str, Tuple[str, str, tuple]]):
+        """
+        Read-only views of the shared columns. Returns (arrays, blocks); keep the blocks
+        referenced for as long as the arrays are used.
+        """
+        arrays, blocks = {}, []
+        for name, (block_name, dtype, shape) in spec.items():
+            try:
+                block = shared_memory.SharedMemory(name=block_name, track=False)
+            except TypeError:  # Python < 3.13 has no track flag
+                block = shared_memory.SharedMemory(name=block_name)
+            arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            arr.flags.writeable = False
+            arrays[name] = arr
+            blocks.append(block)
+        return arrays, blocks
@@ -0,0 +1,158 @@
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Tuple
+from .config import Config
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+class TravelTimeIndex:
+    """
+    Walking cost of the locations of one zone for the "travel" duration model.
+
+    A picker walks an S-shaped (serpentine) route: on each floor it walks every aisle it
+    has to visit end to end (TRAVEL_AISLE_SEC each) and along the cross aisle between the
+    outermost of them (TRAVEL_CROSS_AISLE_SEC per aisle number), and every floor after the
+    first costs TRAVEL_FLOOR_SEC. Aisles are walked through whole, so the rack within an
+    aisle does not change the route; stops are charged per unique bin by the duration.
+
+    A location is a cell (floor, aisle coordinate). Numeric aisle labels are their own
+    coordinate, other labels the first number in them (0 without one), so a cell costs the
+    same whichever subset of lines the index was built from. The index holds the cell of
+    every row of its frame, as arrays for batched evaluation (prefix_costs) and as
+    hashable tuples for a RouteState in a scalar loop.
+    """
+    __slots__ = ('floor', 'aisle', 'cells')
+
+    def __init__(self, floor: np.ndarray, aisle: np.ndarray):
+        self.floor = floor
+        self.aisle = aisle
+        self.cells = list(zip(floor.tolist(), aisle.tolist()))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "TravelTimeIndex":
+        return cls(*cls.location_arrays(df))
+
+    @staticmethod
+    def location_arrays(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per row: floor code (dense, by label) and aisle coordinate. Missing columns put
+        every row on one floor and aisle.
+        """
+        if 'floor' in df.columns:
+            floor, _ = pd.factorize(df['floor'].astype(str), use_na_sentinel=False)
+        else:
+            floor = np.zeros(len(df), dtype=np.int64)
+        if 'aisle' in df.columns:
+            labels, uniques = pd.factorize(df['aisle'], use_na_sentinel=False)
+            coords = np.array([aisle_coordinate(v) for v in uniques], dtype=float)
+            aisle = coords[labels] if len(labels) else np.zeros(0)
+        else:
+            aisle = np.zeros(len(df))
+        return floor.astype(np.int64), aisle
+
+    def prefix_costs(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Route seconds of rows[:k + 1] for every k, in one batched pass.
+        """
+        return route_prefix_costs(self.floor[rows], self.aisle[rows])
+
+
+def aisle_coordinate(label) -> float:
+    try:
+        return float(label)
+    except (TypeError, ValueError):
+        match = _NUMBER.search(str(label))
+        return float(match.group()) if match else 0.0
+
+
+_ITEM_CELLS: Dict[tuple, tuple] = {}
+
+
+def item_cell(item) -> tuple:
+    """
+    Cell of a picked item or line dict, (floor label, aisle coordinate); floor labels are
+    normalized so 1, 1.0 and "1" are one floor. Cached per (floor, aisle) value.
+    """
+    key = (item.get('floor', 0), item.get('aisle', 0))
+    cell = _ITEM_CELLS.get(key)
+    if cell is None:
+        floor = key[0]
+        try:
+            floor = str(int(float(floor))) if float(floor).is_integer() else str(float(floor))
+        except (TypeError, ValueError):
+            floor = str(floor)
+        cell = _ITEM_CELLS[key] = (floor, aisle_coordinate(key[1]))
+    return cell
+
+
+def route_prefix_costs(floor: np.ndarray, aisle: np.ndarray) -> np.ndarray:
+    """
+    Route seconds of the first k + 1 stops for every k, from per-stop floor codes and aisle
+    coordinates: aisles visited, per-floor cross-aisle spans and extra floors are running
+    counts, so the whole sequence costs a few array passes per floor instead of one
+    RouteState step per stop.
+    """
+    n = len(floor)
+    if n == 0:
+        return np.zeros(0)
+    new_cell = np.zeros(n, dtype=bool)
+    new_cell[np.unique(np.stack([floor.astype(float), aisle]), axis=1, return_index=True)[1]] = True
+    floors, first_floor = np.unique(floor, return_index=True)
+    new_floor = np.zeros(n, dtype=np.int64)
+    new_floor[first_floor] = 1
+
+    span = np.zeros(n)
+    for f in floors:
+        on_floor = floor == f
+        lo = np.minimum.accumulate(np.where(on_floor, aisle, np.inf))
+        hi = np.maximum.accumulate(np.where(on_floor, aisle, -np.inf))
+        span += np.where(np.isfinite(lo), hi - lo, 0.0)
+
+    return (np.cumsum(new_cell) * Config.TRAVEL_AISLE_SEC + span * Config.TRAVEL_CROSS_AISLE_SEC
+            + (np.cumsum(new_floor) - 1) * Config.TRAVEL_FLOOR_SEC)
+
+
+def items_prefix_costs(items: List) -> np.ndarray:
+    """
+    route_prefix_costs over the cells of items, in order.
+    """
+    cells = [item_cell(item) for item in items]
+    floor, _ = pd.factorize(pd.Index([c[0] for c in cells], dtype=object), use_na_sentinel=False)
+    return route_prefix_costs(floor.astype(np.int64), np.array([c[1] for c in cells], dtype=float))
+
+
+class RouteState:
+    """
+    Running S-shape route of a growing set of cells. added_cost (what a cell would add)
+    and add are O(1): only the cell set, the number of floors and the (lowest, highest)
+    aisle per floor are kept.
+    """
+    __slots__ = ('cells', 'spans', 'cost')
+
+    def __init__(self, cells: Iterable[tuple] = ()):
+        self.cells = set()
+        self.spans = {}
+        self.cost = 0.0
+        for cell in cells:
+            self.add(cell)
+
+    def added_cost(self, cell: tuple) -> float:
+        if cell in self.cells:
+            return 0.0
+        floor, aisle = cell
+        span = self.spans.get(floor)
+        if span is None:
+            return Config.TRAVEL_AISLE_SEC + (Config.TRAVEL_FLOOR_SEC if self.spans else 0.0)
+        lo, hi = span
+        return Config.TRAVEL_AISLE_SEC + max(aisle - hi, lo - aisle, 0.0) * Config.TRAVEL_CROSS_AISLE_SEC
+
+    def add(self, cell: tuple):
+        if cell in self.cells:
+            return
+        self.cost += self.added_cost(cell)
+        self.cells.add(cell)
+        floor, aisle = cell
+        span = self.spans.get(floor)
+        self.spans[floor] = (aisle, aisle) if span is None else (min(span[0], aisle), max(span[1], aisle))
@@ -1,124 +1,198 @@
 import os
+import queue
+import threading
 import pandas as pd
 import numpy as np
-from statistics import median
-from .scheduler import Scheduler
 from .config import Config
-import time
-from datetime import datetime, timedelta
+from .metrics import PlanMetrics
+from concurrent.futures import ThreadPoolExecutor
 
-def save_results(assignments, base_date):
-    os.makedirs("output/picklists", exist_ok=True) 
+DETAIL_COLUMNS = ['SKU', 'Store', 'Bin', 'Bin Rank']
+
+
+def save_results(assignments, base_date, layout=None):
+    """
+    Bulk writer: flattens every picked line into one table keyed by picklist, builds the
+    summary in the same pass, and writes either one CSV per picklist from slices of that
+    table through a thread pool ("files") or a single CSV with a byte-offset index ("single").
+    """
+    writer = ResultWriter(base_date, layout)
+    writer.add(assignments)
+    writer.close()
+
+
+class ResultWriter:
+    """
+    save_results in batches: add() writes the picklist files of its assignments (or appends
+    them to the single CSV) and close() writes Summary.csv and the single layout's index.
+    Batches are written in the order they are added, so the files end up as one
+    save_results call over all of them would leave them. With background=True, add() only
+    queues the batch for a writer thread; close() waits for it and re-raises its error.
+    """
+    def __init__(self, base_date, layout=None, background: bool = False):
+        self.base_date = base_date
+        self.layout = layout or Config.OUTPUT_LAYOUT
+        if self.layout not in ("files", "single"):
+            raise ValueError(f"Unknown output layout: {self.layout}")
+        os.makedirs("output/picklists", exist_ok=True)
+        self.summary_rows = []
+        self._index_rows = []
+        self._single = None
+        self._error = None
+        self._queue = queue.Queue() if background else None
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+            self._thread.start()
+
+    def add(self, assignments):
+        if not assignments:
+            return
+        if self._queue is not None:
+            self._queue.put(list(assignments))
+        else:
+            self._write(assignments)
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            if self._error is not None:
+                raise self._error
+        if self.layout == "single":
+            if self._single is None:
+                self._open_single(DETAIL_COLUMNS[:3])
+            self._single.close()
+            pd.DataFrame(self._index_rows, columns=["picklist_no", "offset", "length", "rows"]).to_csv(
+                f"output/picklists/{self.base_date}_picklists_index.csv", index=False)
+        pd.DataFrame(self.summary_rows).to_csv("output/Summary.csv", index=False)
+        print("Output generated in /output folder.")
+
+    def _run(self):
+        while (batch := self._queue.get()) is not None:
+            if self._error is None:
+                try:
+                    self._write(batch)
+                except Exception as exc:
+                    self._error = exc
+
+    def _write(self, assignments):
+        table, bounds, summary_rows = _flatten_assignments(assignments, self.base_date)
+        self.summary_rows.extend(summary_rows)
+        if self.layout == "files":
+            _write_picklist_files(table, bounds, assignments, self.base_date)
+            return
+        if self._single is None:
+            self._open_single(list(table.columns))
+        _write_single_file(table, bounds, assignments, self._single, self._index_rows)
+
+    def _open_single(self, columns):
+        self._single = open(f"output/picklists/{self.base_date}_picklists.csv", 'wb')
+        self._single.write((",".join(['Picklist'] + columns) + os.linesep).encode())
+
+
+def _flatten_assignments(assignments, base_date):
+    """
+    One pass over all assignments: detail columns for every item, the row range of each
+    assignment in the table, and its Summary.csv row.
+    """
+    skus, stores, bins, bin_ranks = [], [], [], []
+    bounds = [0]
     summary_rows = []
-    
+    has_bin_rank = False
+
     for job in assignments:
-        pl_no = job['picklist_no']
         items = job['items']
-        
-        # 1. Detail File
-        detail_df = pd.DataFrame(items)
-        
-        # Ensure required columns exist
-        out_cols = ['sku', 'store_id', 'bin', 'bin_rank']
-        if 'bin' not in detail_df.columns:
-            detail_df['bin'] = detail_df.get('bin_rank', detail_df.get('bin_rank', 0))
-            
-        detail_df = detail_df[[c for c in out_cols if c in detail_df.columns]].copy()
-        rename_map = {'sku': 'SKU', 'store_id': 'Store', 'bin': 'Bin', 'bin_rank': 'Bin Rank'}
-        detail_df = detail_df.rename(columns=rename_map)
-        
-        # Reorder columns
-        ordered = [c for c in ['SKU', 'Store', 'Bin', 'Bin Rank'] if c in detail_df.columns]
-        detail_df = detail_df[ordered]
-        
-        fname = f"output/picklists/{base_date}_{pl_no}.csv"
-        detail_df.to_csv(fname, index=False)
-        
-        # 2. Summary Row
-        skus = set(i['sku'] for i in items)
+        job_skus = set()
+        job_stores = set()
+        for item in items:
+            bin_rank = item.get('bin_rank')
+            has_bin_rank = has_bin_rank or 'bin_rank' in item
+            skus.append(item['sku'])
+            stores.append(item['store_id'])
+            bins.append(item['bin'] if 'bin' in item else (0 if bin_rank is None else bin_rank))
+            bin_ranks.append(bin_rank)
+            job_skus.add(item['sku'])
+            job_stores.add(item['store_id'])
+        bounds.append(len(skus))
+
         zone = items[0]['zone'] if items else ''
-        
+
         # Determine type
         if zone in Config.FRAGILE_ZONES:
             pl_type = "fragile"
-        elif len(skus) == 1:
+        elif len(job_skus) == 1:
             pl_type = "bulk"
         else:
             pl_type = "multi order"
-        
-        stores = sorted(list(set(i['store_id'] for i in items)))
-        
+
         summary_rows.append({
             "Picklist_date": base_date,
-            "picklist_no": pl_no,
+            "picklist_no": job['picklist_no'],
             "picklist_type": pl_type,
-            "stores_in_picklist": ",".join(map(str, stores))
+            "stores_in_picklist": ",".join(map(str, sorted(job_stores)))
+        })
+
+    columns = {'SKU': skus, 'Store': stores, 'Bin': bins}
+    if has_bin_rank:
+        columns['Bin Rank'] = bin_ranks
+    return pd.DataFrame(columns), bounds, summary_rows
+
+
+def _csv_lines(table):
+    """
+    Data rows of table as CSV lines, formatted by pandas in one call.
+    """
+    text = table.to_csv(index=False, header=False, lineterminator='\n')
+    lines = text.split('\n')[:-1]
+    if len(lines) != len(table):
+        # A field with an embedded newline; format row by row instead
+        lines = [row.to_csv(index=False, header=False, lineterminator='\n')[:-1]
+                 for _, row in table.iterrows()]
+    return lines
+
+
+def _write_picklist_files(table, bounds, assignments, base_date):
+    header = ",".join(table.columns)
+    lines = _csv_lines(table)
+
+    # Picklist numbers can repeat across zones; like sequential writes, the last one wins
+    latest = {}
+    for idx, job in enumerate(assignments):
+        latest[f"output/picklists/{base_date}_{job['picklist_no']}.csv"] = idx
+
+    def write(fname, idx):
+        with open(fname, 'w', newline='') as fh:
+            fh.write(os.linesep.join([header] + lines[bounds[idx]:bounds[idx + 1]]) + os.linesep)
+
+    with ThreadPoolExecutor(max_workers=Config.OUTPUT_WRITER_THREADS) as pool:
+        list(pool.map(write, latest.keys(), latest.values()))
+
+
+def _write_single_file(table, bounds, assignments, fh, index_rows):
+    """
+    Append the detail rows to the single CSV fh with a leading Picklist column, and their
+    (picklist_no, byte offset, byte length, rows) to index_rows, so a picklist can be read
+    with one seek.
+    """
+    numbers = [job['picklist_no'] for job in assignments]
+    counts = np.diff(bounds)
+    lines = _csv_lines(table.assign(Picklist=np.repeat(np.array(numbers, dtype=object), counts))
+                       [['Picklist'] + list(table.columns)])
+
+    for idx, pl_no in enumerate(numbers):
+        block = "".join(line + os.linesep for line in lines[bounds[idx]:bounds[idx + 1]]).encode()
+        index_rows.append({
+            "picklist_no": pl_no,
+            "offset": fh.tell(),
+            "length": len(block),
+            "rows": int(counts[idx]),
         })
-    
-    pd.DataFrame(summary_rows).to_csv("output/Summary.csv", index=False)
-    print("Output generated in /output folder.")
-
-
-def print_metrics(assignments, unassigned, base_date, perf_start=None):
-    print("\n" + "-"*25)
-    print("Evaluation Metrics")
-    print("-"*25)
-    
-    # 1. Total units successfully picked before cutoff (Primary)
-    total_units_picked = sum(sum(i['order_qty'] for i in a['items']) for a in assignments)
-    total_units_available = total_units_picked + sum(sum(i['order_qty'] for i in u['items']) for u in unassigned)
-    percentage = (total_units_picked / total_units_available * 100) if total_units_available > 0 else 0
-    print(f"1. Total units successfully picked before cutoff: {total_units_picked:,} / {total_units_available:,} ({percentage:.1f}%)")
-    
-    # 2. Number of Completed Orders (Secondary)
-    total_demand = {}
-    picked_demand = {}
-    
-    # Calculate total demand
-    for pl in assignments + unassigned:
-        for item in pl['items']:
-            oid = item['order_id']
-            qty = item['order_qty']
-            total_demand[oid] = total_demand.get(oid, 0) + qty
-            
-    # Calculate picked demand
-    for pl in assignments:
-        for item in pl['items']:
-            oid = item['order_id']
-            qty = item['order_qty']
-            picked_demand[oid] = picked_demand.get(oid, 0) + qty
-            
-    completed_orders = 0
-    for oid, total in total_demand.items():
-        if picked_demand.get(oid, 0) >= total:
-            completed_orders += 1
-            
-    print(f"2. Number of Completed Orders: {completed_orders:,} / {len(total_demand):,}")
-    
-    # 3. Wasted picking effort (late picklists)
-    wasted_effort_sec = sum(a['duration_sec'] for a in assignments if a.get('status') != 'OnTime')
-    print(f"3. Wasted picking effort (late picklists): {wasted_effort_sec:.2f} sec")
-    
-    # 4. Picker utilization
-    total_worked_sec = sum(a['duration_sec'] for a in assignments)
-    
-    total_capacity_sec = 0
-    for shift in Config.SHIFTS:
-        start_s = shift[1]
-        end_s = shift[2]
-        count = shift[3]
-        
-        s = datetime.strptime(start_s, "%H:%M")
-        e = datetime.strptime(end_s, "%H:%M")
-        if e <= s:
-            e += timedelta(days=1)
-        duration = (e - s).total_seconds()
-        total_capacity_sec += duration * count
-        
-    utilization = (total_worked_sec / total_capacity_sec * 100) if total_capacity_sec > 0 else 0
-    print(f"4. Picker utilization: {utilization:.2f}%")
-    
-    # 5. Scalability and runtime
-    runtime = time.time() - perf_start if perf_start else 0
-    print(f"5. Scalability and runtime: {runtime:.2f} sec")
-    print("="*40 + "\n")
+        fh.write(block)
+
+
+def print_metrics(assignments, unassigned, base_date, perf_start=None, deferred=None):
+    metrics = PlanMetrics.compute(assignments, unassigned, perf_start, deferred)
+    print(metrics.report())
+    return metrics
@@ -0,0 +1,72 @@
+import os
+import pickle
+import shutil
+import tempfile
+import pandas as pd
+from typing import Dict, List, Optional
+
+
+class ZonePartitionFiles:
+    """
+    Cleaned order lines spilled into one file per zone. Each file is a sequence of
+    pickled DataFrame chunks, appended as the input is streamed, so a zone can be
+    loaded on its own without ever holding the whole day in memory.
+    """
+    def __init__(self, directory: Optional[str] = None):
+        self._owned = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix="zone_partitions_")
+        os.makedirs(self.directory, exist_ok=True)
+        self._files: Dict[str, str] = {}
+        self.line_counts: Dict[str, int] = {}
+        self.unit_counts: Dict[str, float] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+    def append(self, chunk: pd.DataFrame):
+        for zone, part in chunk.groupby('zone', sort=False, observed=True):
+            if zone not in self._files:
+                self._files[zone] = os.path.join(self.directory, f"zone_{len(self._files):05d}.pkl")
+                self.line_counts[zone] = 0
+                self.unit_counts[zone] = 0
+            with open(self._files[zone], 'ab') as fh:
+                pickle.dump(part, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            self.line_counts[zone] += len(part)
+            self.unit_counts[zone] += part['order_qty'].sum()
+
+    def zones(self) -> List[str]:
+        """
+        Zones in order of first appearance in the input, like df['zone'].unique().
+        """
+        return list(self._files)
+
+    def path(self, zone: str) -> str:
+        return self._files[zone]
+
+    @staticmethod
+    def load(path: str) -> pd.DataFrame:
+        chunks = []
+        with open(path, 'rb') as fh:
+            while True:
+                try:
+                    chunks.append(pickle.load(fh))
+                except EOFError:
+                    break
+        return pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+
+    def load_zone(self, zone: str) -> pd.DataFrame:
+        return self.load(self._files[zone])
+
+    def cleanup(self):
+        """
+        Remove the partition files; a temporary directory created here is removed as well.
+        """
+        for path in self._files.values():
+            if os.path.exists(path):
+                os.remove(path)
+        self._files = {}
+        if self._owned:
+            shutil.rmtree(self.directory, ignore_errors=True)
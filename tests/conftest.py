@@ -0,0 +1,22 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import write_csv  # noqa: E402
+from optimization_problem.config import Config  # noqa: E402
+from optimization_problem.data_loader import DataLoader  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def lines(tmp_path_factory):
+    """
+    (cleaned frame, start time) of a seeded synthetic input.
+    """
+    path = write_csv(str(tmp_path_factory.mktemp("data") / "input.csv"), 3_000, 8, seed=7)
+    df, base_date = DataLoader.load_and_clean(path)
+    start_time = datetime.combine(base_date, datetime.strptime(Config.GLOBAL_START_TIME_STR, "%H:%M").time())
+    return df, start_time
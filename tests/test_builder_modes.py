@@ -0,0 +1,43 @@
+import pytest
+
+from optimization_problem.config import Config
+from optimization_problem.parallel_engine import ScalableOptimizationEngine
+from optimization_problem.picklist_builder import PicklistBuilder
+
+
+def build(lines, mode):
+    df, start_time = lines
+    return PicklistBuilder(df, start_time, mode=mode).generate_picklists()
+
+
+@pytest.mark.parametrize("duration_model", ["flat", "travel"])
+@pytest.mark.parametrize("mode", ["columnar", "indexed"])
+def test_modes_match_records(lines, mode, duration_model, monkeypatch):
+    monkeypatch.setattr(Config, "DURATION_MODEL", duration_model)
+    expected = build(lines, "records")
+    assert expected
+    assert build(lines, mode) == expected
+
+
+def typed_quantities(picklists):
+    return [(repr(pl['total_units']), [repr(item['picked_qty']) for item in pl['items']]) for pl in picklists]
+
+
+@pytest.mark.parametrize("mode", ["columnar", "indexed"])
+def test_shared_dispatch_matches_frames(lines, mode, monkeypatch):
+    monkeypatch.setattr(Config, "BUILDER_MODE", mode)
+    df, start_time = lines
+    frames = ScalableOptimizationEngine(2, dispatch="frames").run_parallel_build(df.copy(), start_time)
+    shared = ScalableOptimizationEngine(2, dispatch="shared").run_parallel_build(df.copy(), start_time)
+    assert shared == frames
+    # Weight-limited picks are floats; packing must not turn them into ints
+    assert typed_quantities(shared) == typed_quantities(frames)
+
+
+@pytest.mark.parametrize("mode", PicklistBuilder.MODES)
+def test_fragile_weight_limit(lines, mode):
+    fragile = [pl for pl in build(lines, mode) if pl['zone'] in Config.FRAGILE_ZONES]
+    assert fragile
+    for pl in fragile:
+        assert pl['type'] == "Fragile"
+        assert sum(item['picked_qty'] * item['weight_in_grams'] for item in pl['items']) <= Config.MAX_WEIGHT_FRAGILE
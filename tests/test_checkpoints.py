@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+import pytest
+
+from optimization_problem.checkpoints import ZoneCheckpoints
+from optimization_problem.config import Config
+from optimization_problem.parallel_engine import ScalableOptimizationEngine, ZoneBuildError
+
+
+@pytest.fixture
+def built_zones(monkeypatch):
+    """
+    Zone labels of every batch of tasks the engine hands to the pool.
+    """
+    batches = []
+    map_largest_first = ScalableOptimizationEngine._map_largest_first
+
+    def recording(self, func, tasks, costs, labels=None, **kwargs):
+        batches.append(list(labels))
+        return map_largest_first(self, func, tasks, costs, labels, **kwargs)
+
+    monkeypatch.setattr(ScalableOptimizationEngine, "_map_largest_first", recording)
+    return batches
+
+
+def build(df, start_time):
+    return ScalableOptimizationEngine(2, dispatch="frames").run_parallel_build(df, start_time)
+
+
+def test_restore_skips_built_zones(lines, built_zones, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CHECKPOINT_DIR", str(tmp_path))
+    df, start_time = lines
+    fresh = build(df.copy(), start_time)
+    assert sorted(built_zones[0]) == sorted(df['zone'].unique())
+
+    assert build(df.copy(), start_time) == fresh
+    assert len(built_zones) == 1
+
+    # Changing one line rebuilds its zone only, and matches a build without checkpoints
+    changed = df.copy()
+    row = changed.index[changed['zone'] == "FRAGILE_FD"][0]
+    changed.loc[row, 'order_qty'] += 1
+    restored = build(changed.copy(), start_time)
+    assert built_zones[1] == ["FRAGILE_FD"]
+    monkeypatch.setattr(Config, "CHECKPOINT_DIR", None)
+    assert restored == build(changed, start_time)
+
+
+def test_key_follows_lines_settings_and_start(lines, tmp_path, monkeypatch):
+    df, start_time = lines
+    zone = df['zone'].iloc[0]
+    zone_lines = df[df['zone'] == zone]
+
+    def key(lines_=zone_lines, start=start_time, zone_=zone):
+        return ZoneCheckpoints(str(tmp_path), start).key(zone_, lines_)
+
+    base = key()
+    assert key(zone_lines.copy()) == base
+    changed = zone_lines.copy()
+    changed.iloc[0, changed.columns.get_loc('abs_cutoff')] += timedelta(minutes=30)
+    assert key(changed) != base
+    assert key(zone_lines.iloc[1:]) != base
+    assert key(start=start_time + timedelta(minutes=1)) != base
+    assert key(zone_="other") != base
+    monkeypatch.setattr(Config, "MAX_ITEMS_PER_PICKLIST", Config.MAX_ITEMS_PER_PICKLIST + 1)
+    assert key() != base
+
+
+def test_failed_zones_stop_the_run(lines, monkeypatch):
+    # A cluster build with no worker fails every zone
+    monkeypatch.setattr(Config, "CLUSTER_ADDRESS", "127.0.0.1:0")
+    monkeypatch.setattr(Config, "CLUSTER_WAIT_SEC", 0.5)
+    df, start_time = lines
+    engine = ScalableOptimizationEngine(2, dispatch="cluster")
+    with pytest.raises(ZoneBuildError):
+        engine.run_parallel_build(df.copy(), start_time)
+
+    monkeypatch.setattr(Config, "ALLOW_PARTIAL_PLAN", True)
+    assert engine.run_parallel_build(df.copy(), start_time) == []
@@ -0,0 +1,150 @@
+import json
+import socket
+import threading
+
+import pandas as pd
+import pytest
+
+from optimization_problem.cluster import (
+    HEADER, HELLO, RESULT, ClusterCoordinator, ClusterWorker, _message, _split_address, decode_frame, encode_frame,
+)
+from optimization_problem.config import Config
+from optimization_problem.parallel_engine import ScalableOptimizationEngine
+
+
+@pytest.fixture(scope="module")
+def zone_tasks(lines):
+    df, start_time = lines
+    tasks, zone_of_task, costs = ScalableOptimizationEngine.zone_tasks(df, start_time)
+    frames = ScalableOptimizationEngine(2, dispatch="frames").run_parallel_build(df.copy(), start_time)
+    return tasks, zone_of_task, costs, frames
+
+
+@pytest.fixture(autouse=True)
+def fast_cluster(monkeypatch):
+    monkeypatch.setattr(Config, "CLUSTER_HEARTBEAT_SEC", 0.2)
+    monkeypatch.setattr(Config, "CLUSTER_WAIT_SEC", 2.0)
+
+
+class Build:
+    """
+    A coordinator on a free localhost port, building the zone tasks in a thread.
+    """
+    def __init__(self, zone_tasks, n_tasks=None):
+        tasks, zone_of_task, costs, _ = zone_tasks
+        n_tasks = n_tasks or len(tasks)
+        self.coordinator = ClusterCoordinator("127.0.0.1:0")
+        self.errors = {}
+        self.results = None
+        start_time = tasks[0][1]
+        self.thread = threading.Thread(target=self._run, args=(
+            zone_of_task[:n_tasks], costs[:n_tasks], lambda i: tasks[i][0], start_time), daemon=True)
+        self.thread.start()
+        assert self.coordinator.listening.wait(10)
+        self.address = self.coordinator.bound_address
+
+    def _run(self, zones, costs, lines_of, start_time):
+        self.results = self.coordinator.build_zones(zones, costs, lines_of, start_time, self.errors)
+
+    def start_workers(self, n):
+        for k in range(n):
+            worker = ClusterWorker(self.address, f"worker-{k}")
+            threading.Thread(target=worker.run, kwargs={"connect_timeout": 10}, daemon=True).start()
+
+    def join(self):
+        self.thread.join(60)
+        assert not self.thread.is_alive()
+        return self.results
+
+
+class FakeWorker:
+    """
+    Says HELLO and takes one task without building it; the test decides what happens next.
+    """
+    def __init__(self, address):
+        self.sock = socket.create_connection(_split_address(address))
+        self.sock.sendall(_message(HELLO, 0, json.dumps({"name": "fake"}).encode()))
+        reader = self.sock.makefile('rb')
+        _, self.task_id, length = HEADER.unpack(reader.read(HEADER.size))
+        reader.read(length)
+        reader.close()
+
+    def close(self):
+        self.sock.close()
+
+
+def merged(zone_tasks, results):
+    _, zone_of_task, _, _ = zone_tasks
+    return ScalableOptimizationEngine._merge_partitions(zone_of_task, results)
+
+
+def test_frame_round_trip(lines):
+    df, _ = lines
+    decoded = decode_frame(encode_frame(df))
+    assert list(decoded.columns) == list(df.columns)
+    for name in df.columns:
+        column = df[name].reset_index(drop=True)
+        if isinstance(decoded[name].dtype, pd.CategoricalDtype):
+            assert decoded[name].astype(str).tolist() == column.astype(str).tolist()
+        else:
+            assert decoded[name].dtype == column.dtype
+            assert decoded[name].equals(column)
+
+
+def test_workers_match_frames(zone_tasks):
+    build = Build(zone_tasks)
+    build.start_workers(3)
+    results = build.join()
+    assert build.errors == {}
+    assert merged(zone_tasks, results) == zone_tasks[3]
+
+
+def test_dead_worker_zone_is_rebuilt(zone_tasks):
+    build = Build(zone_tasks)
+    fake = FakeWorker(build.address)
+    fake.close()
+    build.start_workers(2)
+    results = build.join()
+    assert build.errors == {}
+    assert results[fake.task_id] is not None
+    assert merged(zone_tasks, results) == zone_tasks[3]
+
+
+def test_silent_worker_times_out(zone_tasks):
+    # No heartbeats from the fake: after five missed ones its zone goes to another worker
+    build = Build(zone_tasks)
+    fake = FakeWorker(build.address)
+    build.start_workers(2)
+    results = build.join()
+    fake.close()
+    assert build.errors == {}
+    assert merged(zone_tasks, results) == zone_tasks[3]
+
+
+def test_gives_up_after_max_attempts(zone_tasks, monkeypatch):
+    monkeypatch.setattr(Config, "CLUSTER_MAX_ATTEMPTS", 2)
+    build = Build(zone_tasks, n_tasks=1)
+    for _ in range(2):
+        FakeWorker(build.address).close()
+    assert build.join() == [None]
+    assert build.errors[0].startswith("Gave up after 2 attempts")
+
+
+def test_bad_result_fails_its_zone(zone_tasks):
+    build = Build(zone_tasks)
+    fake = FakeWorker(build.address)
+    fake.sock.sendall(_message(RESULT, fake.task_id, b"garbage"))
+    build.start_workers(2)
+    results = build.join()
+    fake.close()
+    assert list(build.errors) == [fake.task_id]
+    assert results[fake.task_id] is None
+    assert all(result is not None for i, result in enumerate(results) if i != fake.task_id)
+
+
+def test_no_workers_fails_every_zone(zone_tasks, monkeypatch):
+    monkeypatch.setattr(Config, "CLUSTER_WAIT_SEC", 0.5)
+    build = Build(zone_tasks)
+    results = build.join()
+    assert results == [None] * len(results)
+    assert sorted(build.errors) == list(range(len(results)))
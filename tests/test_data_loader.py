@@ -0,0 +1,45 @@
+import itertools
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from optimization_problem.config import Config
+from optimization_problem.data_loader import DataLoader
+
+
+def row_cutoff(row):
+    # The row-wise cutoff _get_absolute_cutoffs replaced
+    cutoff_time = datetime.strptime(Config.CUTOFF_MAP.get(row.get('pod_priority', 'P9'), "11:00"), "%H:%M").time()
+    cutoff_dt = datetime.combine(row['dt'].date(), cutoff_time)
+    if cutoff_time.hour < 12 or cutoff_dt <= row['dt']:
+        cutoff_dt += timedelta(days=1)
+    return cutoff_dt
+
+
+def order_lines(priorities):
+    days = ["2025-08-12", "2025-08-31", "2025-12-31"]
+    times = ["00:00:00", "00:30:00", "02:00:00", "10:59:59", "11:00:00", "12:00:00",
+             "13:00:00", "21:00:00", "23:29:59", "23:30:00", "23:59:59"]
+    rows = list(itertools.product(days, times, priorities))
+    return pd.DataFrame({
+        'dt': pd.to_datetime([f"{day} {time}" for day, time, _ in rows]),
+        'pod_priority': [priority for _, _, priority in rows],
+    })
+
+
+@pytest.mark.parametrize("dtype", [object, "category"])
+def test_cutoffs_match_row_wise(dtype, monkeypatch):
+    monkeypatch.setattr(Config, "CUTOFF_MAP", {**Config.CUTOFF_MAP, "P7": "12:00", "P8": "11:59"})
+    # P0 and missing priorities are not in CUTOFF_MAP and take the 11:00 default
+    df = order_lines(list(Config.CUTOFF_MAP) + ["P0", np.nan])
+    df['pod_priority'] = df['pod_priority'].astype(dtype)
+    expected = [row_cutoff(row) for row in df.to_dict('records')]
+    assert DataLoader._get_absolute_cutoffs(df).tolist() == expected
+
+
+def test_cutoffs_without_priority_column():
+    df = order_lines(["P9"])
+    expected = [row_cutoff(row) for row in df.to_dict('records')]
+    assert DataLoader._get_absolute_cutoffs(df.drop(columns='pod_priority')).tolist() == expected
@@ -0,0 +1,29 @@
+import pytest
+
+from optimization_problem.config import Config
+from optimization_problem.local_search import PicklistLocalSearch
+from optimization_problem.parallel_engine import ScalableOptimizationEngine
+from optimization_problem.picklist_builder import PicklistBuilder
+
+
+def built(lines):
+    df, start_time = lines
+    return PicklistBuilder(df, start_time, mode="columnar").generate_picklists()
+
+
+def test_search_keeps_every_line(lines):
+    _, start_time = lines
+    picklists = built(lines)
+    by_zone, tasks = ScalableOptimizationEngine.search_tasks(picklists, start_time, budget_sec=5.0)
+    results = [PicklistLocalSearch.improve_zone(*task) for task in tasks]
+    assert sum(saved for _, saved in results) > 0
+    for (zone, pls), (plan, _) in zip(by_zone.items(), results):
+        sources = sorted(source for lines_of_pl in plan for source in lines_of_pl)
+        assert sources == [(p, k) for p, pl in enumerate(pls) for k in range(len(pl['items']))]
+
+
+def test_travel_model_raises(lines, monkeypatch):
+    monkeypatch.setattr(Config, "DURATION_MODEL", "travel")
+    _, start_time = lines
+    with pytest.raises(ValueError):
+        ScalableOptimizationEngine.search_tasks(built(lines), start_time, budget_sec=1.0)
@@ -0,0 +1,31 @@
+import pytest
+
+from optimization_problem.config import Config
+from optimization_problem.data_loader import DataLoader
+from optimization_problem.parallel_engine import ScalableOptimizationEngine
+from optimization_problem.pipeline import PipelinedPlan
+from optimization_problem.scheduler import Scheduler
+
+
+@pytest.mark.parametrize("shortage", [False, True])
+@pytest.mark.parametrize("split_lines", [None, 40])
+@pytest.mark.parametrize("duration_model", ["flat", "travel"])
+def test_pipeline_matches_staged_plan(lines, duration_model, split_lines, shortage, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, "SCHEDULER_MODE", "pooled")
+    monkeypatch.setattr(Config, "SCHEDULE_ORDER", "edd")
+    monkeypatch.setattr(Config, "DURATION_MODEL", duration_model)
+    monkeypatch.setattr(Config, "ZONE_SPLIT_LINES", split_lines)
+    if shortage:
+        monkeypatch.setattr(Config, "SHIFTS", [(name, start, end, 1, day) for name, start, end, _, day in Config.SHIFTS])
+    df, start_time = lines
+    engine = ScalableOptimizationEngine(2)
+
+    picklists = engine.run_parallel_build(df.copy(), start_time)
+    staged = Scheduler.assign_picklists(picklists, Scheduler.create_pickers(DataLoader.BASE_DATE), start_time)
+
+    pipeline = PipelinedPlan(engine, DataLoader.BASE_DATE, start_time)
+    _, assignments, unassigned = pipeline.run(df.copy())
+    pipeline.close_writer()
+    assert staged[0]
+    assert (assignments, unassigned) == staged
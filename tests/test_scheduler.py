@@ -0,0 +1,128 @@
+import math
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+
+from optimization_problem.config import Config
+from optimization_problem.core_logic import LogicCore
+from optimization_problem.data_loader import DataLoader
+from optimization_problem.picklist_builder import PicklistBuilder
+from optimization_problem.scheduler import PendingPicklists, PickerPools, Scheduler
+
+
+def schedule(lines, mode):
+    df, start_time = lines
+    picklists = PicklistBuilder(df, start_time, mode="columnar").generate_picklists()
+    return Scheduler.assign_picklists(picklists, Scheduler.create_pickers(DataLoader.BASE_DATE), start_time, mode=mode)
+
+
+def picked_units(picklists):
+    return sum(item['picked_qty'] for pl in picklists for item in pl['items'])
+
+
+@pytest.mark.parametrize("duration_model", ["flat", "travel"])
+def test_pooled_input_order_matches_legacy(lines, duration_model, monkeypatch):
+    monkeypatch.setattr(Config, "DURATION_MODEL", duration_model)
+    monkeypatch.setattr(Config, "SCHEDULE_ORDER", "input")
+    legacy = schedule(lines, "legacy")
+    assert legacy[0]
+    assert schedule(lines, "pooled") == legacy
+
+
+@pytest.mark.parametrize("order", ["input", "edd", "atc"])
+@pytest.mark.parametrize("duration_model", ["flat", "travel"])
+def test_pooled_plan_under_picker_shortage(lines, duration_model, order, monkeypatch):
+    # One picker per shift forces late work and unassigned picklists
+    monkeypatch.setattr(Config, "DURATION_MODEL", duration_model)
+    monkeypatch.setattr(Config, "SCHEDULE_ORDER", order)
+    monkeypatch.setattr(Config, "SHIFTS", [(name, start, end, 1, day) for name, start, end, _, day in Config.SHIFTS])
+    df, start_time = lines
+    picklists = PicklistBuilder(df, start_time, mode="columnar").generate_picklists()
+    units = picked_units(picklists)
+    assignments, unassigned = Scheduler.assign_picklists(
+        picklists, Scheduler.create_pickers(DataLoader.BASE_DATE), start_time, mode="pooled")
+    assert unassigned and any(a['status'] == "Late" for a in assignments)
+
+    shifts = Scheduler.build_picker_shifts(DataLoader.BASE_DATE)
+    by_picker = defaultdict(list)
+    for a in assignments:
+        shift_start, shift_end = shifts[a['picker_id']]
+        assert max(shift_start, start_time) <= a['start_time']
+        assert a['end_time'] <= shift_end
+        assert a['end_time'] == a['start_time'] + timedelta(seconds=a['duration_sec'])
+        by_picker[a['picker_id']].append((a['start_time'], a['end_time']))
+    for spans in by_picker.values():
+        spans.sort()
+        assert all(end <= next_start for (_, end), (next_start, _) in zip(spans, spans[1:]))
+    assert picked_units(assignments) + picked_units(unassigned) == units
+
+
+@pytest.mark.parametrize("duration_model", ["flat", "travel"])
+def test_picker_pools_prune_short_shifts(lines, duration_model, monkeypatch):
+    monkeypatch.setattr(Config, "DURATION_MODEL", duration_model)
+    _, start_time = lines
+    min_duration = timedelta(seconds=LogicCore.min_duration())
+    shift_end = start_time + timedelta(hours=2)
+    pools = PickerPools([
+        (start_time, "long", shift_end),
+        (start_time - timedelta(hours=1), "short", start_time + min_duration - timedelta(seconds=1)),
+        (start_time, "exact", start_time + min_duration),
+    ], start_time)
+    assert sorted(pid for _, pid, _ in pools.tops()) == ["exact", "long"]
+
+    pools.take(start_time + min_duration)
+    pools.take(shift_end)
+    pools.release("long", shift_end - min_duration + timedelta(seconds=1), shift_end)
+    assert not pools
+
+
+T0 = datetime(2025, 8, 12, 21)
+
+
+def pending(name, deadline_min, duration_sec):
+    return {'picklist_no': name, 'deadline': T0 + timedelta(minutes=deadline_min), 'duration_sec': duration_sec}
+
+
+def test_edd_pops_by_deadline_then_duration():
+    picklists = [pending("A", 120, 100), pending("B", 60, 500), pending("C", 60, 200), pending("D", 120, 100)]
+    queue = PendingPicklists(picklists, T0, order="edd")
+    assert queue.next_deadline() == T0 + timedelta(minutes=60)
+    assert [queue.pop(T0)['picklist_no'] for _ in picklists] == ["C", "B", "A", "D"]
+    assert not queue
+
+
+def test_input_order_puts_remainders_first():
+    queue = PendingPicklists([pending("A", 60, 100), pending("B", 60, 100)], T0, order="input")
+    assert queue.pop(T0)['picklist_no'] == "A"
+    queue.push(pending("A_R1", 60, 50), front=True)
+    assert [queue.pop(T0)['picklist_no'] for _ in range(2)] == ["A_R1", "B"]
+
+
+def test_atc_overdue_picklists_go_shortest_first():
+    # At T0 the urgent picklist has the higher index; once picker time passes d - p of
+    # both, they sit in the overdue heap, where the index is 1 / p
+    picklists = [pending("urgent", 30, 1_000), pending("short", 60, 500)]
+    assert PendingPicklists(picklists, T0, order="atc").pop(T0)['picklist_no'] == "urgent"
+    queue = PendingPicklists(picklists, T0, order="atc")
+    assert queue.pop(T0 + timedelta(minutes=55))['picklist_no'] == "short"
+
+
+def test_atc_pops_highest_index():
+    rng = random.Random(3)
+    picklists = [pending(f"PL{i}", rng.uniform(10, 600), rng.uniform(30, 3_000)) for i in range(40)]
+    queue = PendingPicklists(picklists, T0, order="atc")
+    scale = Config.SCHEDULE_ATC_K * sum(pl['duration_sec'] for pl in picklists) / len(picklists)
+
+    def index(pl, now_sec):
+        slack = (pl['deadline'] - T0).total_seconds() - pl['duration_sec'] - now_sec
+        return math.exp(-max(slack, 0) / scale) / max(pl['duration_sec'], 1.0)
+
+    left = list(picklists)
+    for k in range(len(picklists)):
+        now_sec = 240.0 * k
+        expected = max(left, key=lambda pl: index(pl, now_sec))
+        assert queue.pop(T0 + timedelta(seconds=now_sec)) is expected
+        left.remove(expected)
+    assert not queue and queue.drain() == []
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from optimization_problem.config import Config
+from optimization_problem.core_logic import LogicCore, PicklistProfile
+from optimization_problem.picklist_builder import PicklistBuilder
+
+
+def brute_prefix(items, max_seconds):
+    # The truncate loop the binary search replaced: grow the prefix until it no longer fits
+    taken = 0
+    while taken < len(items) and LogicCore.estimate_picklist_duration(items[:taken + 1]) <= max_seconds:
+        taken += 1
+    return taken
+
+
+def brute_remainder(items):
+    return (LogicCore.estimate_picklist_duration(items), min(item['abs_cutoff'] for item in items),
+            sum(item['order_qty'] for item in items), len({item['store_id'] for item in items}))
+
+
+@pytest.mark.parametrize("duration_model", ["flat", "travel"])
+def test_split_matches_prefix_scan(lines, duration_model, monkeypatch):
+    monkeypatch.setattr(Config, "DURATION_MODEL", duration_model)
+    df, start_time = lines
+    picklists = PicklistBuilder(df, start_time, mode="columnar").generate_picklists()
+    rng = random.Random(5)
+    for pl in sorted(picklists, key=lambda pl: -len(pl['items']))[:12]:
+        items, profile = pl['items'], PicklistProfile(pl['items'])
+        total = LogicCore.estimate_picklist_duration(items)
+        exact = [LogicCore.estimate_picklist_duration(items[:k]) for k in range(1, len(items) + 1)]
+        windows = [0.0, total, total + 1.0] + rng.sample(exact, min(5, len(exact))) + \
+            [rng.uniform(0, total) for _ in range(10)]
+        rng.shuffle(windows)
+        for window in windows:
+            assert profile.longest_prefix(window) == brute_prefix(items, window)
+
+        # Split repeatedly: each remainder's header and its own splits match a scan of its items
+        while len(items) > 1:
+            taken = profile.longest_prefix(rng.uniform(0, LogicCore.estimate_picklist_duration(items)))
+            taken = min(max(taken, 1), len(items) - 1)
+            header, profile = profile.remainder(taken)
+            items = items[taken:]
+            duration, *rest = brute_remainder(items)
+            assert header[0] == pytest.approx(duration)
+            assert list(header[1:]) == rest
+            assert profile.longest_prefix(header[0] / 2) == brute_prefix(items, header[0] / 2)